@@ -1,37 +1,65 @@
 """
 Configuração do Django Admin para a app raffles.
 """
+from django import forms
 from django.contrib import admin
-from django.utils.html import format_html
-from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+from django.urls import path, reverse
 from django.utils.safestring import mark_safe
 from django.contrib import messages
-from django.shortcuts import redirect
-from django.db.models import Count
+from django.core.exceptions import PermissionDenied
+from django.core.files.uploadedfile import UploadedFile
+from django.http import JsonResponse
+from django.shortcuts import redirect, get_object_or_404
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils.functional import cached_property
 from django.utils import timezone
 
-from .models import Product, Order, Quota, AdminLog
-from .services import confirm_order, cancel_order, draw_winner, create_product_quotas
+from .models import (
+    Product, Order, Quota, AdminLog, BackgroundJob, OutboxEvent, WhatsAppMessage,
+    WebhookSubscription, WebhookDelivery, WebhookDeadLetter
+)
+from .services import (
+    draw_winner, bulk_confirm_orders, bulk_cancel_orders
+)
+from .jobs import enqueue_job, start_product_activation, start_quota_resize
+from .notifications import notify_draw_participants
+from .receipts import (
+    attach_receipt, duplicate_receipt_orders, flag_duplicate_receipt, validate_receipt
+)
 
+# Grade de cotas do admin de produtos
+QUOTA_CHUNK_SIZE = 1000
+QUOTA_CHUNK_MAX_SIZE = 5000
+QUOTA_STATUS_CODES = {
+    Quota.AVAILABLE: 'D',
+    Quota.RESERVED: 'R',
+    Quota.SOLD: 'V',
+}
 
-class QuotaInline(admin.TabularInline):
-    """Inline para exibir cotas no admin de produtos."""
-    model = Quota
-    extra = 0
-    readonly_fields = ('number', 'status', 'order_link', 'reserved_until')
-    fields = ('number', 'status', 'order_link', 'reserved_until')
-    can_delete = False
-    
-    def order_link(self, obj):
-        """Link para o pedido da cota."""
-        if obj.order:
-            url = reverse('admin:raffles_order_change', args=[obj.order.id])
-            return format_html('<a href="{}">Pedido #{}</a>', url, obj.order.id)
-        return '-'
-    order_link.short_description = 'Pedido'
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator que usa a estimativa do planejador do PostgreSQL quando a
+    listagem não tem filtros, evitando COUNT(*) em tabelas enormes.
+    """
     
-    def has_add_permission(self, request, obj=None):
-        return False
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] > 0:
+                return row[0]
+        return super().count
 
 
 @admin.register(Product)
@@ -44,7 +72,10 @@ class ProductAdmin(admin.ModelAdmin):
     )
     list_filter = ('status', 'created_at', 'draw_datetime')
     search_fields = ('title', 'description')
-    readonly_fields = ('created_at', 'updated_at', 'drawn_number', 'progress_display')
+    readonly_fields = (
+        'created_at', 'updated_at', 'drawn_number', 'draw_snapshot', 'draw_snapshot_sha256',
+        'progress_display', 'quota_grid'
+    )
     fieldsets = (
         ('Informações Básicas', {
             'fields': ('title', 'description', 'image')
@@ -53,19 +84,97 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('price_cents', 'total_quotas', 'status')
         }),
         ('Sorteio', {
-            'fields': ('draw_datetime', 'drawn_number', 'draw_source')
+            'fields': ('draw_datetime', 'drawn_number', 'draw_source', 'draw_snapshot', 'draw_snapshot_sha256')
         }),
         ('Estatísticas', {
             'fields': ('progress_display',),
             'classes': ('collapse',)
         }),
+        ('Cotas', {
+            'fields': ('quota_grid',),
+        }),
         ('Metadados', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         })
     )
-    inlines = [QuotaInline]
-    actions = ['create_quotas_action', 'activate_products', 'close_products']
+    actions = ['create_quotas_action', 'activate_products', 'close_products', 'notify_participants']
+    
+    class Media:
+        css = {'all': ('css/admin_quota_grid.css',)}
+        js = ('js/admin_quota_grid.js',)
+    
+    def get_urls(self):
+        """Endpoints usados pela grade de cotas."""
+        urls = [
+            path(
+                '<int:product_id>/quota-chunk/',
+                self.admin_site.admin_view(self.quota_chunk_view),
+                name='raffles_product_quota_chunk',
+            ),
+            path(
+                '<int:product_id>/quota/<int:number>/',
+                self.admin_site.admin_view(self.quota_detail_view),
+                name='raffles_product_quota_detail',
+            ),
+        ]
+        return urls + super().get_urls()
+    
+    def quota_chunk_view(self, request, product_id):
+        """
+        Retorna o status de um intervalo de cotas em formato compacto.
+        
+        Cada caractere de `statuses` corresponde a um número a partir de
+        `start`: D (disponível), R (reservada), V (vendida), - (inexistente).
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        
+        try:
+            start = max(int(request.GET.get('start', 1)), 1)
+            size = min(max(int(request.GET.get('size', QUOTA_CHUNK_SIZE)), 1), QUOTA_CHUNK_MAX_SIZE)
+        except ValueError:
+            return JsonResponse({'error': 'Parâmetros inválidos'}, status=400)
+        
+        statuses = ['-'] * size
+        rows = Quota.objects.filter(
+            product_id=product_id,
+            number__gte=start,
+            number__lt=start + size
+        ).values_list('number', 'status')
+        for number, status in rows:
+            statuses[number - start] = QUOTA_STATUS_CODES.get(status, '-')
+        
+        return JsonResponse({'start': start, 'statuses': ''.join(statuses)})
+    
+    def quota_detail_view(self, request, product_id, number):
+        """Retorna a cota e o pedido dono, sob demanda."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        
+        quota = get_object_or_404(
+            Quota.objects.select_related('order'),
+            product_id=product_id,
+            number=number
+        )
+        data = {
+            'number': quota.number,
+            'status': quota.get_status_display(),
+            'reserved_until': quota.reserved_until.isoformat() if quota.reserved_until else None,
+            'order': None,
+        }
+        if quota.order:
+            data['order'] = {
+                'id': quota.order.id,
+                'full_name': quota.order.full_name,
+                'status': quota.order.get_status_display(),
+                'url': reverse('admin:raffles_order_change', args=[quota.order.id]),
+            }
+        return JsonResponse(data)
+    
+    def get_queryset(self, request):
+        """Anota as contagens de cotas usadas em quotas_summary/progress_bar."""
+        return super().get_queryset(request).with_quota_stats()
     
     def price_display(self, obj):
         """Exibe o preço formatado."""
@@ -105,25 +214,71 @@ class ProductAdmin(admin.ModelAdmin):
         )
     progress_display.short_description = 'Estatísticas'
     
+    def quota_grid(self, obj):
+        """Grade virtualizada de cotas, carregada em blocos via AJAX."""
+        if not obj or not obj.pk:
+            return '-'
+        return format_html(
+            '<div class="quota-grid" data-total="{}" data-chunk-url="{}" data-detail-url="{}" '
+            'data-chunk-size="{}"></div>',
+            obj.total_quotas,
+            reverse('admin:raffles_product_quota_chunk', args=[obj.pk]),
+            reverse('admin:raffles_product_quota_detail', args=[obj.pk, 0]),
+            QUOTA_CHUNK_SIZE
+        )
+    quota_grid.short_description = 'Grade de cotas'
+    
     def create_quotas_action(self, request, queryset):
-        """Ação para criar cotas para produtos selecionados."""
-        created_count = 0
+        """Ação para criar cotas para produtos selecionados (em segundo plano)."""
         for product in queryset:
-            try:
-                quotas_created = create_product_quotas(product.id)
-                if quotas_created > 0:
-                    created_count += 1
-            except Exception as e:
-                self.message_user(request, f'Erro ao criar cotas para {product.title}: {str(e)}', level=messages.ERROR)
-        
-        if created_count > 0:
-            self.message_user(request, f'Cotas criadas para {created_count} produto(s).', level=messages.SUCCESS)
+            job = enqueue_job("create_quotas", {"product_id": product.id}, admin_user=request.user)
+            url = reverse('raffles:admin_job_detail', args=[job.id])
+            self.message_user(
+                request,
+                format_html('Criação de cotas para {} iniciada: <a href="{}">tarefa #{}</a>', product.title, url, job.id),
+                level=messages.SUCCESS
+            )
     create_quotas_action.short_description = 'Criar cotas para produtos selecionados'
     
+    def save_model(self, request, obj, form, change):
+        """Ativações e mudanças no total de cotas rodam em segundo plano."""
+        activating = 'status' in form.changed_data and obj.status == Product.ACTIVE
+        if activating:
+            obj.status = form.initial.get('status') or Product.DRAFT
+        
+        # Produtos com cotas são redimensionados de forma incremental
+        new_total = None
+        if change and 'total_quotas' in form.changed_data and Quota.objects.filter(product=obj).exists():
+            new_total = obj.total_quotas
+            obj.total_quotas = form.initial['total_quotas']
+        
+        super().save_model(request, obj, form, change)
+        
+        # Ativação e redimensionamento juntos rodam em uma única tarefa
+        if activating:
+            self._start_activation(request, obj, new_total)
+        elif new_total is not None:
+            job = start_quota_resize(obj, new_total, admin_user=request.user)
+            url = reverse('raffles:admin_job_detail', args=[job.id])
+            self.message_user(
+                request,
+                format_html('Alteração para {} cotas iniciada: <a href="{}">tarefa #{}</a>', new_total, url, job.id),
+                level=messages.SUCCESS
+            )
+    
+    def _start_activation(self, request, product, new_total=None):
+        job = start_product_activation(product, admin_user=request.user, new_total=new_total)
+        url = reverse('raffles:admin_job_detail', args=[job.id])
+        self.message_user(
+            request,
+            format_html('Ativação de {} iniciada: <a href="{}">tarefa #{}</a>', product.title, url, job.id),
+            level=messages.SUCCESS
+        )
+    
     def activate_products(self, request, queryset):
-        """Ativa produtos selecionados."""
-        updated = queryset.update(status=Product.ACTIVE)
-        self.message_user(request, f'{updated} produto(s) ativado(s).', level=messages.SUCCESS)
+        """Ativa produtos selecionados (cotas criadas em segundo plano)."""
+        for product in queryset.exclude(status=Product.ACTIVE):
+            self._start_activation(request, product)
     activate_products.short_description = 'Ativar produtos selecionados'
     
     def close_products(self, request, queryset):
@@ -131,6 +286,15 @@ class ProductAdmin(admin.ModelAdmin):
         updated = queryset.update(status=Product.CLOSED)
         self.message_user(request, f'{updated} produto(s) encerrado(s).', level=messages.SUCCESS)
     close_products.short_description = 'Encerrar produtos selecionados'
+    
+    def notify_participants(self, request, queryset):
+        """Envia o resultado do sorteio a todos os participantes."""
+        for product in queryset.filter(drawn_number__isnull=False):
+            if notify_draw_participants(product.id):
+                self.message_user(request, f'Notificação de {product.title} agendada.', level=messages.SUCCESS)
+            else:
+                self.message_user(request, f'Falha ao agendar a notificação de {product.title}.', level=messages.ERROR)
+    notify_participants.short_description = 'Notificar participantes do resultado'
 
 
 class QuotaInlineOrder(admin.TabularInline):
@@ -141,21 +305,39 @@ class QuotaInlineOrder(admin.TabularInline):
     fields = ('number', 'product', 'status', 'reserved_until')
     can_delete = False
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+    
     def has_add_permission(self, request, obj=None):
         return False
 
 
+class OrderAdminForm(forms.ModelForm):
+    """Formulário do admin de pedidos com validação do comprovante."""
+    
+    class Meta:
+        model = Order
+        fields = '__all__'
+    
+    def clean_receipt(self):
+        receipt = self.cleaned_data.get('receipt')
+        if isinstance(receipt, UploadedFile):
+            validate_receipt(receipt)
+        return receipt
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     """Admin para pedidos."""
     
+    form = OrderAdminForm
     list_display = (
         'id', 'full_name', 'product_link', 'quantity', 'total_price_display',
         'status_badge', 'contact_info', 'reserve_expires_at', 'created_at'
     )
     list_filter = ('status', 'product', 'created_at')
     search_fields = ('full_name', 'email', 'whatsapp', 'id')
-    readonly_fields = ('total_price_cents', 'created_at', 'updated_at', 'quotas_display')
+    readonly_fields = ('total_price_cents', 'created_at', 'updated_at', 'quotas_display', 'receipt_duplicates')
     fieldsets = (
         ('Informações do Pedido', {
             'fields': ('product', 'quantity', 'total_price_cents', 'status')
@@ -164,7 +346,7 @@ class OrderAdmin(admin.ModelAdmin):
             'fields': ('full_name', 'email', 'whatsapp')
         }),
         ('Pagamento', {
-            'fields': ('receipt', 'reserve_expires_at')
+            'fields': ('receipt', 'receipt_duplicates', 'reserve_expires_at')
         }),
         ('Cotas', {
             'fields': ('quotas_display',),
@@ -177,10 +359,11 @@ class OrderAdmin(admin.ModelAdmin):
     )
     inlines = [QuotaInlineOrder]
     actions = ['confirm_orders', 'cancel_orders', 'mark_as_expired']
+    list_select_related = ('product',)
     
     def product_link(self, obj):
         """Link para o produto."""
-        url = reverse('admin:raffles_product_change', args=[obj.product.id])
+        url = reverse('admin:raffles_product_change', args=[obj.product_id])
         return format_html('<a href="{}">{}</a>', url, obj.product.title)
     product_link.short_description = 'Produto'
     product_link.admin_order_field = 'product__title'
@@ -221,42 +404,67 @@ class OrderAdmin(admin.ModelAdmin):
     
     def quotas_display(self, obj):
         """Exibe as cotas do pedido."""
-        quotas = obj.quotas.all().order_by('number')
-        if quotas.exists():
-            numbers = [str(q.number) for q in quotas]
+        numbers = list(
+            Quota.objects.filter(order=obj).order_by('number').values_list('number', flat=True)
+        )
+        if numbers:
             return format_html(
                 '<strong>Números das cotas:</strong><br>{}',
-                ', '.join(numbers)
+                ', '.join(str(number) for number in numbers)
             )
         return 'Nenhuma cota encontrada'
     quotas_display.short_description = 'Cotas'
     
+    def receipt_duplicates(self, obj):
+        """Outros pedidos que usaram o mesmo comprovante."""
+        duplicates = duplicate_receipt_orders(obj)
+        if not duplicates:
+            return '-'
+        return format_html(
+            '<span style="color: red; font-weight: bold;">Comprovante também usado em:</span> {}',
+            format_html_join(
+                ', ', '<a href="{}">#{}</a>',
+                ((reverse('admin:raffles_order_change', args=[order_id]), order_id) for order_id in duplicates)
+            )
+        )
+    receipt_duplicates.short_description = 'Comprovante duplicado'
+    
+    def save_model(self, request, obj, form, change):
+        """Armazena comprovantes enviados pelo admin pelo conteúdo."""
+        uploaded = form.cleaned_data.get('receipt')
+        new_receipt = 'receipt' in form.changed_data and isinstance(uploaded, UploadedFile)
+        if new_receipt:
+            attach_receipt(obj, uploaded)
+        elif 'receipt' in form.changed_data:
+            obj.receipt_sha256 = ''
+        super().save_model(request, obj, form, change)
+        if new_receipt:
+            flag_duplicate_receipt(obj)
+    
+    def _report_bulk_result(self, request, result, done_key, done_label):
+        """Exibe o resultado de uma ação em lote."""
+        rejected = sorted(result['rejected'].items())
+        for order_id, reason in rejected[:10]:  # Limita a 10 mensagens
+            self.message_user(request, f'Pedido #{order_id}: {reason}', level=messages.ERROR)
+        if len(rejected) > 10:
+            self.message_user(request, f'... e mais {len(rejected) - 10} pedido(s) rejeitado(s).', level=messages.ERROR)
+        
+        done_count = len(result[done_key])
+        if done_count > 0:
+            self.message_user(request, f'{done_count} pedido(s) {done_label}.', level=messages.SUCCESS)
+    
     def confirm_orders(self, request, queryset):
         """Confirma pedidos selecionados."""
-        confirmed_count = 0
-        for order in queryset:
-            try:
-                if confirm_order(order.id, admin_user=request.user):
-                    confirmed_count += 1
-            except Exception as e:
-                self.message_user(request, f'Erro ao confirmar pedido #{order.id}: {str(e)}', level=messages.ERROR)
-        
-        if confirmed_count > 0:
-            self.message_user(request, f'{confirmed_count} pedido(s) confirmado(s).', level=messages.SUCCESS)
+        order_ids = queryset.values_list('id', flat=True)
+        result = bulk_confirm_orders(order_ids, admin_user=request.user)
+        self._report_bulk_result(request, result, 'confirmed', 'confirmado(s)')
     confirm_orders.short_description = 'Confirmar pedidos selecionados'
     
     def cancel_orders(self, request, queryset):
         """Cancela pedidos selecionados."""
-        canceled_count = 0
-        for order in queryset:
-            try:
-                if cancel_order(order.id, admin_user=request.user):
-                    canceled_count += 1
-            except Exception as e:
-                self.message_user(request, f'Erro ao cancelar pedido #{order.id}: {str(e)}', level=messages.ERROR)
-        
-        if canceled_count > 0:
-            self.message_user(request, f'{canceled_count} pedido(s) cancelado(s).', level=messages.SUCCESS)
+        order_ids = queryset.values_list('id', flat=True)
+        result = bulk_cancel_orders(order_ids, admin_user=request.user)
+        self._report_bulk_result(request, result, 'canceled', 'cancelado(s)')
     cancel_orders.short_description = 'Cancelar pedidos selecionados'
     
     def mark_as_expired(self, request, queryset):
@@ -280,21 +488,52 @@ class QuotaAdmin(admin.ModelAdmin):
     
     list_display = ('product_link', 'number', 'status_badge', 'order_link', 'reserved_until')
     list_filter = ('product', 'status', 'reserved_until')
-    search_fields = ('number', 'product__title', 'order__full_name')
+    list_select_related = ('product', 'order')
+    search_fields = ('=number', '=order__id', 'order__full_name', 'product__title')
+    search_help_text = 'Número da cota, ID do pedido, nome do cliente ou título do produto'
     readonly_fields = ('product', 'number')
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Busca numérica usa apenas igualdade (número/pedido, indexados);
+        texto busca pelo nome do cliente e pelo título do produto.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if search_term.isascii() and search_term.isdigit():
+            value = int(search_term)
+            # Valores fora da faixa da coluna causariam erro de overflow no banco
+            number_max = connection.ops.integer_field_range(
+                Quota._meta.get_field('number').get_internal_type()
+            )[1]
+            order_id_max = connection.ops.integer_field_range(Order._meta.pk.get_internal_type())[1]
+            condition = Q()
+            if value <= number_max:
+                condition |= Q(number=value)
+            if value <= order_id_max:
+                condition |= Q(order_id=value)
+            if not condition:
+                return queryset.none(), False
+            return queryset.filter(condition), False
+        return queryset.filter(
+            Q(order__full_name__icontains=search_term) | Q(product__title__icontains=search_term)
+        ), False
     
     def product_link(self, obj):
         """Link para o produto."""
-        url = reverse('admin:raffles_product_change', args=[obj.product.id])
+        url = reverse('admin:raffles_product_change', args=[obj.product_id])
         return format_html('<a href="{}">{}</a>', url, obj.product.title)
     product_link.short_description = 'Produto'
     product_link.admin_order_field = 'product__title'
     
     def order_link(self, obj):
         """Link para o pedido."""
-        if obj.order:
-            url = reverse('admin:raffles_order_change', args=[obj.order.id])
-            return format_html('<a href="{}">Pedido #{}</a>', url, obj.order.id)
+        if obj.order_id:
+            url = reverse('admin:raffles_order_change', args=[obj.order_id])
+            return format_html('<a href="{}">Pedido #{}</a>', url, obj.order_id)
         return '-'
     order_link.short_description = 'Pedido'
     order_link.admin_order_field = 'order__id'
@@ -344,6 +583,156 @@ class AdminLogAdmin(admin.ModelAdmin):
         return request.user.is_superuser
 
 
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    """Admin para tarefas em segundo plano."""
+    
+    list_display = ('id', 'kind', 'status', 'progress_display', 'admin_id', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status', 'created_at')
+    readonly_fields = (
+        'kind', 'params', 'status', 'progress_current', 'progress_total', 'message',
+        'result', 'error', 'admin_id', 'created_at', 'started_at', 'finished_at'
+    )
+    
+    def progress_display(self, obj):
+        """Progresso com link para o acompanhamento."""
+        url = reverse('raffles:admin_job_detail', args=[obj.id])
+        return format_html('<a href="{}">{}%</a>', url, obj.progress_percentage)
+    progress_display.short_description = 'Progresso'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    """Admin para eventos do outbox."""
+    
+    list_display = ('id', 'event_type', 'sink', 'status', 'attempts', 'available_at', 'delivered_at')
+    list_filter = ('status', 'sink', 'event_type')
+    readonly_fields = (
+        'event_type', 'sink', 'payload', 'status', 'attempts', 'available_at',
+        'last_error', 'created_at', 'delivered_at'
+    )
+    actions = ['retry_events']
+    show_full_result_count = False
+    
+    def retry_events(self, request, queryset):
+        """Recoloca eventos com falha na fila de entrega."""
+        updated = queryset.exclude(status=OutboxEvent.DELIVERED).update(
+            status=OutboxEvent.PENDING,
+            attempts=0,
+            available_at=timezone.now()
+        )
+        self.message_user(request, f'{updated} evento(s) recolocado(s) na fila.', level=messages.SUCCESS)
+    retry_events.short_description = 'Reenviar eventos selecionados'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(WhatsAppMessage)
+class WhatsAppMessageAdmin(admin.ModelAdmin):
+    """Admin para a fila de mensagens de WhatsApp."""
+    
+    list_display = ('id', 'to', 'event_type', 'status', 'attempts', 'account', 'sent_at', 'delivered_at')
+    list_filter = ('status', 'event_type', 'account')
+    search_fields = ('to', 'provider_message_id')
+    readonly_fields = (
+        'account', 'to', 'body', 'event_type', 'order_id', 'status', 'provider_message_id',
+        'attempts', 'available_at', 'last_error', 'created_at', 'sent_at', 'delivered_at'
+    )
+    show_full_result_count = False
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(WebhookSubscription)
+class WebhookSubscriptionAdmin(admin.ModelAdmin):
+    """Admin para assinaturas de webhook."""
+    
+    list_display = ('name', 'url', 'is_active', 'max_concurrency', 'batch_size', 'pending_count', 'dead_letter_count')
+    list_filter = ('is_active',)
+    search_fields = ('name', 'url')
+    readonly_fields = ('created_at',)
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            pending=Count('deliveries', filter=~Q(deliveries__status=WebhookDelivery.DELIVERED), distinct=True),
+            dead=Count('dead_letters', distinct=True)
+        )
+    
+    def pending_count(self, obj):
+        return obj.pending
+    pending_count.short_description = 'Pendentes'
+    pending_count.admin_order_field = 'pending'
+    
+    def dead_letter_count(self, obj):
+        if obj.dead:
+            return format_html('<span style="color: red;">{}</span>', obj.dead)
+        return obj.dead
+    dead_letter_count.short_description = 'Não entregues'
+    dead_letter_count.admin_order_field = 'dead'
+
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    """Admin para a fila de entregas de webhook."""
+    
+    list_display = ('id', 'subscription', 'event_type', 'event_id', 'status', 'attempts', 'last_status_code', 'available_at', 'delivered_at')
+    list_filter = ('status', 'event_type', 'subscription')
+    readonly_fields = (
+        'subscription', 'event_id', 'event_type', 'payload', 'status', 'batch_id', 'attempts',
+        'available_at', 'locked_until', 'last_status_code', 'last_error', 'created_at', 'delivered_at'
+    )
+    list_select_related = ('subscription',)
+    show_full_result_count = False
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(WebhookDeadLetter)
+class WebhookDeadLetterAdmin(admin.ModelAdmin):
+    """Admin para eventos de webhook que esgotaram as tentativas."""
+    
+    list_display = ('id', 'subscription', 'event_type', 'event_id', 'attempts', 'last_status_code', 'failed_at')
+    list_filter = ('event_type', 'subscription')
+    readonly_fields = (
+        'subscription', 'event_id', 'event_type', 'payload', 'attempts',
+        'last_status_code', 'last_error', 'failed_at'
+    )
+    list_select_related = ('subscription',)
+    actions = ['requeue']
+    
+    def requeue(self, request, queryset):
+        """Recoloca os eventos na fila de entrega."""
+        from .webhooks import requeue_dead_letters
+        
+        count = requeue_dead_letters(queryset)
+        self.message_user(request, f'{count} evento(s) recolocado(s) na fila.', level=messages.SUCCESS)
+    requeue.short_description = 'Reenviar eventos selecionados'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 # Configurações do Admin Site
 admin.site.site_header = "Sistema de Cotas - Administração"
 admin.site.site_title = "Sistema de Cotas"
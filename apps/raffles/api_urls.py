@@ -10,5 +10,10 @@ app_name = "raffles_api"
 urlpatterns = [
     path("products/active/", views.api_products_active, name="products_active"),
     path("products/<int:product_id>/quotas/", views.api_product_quotas, name="product_quotas"),
+    path("products/<int:product_id>/quota-map/", views.api_product_quota_map, name="product_quota_map"),
     path("stats/", views_admin.admin_stats_api, name="admin_stats"),
+    path("orders/bulk/", views_admin.bulk_orders_api, name="bulk_orders"),
+    path("receipts/review/", views_admin.receipt_review_api, name="receipt_review"),
+    path("jobs/<int:job_id>/", views_admin.job_status_api, name="job_status"),
+    path("whatsapp/receipts/", views.api_whatsapp_receipts, name="whatsapp_receipts"),
 ]
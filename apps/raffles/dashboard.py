@@ -0,0 +1,126 @@
+"""
+Serviço de dados do dashboard administrativo.
+
+Monta todo o contexto do dashboard com um número fixo de queries,
+independente da quantidade de produtos, pedidos e cotas.
+"""
+from django.db.models import Count, Q, Sum
+from django.http import Http404
+
+from .models import Product, Order
+
+PENDING_ORDER_STATUSES = [Order.RESERVED, Order.WAITING_CONFIRM, Order.WAITING_PROOF]
+RECENT_ORDERS_LIMIT = 50
+
+
+def format_cents(cents):
+    """Formata um valor em centavos como reais (R$ 0,00)."""
+    return f"R$ {(cents or 0) / 100:.2f}".replace('.', ',')
+
+
+def order_stats_aggregate():
+    """
+    Agregações condicionais de pedidos, incluindo a receita confirmada.
+
+    Returns:
+        dict: Argumentos para `QuerySet.aggregate`
+    """
+    return {
+        'total_orders': Count('id'),
+        'confirmed_orders': Count('id', filter=Q(status=Order.CONFIRMED)),
+        'pending_orders': Count('id', filter=Q(status__in=PENDING_ORDER_STATUSES)),
+        'expired_orders': Count('id', filter=Q(status=Order.EXPIRED)),
+        'canceled_orders': Count('id', filter=Q(status=Order.CANCELED)),
+        'revenue_cents': Sum('total_price_cents', filter=Q(status=Order.CONFIRMED)),
+    }
+
+
+def get_dashboard_data(product_id=None):
+    """
+    Retorna o contexto do dashboard administrativo.
+
+    Queries executadas:
+        1. Produtos anotados com contagens de cotas (vendidas/reservadas)
+        2. Agregado de pedidos do produto selecionado (contagens + receita)
+        3. Pedidos recentes do produto com `select_related('product')`
+
+    Os totais de produtos são calculados a partir da lista já carregada.
+
+    Args:
+        product_id: ID do produto selecionado (opcional)
+
+    Returns:
+        dict: Contexto para o template do dashboard
+
+    Raises:
+        Http404: Se o produto informado não existir
+    """
+    products = list(
+        Product.objects.with_quota_stats().order_by("-created_at")
+    )
+
+    if product_id is None:
+        product = products[0] if products else None
+    else:
+        product = next((p for p in products if p.id == product_id), None)
+        if product is None:
+            raise Http404("Produto não encontrado.")
+
+    context = {
+        "products": products,
+        "product": product,
+        "total_products": len(products),
+        "active_products": sum(1 for p in products if p.status == Product.ACTIVE),
+        "closed_products": sum(1 for p in products if p.status == Product.CLOSED),
+    }
+
+    if product is None:
+        context.update({
+            "total_quotas": 0,
+            "sold_count": 0,
+            "reserved_count": 0,
+            "available_count": 0,
+            "progress_percentage": 0,
+            "recent_orders": [],
+            "orders_stats": {},
+            "total_revenue": format_cents(0),
+        })
+        return context
+
+    orders_stats = Order.objects.filter(product=product).aggregate(
+        **order_stats_aggregate()
+    )
+    recent_orders = list(
+        Order.objects.filter(product=product)
+        .select_related('product')
+        .order_by("-created_at")[:RECENT_ORDERS_LIMIT]
+    )
+
+    context.update({
+        "total_quotas": product.total_quotas,
+        "sold_count": product.sold_count,
+        "reserved_count": product.reserved_count,
+        "available_count": product.available_count,
+        "progress_percentage": product.progress_percentage,
+        "recent_orders": recent_orders,
+        "orders_stats": orders_stats,
+        "total_revenue": format_cents(orders_stats['revenue_cents']),
+    })
+    return context
+
+
+def get_global_stats():
+    """
+    Estatísticas gerais de produtos e pedidos em duas queries agregadas.
+
+    Returns:
+        dict: Contagens de produtos/pedidos e receita total formatada
+    """
+    stats = Product.objects.aggregate(
+        total_products=Count('id'),
+        active_products=Count('id', filter=Q(status=Product.ACTIVE)),
+        closed_products=Count('id', filter=Q(status=Product.CLOSED)),
+    )
+    stats.update(Order.objects.aggregate(**order_stats_aggregate()))
+    stats["total_revenue"] = format_cents(stats.pop('revenue_cents'))
+    return stats
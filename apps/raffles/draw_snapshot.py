@@ -0,0 +1,146 @@
+"""
+Snapshot auditável das cotas vendidas no momento do sorteio.
+
+O arquivo é texto UTF-8 comprimido com gzip, uma linha por pedido com os
+números em faixas ordenadas:
+
+    # sistema_cotas draw-snapshot v1 product=12 total_quotas=100000
+    431:1-5,9,120-180
+    432:6-8
+    # total_sold=70
+
+O SHA-256 publicado é calculado sobre o conteúdo descomprimido, então
+qualquer pessoa pode verificá-lo com `gunzip -c arquivo | sha256sum`.
+
+O vencedor é sorteado durante a própria leitura que gera o arquivo
+(amostragem de reservatório), então a cota sorteada sempre pertence ao
+snapshot publicado, mesmo que outras vendas sejam confirmadas no meio do
+sorteio.
+"""
+import gzip
+import hashlib
+import logging
+import secrets
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from .models import Quota
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+ITERATOR_CHUNK_SIZE = 10000
+
+
+def _format_runs(numbers):
+    """Converte números ordenados em faixas `a-b` separadas por vírgula."""
+    runs = []
+    start = previous = numbers[0]
+    for number in numbers[1:]:
+        if number != previous + 1:
+            runs.append(f"{start}-{previous}" if previous != start else str(start))
+            start = number
+        previous = number
+    runs.append(f"{start}-{previous}" if previous != start else str(start))
+    return ",".join(runs)
+
+
+def snapshot_lines(product, on_quota=None):
+    """
+    Gera as linhas do snapshot lendo as cotas vendidas em streaming.
+
+    Apenas os números de um pedido ficam em memória por vez. Se informado,
+    `on_quota(order_id, number)` é chamado para cada cota, na ordem do
+    arquivo.
+    """
+    yield (
+        f"# sistema_cotas draw-snapshot v{SNAPSHOT_VERSION} "
+        f"product={product.pk} total_quotas={product.total_quotas}\n"
+    )
+
+    rows = (
+        Quota.objects
+        .filter(product=product, status=Quota.SOLD)
+        .order_by("order_id", "number")
+        .values_list("order_id", "number")
+        .iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    )
+
+    total_sold = 0
+    current_order, numbers = None, []
+    for order_id, number in rows:
+        if order_id != current_order and numbers:
+            yield f"{current_order}:{_format_runs(numbers)}\n"
+            numbers = []
+        current_order = order_id
+        numbers.append(number)
+        total_sold += 1
+        if on_quota is not None:
+            on_quota(order_id, number)
+    if numbers:
+        yield f"{current_order}:{_format_runs(numbers)}\n"
+
+    yield f"# total_sold={total_sold}\n"
+
+
+def write_draw_snapshot(product):
+    """
+    Grava o snapshot comprimido do produto no storage padrão e sorteia
+    uma cota entre as que foram gravadas.
+
+    Args:
+        product: Instância do produto (bloqueada pelo sorteio)
+
+    Returns:
+        tuple: (nome do arquivo, sha256 hexadecimal, total de cotas vendidas,
+        cota sorteada como (posição no snapshot, order_id, número) ou None)
+    """
+    digest = hashlib.sha256()
+    total_sold = 0
+    picked = {"seen": 0, "quota": None}
+
+    def pick(order_id, number):
+        # Amostragem de reservatório: a i-ésima cota substitui a escolhida
+        # com probabilidade 1/i, o que dá a mesma chance a todas
+        picked["seen"] += 1
+        if secrets.randbelow(picked["seen"]) == 0:
+            picked["quota"] = (picked["seen"] - 1, order_id, number)
+
+    with tempfile.TemporaryFile() as tmp:
+        # mtime fixo para que o arquivo comprimido também seja determinístico
+        with gzip.GzipFile(fileobj=tmp, mode="wb", mtime=0) as gz:
+            for line in snapshot_lines(product, on_quota=pick):
+                data = line.encode("utf-8")
+                digest.update(data)
+                gz.write(data)
+                if line.startswith("# total_sold="):
+                    total_sold = int(line.strip().split("=", 1)[1])
+        tmp.seek(0)
+
+        sha256 = digest.hexdigest()
+        name = default_storage.save(
+            f"draws/product-{product.pk}-{sha256[:16]}.txt.gz", File(tmp)
+        )
+
+    logger.info(f"Snapshot do sorteio do produto {product.pk} salvo em {name} ({sha256})")
+    return name, sha256, total_sold, picked["quota"]
+
+
+def verify_draw_snapshot(product):
+    """
+    Recalcula o SHA-256 do snapshot salvo e compara com o publicado.
+
+    Returns:
+        bool: True se o arquivo existe e o hash confere
+    """
+    if not product.draw_snapshot or not product.draw_snapshot_sha256:
+        return False
+
+    digest = hashlib.sha256()
+    with default_storage.open(product.draw_snapshot.name, "rb") as stored:
+        with gzip.GzipFile(fileobj=stored, mode="rb") as gz:
+            for chunk in iter(lambda: gz.read(64 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest() == product.draw_snapshot_sha256
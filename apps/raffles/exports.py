@@ -0,0 +1,202 @@
+"""
+Exportações em streaming de pedidos, cotas e participantes.
+
+As linhas são lidas com `.iterator(chunk_size=...)` e escritas uma a uma,
+então o uso de memória é constante independente do tamanho da exportação.
+"""
+import csv
+import gzip
+import json
+import logging
+import tempfile
+
+from django.core.files import File
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Order, Quota
+from .protected_media import protected_storage
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = 2000
+# Exportações contêm dados pessoais: ficam no storage protegido e só são
+# entregues à equipe pela view `admin_export_download`
+EXPORT_DIR = "exports/"
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def filter_orders(queryset, status="", product="", search=""):
+    """
+    Aplica os filtros do histórico administrativo de pedidos.
+
+    Args:
+        queryset: QuerySet de pedidos
+        status: Status do pedido
+        product: ID do produto
+        search: Busca por nome, e-mail, WhatsApp ou ID
+
+    Returns:
+        QuerySet: Pedidos filtrados
+    """
+    if status:
+        queryset = queryset.filter(status=status)
+
+    if product:
+        queryset = queryset.filter(product_id=product)
+
+    if search:
+        queryset = queryset.filter(
+            Q(full_name__icontains=search) |
+            Q(email__icontains=search) |
+            Q(whatsapp__icontains=search) |
+            Q(id__icontains=search)
+        )
+
+    return queryset
+
+
+def _orders(filters):
+    return filter_orders(Order.objects.all(), **filters)
+
+
+def _order_rows(filters):
+    header = [
+        "id", "created_at", "product_id", "product", "full_name", "email",
+        "whatsapp", "quantity", "total_price_cents", "status",
+    ]
+    rows = (
+        _orders(filters)
+        .order_by("id")
+        .values_list(
+            "id", "created_at", "product_id", "product__title", "full_name",
+            "email", "whatsapp", "quantity", "total_price_cents", "status",
+        )
+    )
+    return header, rows
+
+
+def _quota_rows(filters):
+    """Cotas com dono de um produto; os filtros de pedido se aplicam ao dono."""
+    if not filters.get("product"):
+        raise ValueError("Selecione um produto para exportar as cotas.")
+
+    header = [
+        "number", "status", "order_id", "full_name", "email", "whatsapp",
+        "order_status",
+    ]
+    owners = _orders({**filters, "product": ""})
+    rows = (
+        Quota.objects
+        .filter(product_id=filters["product"], order__in=owners)
+        .order_by("number")
+        .values_list(
+            "number", "status", "order_id", "order__full_name",
+            "order__email", "order__whatsapp", "order__status",
+        )
+    )
+    return header, rows
+
+
+def _participant_rows(filters):
+    header = [
+        "full_name", "email", "whatsapp", "orders", "quotas", "total_price_cents",
+    ]
+    rows = (
+        _orders(filters)
+        .order_by()
+        .values("full_name", "email", "whatsapp")
+        .annotate(
+            orders=Count("id"),
+            quotas=Sum("quantity"),
+            total=Sum("total_price_cents"),
+        )
+        .order_by("full_name", "email", "whatsapp")
+        .values_list("full_name", "email", "whatsapp", "orders", "quotas", "total")
+    )
+    return header, rows
+
+
+EXPORT_KINDS = {
+    "pedidos": _order_rows,
+    "cotas": _quota_rows,
+    "participantes": _participant_rows,
+}
+
+
+class _Echo:
+    """Buffer que devolve o que recebe (para csv.writer em streaming)."""
+
+    def write(self, value):
+        return value
+
+
+def export_lines(kind, fmt, filters):
+    """
+    Gera as linhas de uma exportação no formato pedido.
+
+    Args:
+        kind: Tipo de exportação (pedidos, cotas, participantes)
+        fmt: Formato (csv ou ndjson)
+        filters: Filtros do histórico de pedidos (status, product, search)
+
+    Returns:
+        iterator: Linhas de texto já terminadas em quebra de linha
+
+    Raises:
+        ValueError: Se o tipo/formato for inválido
+    """
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f"Exportação desconhecida: {kind}")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato desconhecido: {fmt}")
+
+    header, rows = EXPORT_KINDS[kind](filters)
+    return _render_lines(header, rows.iterator(chunk_size=EXPORT_CHUNK_SIZE), fmt)
+
+
+def _render_lines(header, rows, fmt):
+    if fmt == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(header, row)), default=str, ensure_ascii=False) + "\n"
+
+
+def export_filename(kind, fmt):
+    """Nome do arquivo de exportação com timestamp."""
+    return f"{kind}-{timezone.now():%Y%m%d-%H%M%S}.{fmt}"
+
+
+def export_to_file(kind, fmt, filters, progress=None):
+    """
+    Grava uma exportação comprimida (gzip) no storage protegido.
+
+    Args:
+        kind: Tipo de exportação
+        fmt: Formato (csv ou ndjson)
+        filters: Filtros do histórico de pedidos
+        progress: Callback opcional chamado com o número de linhas escritas
+
+    Returns:
+        str: Nome do arquivo salvo no storage
+    """
+    with tempfile.TemporaryFile() as tmp:
+        with gzip.GzipFile(fileobj=tmp, mode="wb") as gz:
+            for count, line in enumerate(export_lines(kind, fmt, filters), start=1):
+                gz.write(line.encode("utf-8"))
+                if progress:
+                    progress(count)
+        tmp.seek(0)
+        name = protected_storage().save(
+            f"{EXPORT_DIR}{export_filename(kind, fmt)}.gz", File(tmp)
+        )
+
+    logger.info(f"Exportação {kind} ({fmt}) salva em {name}")
+    return name
@@ -4,6 +4,7 @@ Formulários para a app raffles.
 from django import forms
 from django.core.exceptions import ValidationError
 from .models import Product, Order
+from .receipts import validate_receipt
 
 
 class PublicOrderForm(forms.Form):
@@ -110,22 +111,8 @@ class PublicOrderForm(forms.Form):
         receipt = self.cleaned_data.get('receipt')
         
         if receipt:
-            # Verifica tamanho do arquivo (10MB)
-            max_size = 10 * 1024 * 1024  # 10MB em bytes
-            if receipt.size > max_size:
-                raise ValidationError(
-                    "Arquivo muito grande. Tamanho máximo permitido: 10MB"
-                )
-            
-            # Verifica tipo de arquivo
-            allowed_extensions = ['.pdf', '.jpg', '.jpeg', '.png']
-            file_extension = receipt.name.lower().split('.')[-1]
-            
-            if f'.{file_extension}' not in allowed_extensions:
-                raise ValidationError(
-                    "Tipo de arquivo não permitido. "
-                    "Use apenas PDF, JPG ou PNG."
-                )
+            # Tamanho e tipo real (assinatura do arquivo, não a extensão)
+            validate_receipt(receipt)
         
         return receipt
 
@@ -153,22 +140,8 @@ class ReceiptUploadForm(forms.Form):
         if not receipt:
             raise ValidationError("Selecione um arquivo de comprovante.")
         
-        # Verifica tamanho do arquivo (10MB)
-        max_size = 10 * 1024 * 1024  # 10MB em bytes
-        if receipt.size > max_size:
-            raise ValidationError(
-                "Arquivo muito grande. Tamanho máximo permitido: 10MB"
-            )
-        
-        # Verifica tipo de arquivo
-        allowed_extensions = ['.pdf', '.jpg', '.jpeg', '.png']
-        file_extension = receipt.name.lower().split('.')[-1]
-        
-        if f'.{file_extension}' not in allowed_extensions:
-            raise ValidationError(
-                "Tipo de arquivo não permitido. "
-                "Use apenas PDF, JPG ou PNG."
-            )
+        # Tamanho e tipo real (assinatura do arquivo, não a extensão)
+        validate_receipt(receipt)
         
         return receipt
 
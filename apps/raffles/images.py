@@ -0,0 +1,167 @@
+"""
+Variantes redimensionadas das imagens de produtos.
+
+Cada imagem ganha versões WebP e JPEG em larguras fixas, geradas com
+Pillow em segundo plano (tarefa `product_image_derivatives`) no upload ou,
+se ainda não existirem, na primeira vez em que a imagem é exibida; até lá
+a página usa a imagem original. As variantes ficam em
+`products/derivatives/<nome>-<hash>/` junto de um `manifest.json`, que é
+mantido em cache para montar o `srcset` sem acessar o disco.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_WIDTHS = (320, 640, 1024, 1600)
+DERIVATIVE_FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 6},
+    "jpeg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+}
+MANIFEST_VERSION = 1
+MANIFEST_CACHE_SECONDS = 24 * 60 * 60
+MANIFEST_RETRY_SECONDS = 10 * 60  # Cache de manifest ausente/ilegível e do agendamento
+
+
+def derivatives_dir(image_name):
+    """Diretório das variantes, único por arquivo de origem."""
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    digest = hashlib.sha1(image_name.encode("utf-8")).hexdigest()[:10]
+    return f"products/derivatives/{stem}-{digest}"
+
+
+def _manifest_path(image_name):
+    return f"{derivatives_dir(image_name)}/manifest.json"
+
+
+def _cache_key(image_name):
+    digest = hashlib.sha1(image_name.encode("utf-8")).hexdigest()
+    return f"raffles:image-manifest:v{MANIFEST_VERSION}:{digest}"
+
+
+def schedule_derivatives(image_name):
+    """Agenda a geração das variantes (no máximo uma vez por intervalo de nova tentativa)."""
+    if not cache.add(f"{_cache_key(image_name)}:agendada", True, MANIFEST_RETRY_SECONDS):
+        return
+    from .jobs import enqueue_job
+
+    enqueue_job("product_image_derivatives", {"image": image_name})
+
+
+def generate_derivatives(image_name):
+    """
+    Gera as variantes de uma imagem e grava o manifest.
+
+    Larguras maiores que a original não são geradas (a original entra no
+    lugar da maior largura).
+
+    Args:
+        image_name: Nome do arquivo no storage padrão
+
+    Returns:
+        dict: Manifest {"width", "height", "variants": {formato: {largura: nome}}}
+    """
+    from PIL import Image, ImageOps
+
+    with default_storage.open(image_name, "rb") as f:
+        source = Image.open(f)
+        source.load()
+    source = ImageOps.exif_transpose(source)
+    if source.mode not in ("RGB", "RGBA"):
+        source = source.convert("RGBA" if "A" in source.getbands() else "RGB")
+
+    widths = [width for width in DERIVATIVE_WIDTHS if width < source.width] + [
+        min(source.width, DERIVATIVE_WIDTHS[-1])
+    ]
+    directory = derivatives_dir(image_name)
+    variants = {fmt: {} for fmt in DERIVATIVE_FORMATS}
+
+    for width in widths:
+        height = round(source.height * width / source.width)
+        resized = source if width == source.width else source.resize((width, height), Image.LANCZOS)
+        for fmt, options in DERIVATIVE_FORMATS.items():
+            image = resized.convert("RGB") if fmt == "jpeg" else resized
+            buffer = io.BytesIO()
+            image.save(buffer, **options)
+            name = f"{directory}/{width}.{fmt}"
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            variants[fmt][str(width)] = default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "source": image_name,
+        "width": source.width,
+        "height": source.height,
+        "variants": variants,
+    }
+    manifest_path = _manifest_path(image_name)
+    if default_storage.exists(manifest_path):
+        default_storage.delete(manifest_path)
+    default_storage.save(manifest_path, ContentFile(json.dumps(manifest).encode("utf-8")))
+    cache.set(_cache_key(image_name), manifest, MANIFEST_CACHE_SECONDS)
+
+    logger.info(f"Variantes geradas para {image_name}: larguras {widths}")
+    return manifest
+
+
+def get_manifest(image_name):
+    """
+    Manifest das variantes de uma imagem.
+
+    Nunca gera variantes durante a requisição: se o manifest não existir,
+    agenda a tarefa `product_image_derivatives` e devolve None, e a falta
+    fica em cache por `MANIFEST_RETRY_SECONDS` para não consultar o storage
+    a cada exibição.
+
+    Returns:
+        dict | None: Manifest, ou None se as variantes ainda não existirem
+    """
+    if not image_name:
+        return None
+
+    key = _cache_key(image_name)
+    manifest = cache.get(key)
+    if manifest is not None:
+        return manifest or None
+
+    manifest_path = _manifest_path(image_name)
+    try:
+        if default_storage.exists(manifest_path):
+            with default_storage.open(manifest_path, "rb") as f:
+                manifest = json.loads(f.read())
+            if manifest.get("version") != MANIFEST_VERSION:
+                manifest = None
+    except Exception as e:
+        logger.error(f"Erro ao ler o manifest de {image_name}: {str(e)}")
+        manifest = None
+
+    if manifest is None:
+        cache.set(key, False, MANIFEST_RETRY_SECONDS)
+        schedule_derivatives(image_name)
+        return None
+
+    cache.set(key, manifest, MANIFEST_CACHE_SECONDS)
+    return manifest
+
+
+def srcset(manifest, fmt):
+    """Valor do atributo `srcset` para um formato do manifest."""
+    return ", ".join(
+        f"{default_storage.url(name)} {width}w"
+        for width, name in sorted(manifest["variants"][fmt].items(), key=lambda item: int(item[0]))
+    )
+
+
+def fallback_url(manifest, max_width=640):
+    """URL JPEG da maior variante até `max_width` (para `src`)."""
+    widths = sorted(int(width) for width in manifest["variants"]["jpeg"])
+    chosen = max([width for width in widths if width <= max_width] or widths[:1])
+    return default_storage.url(manifest["variants"]["jpeg"][str(chosen)])
@@ -0,0 +1,314 @@
+"""
+Framework de tarefas em segundo plano com progresso.
+
+Operações longas (criação de cotas, confirmações em lote, exportações)
+são registradas como `BackgroundJob` e executadas pelo Celery. Se o
+broker não estiver disponível, ou com `JOBS_ALWAYS_SYNC=True`, a tarefa
+roda de forma síncrona como fallback.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre gravações de progresso no banco
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+JOB_HANDLERS = {}
+
+
+def register_job(kind):
+    """
+    Registra uma função como handler de um tipo de tarefa.
+
+    O handler recebe um `JobProgress` e os parâmetros da tarefa e deve
+    retornar um resultado serializável em JSON.
+    """
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+class JobProgress:
+    """Reporta o progresso de uma tarefa, limitando as escritas no banco."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._last_write = 0.0
+
+    def __call__(self, current, total=None, message=None, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_write < PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last_write = now
+
+        fields = {"progress_current": current}
+        if total is not None:
+            fields["progress_total"] = total
+        if message is not None:
+            fields["message"] = message[:255]
+        BackgroundJob.objects.filter(pk=self.job_id).update(**fields)
+
+
+def enqueue_job(kind, params=None, admin_user=None):
+    """
+    Cria uma tarefa e agenda sua execução após o commit da transação.
+
+    Args:
+        kind: Tipo registrado com `register_job`
+        params: Parâmetros serializáveis em JSON
+        admin_user: Usuário administrador que iniciou a tarefa
+
+    Returns:
+        BackgroundJob: Tarefa criada
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Tipo de tarefa desconhecido: {kind}")
+
+    job = BackgroundJob.objects.create(
+        kind=kind,
+        params=params or {},
+        admin_id=str(admin_user.id) if admin_user else "system",
+    )
+    transaction.on_commit(lambda: _dispatch(job.id))
+    return job
+
+
+def _dispatch(job_id):
+    """
+    Envia a tarefa ao Celery.
+
+    Só executa no próprio processo com `JOBS_ALWAYS_SYNC` (desenvolvimento
+    sem worker). Se o broker estiver indisponível, a tarefa é marcada como
+    falha em vez de rodar dentro da requisição.
+    """
+    if getattr(settings, "JOBS_ALWAYS_SYNC", False):
+        run_job(job_id)
+        return
+
+    from .tasks import run_job_task
+
+    try:
+        run_job_task.apply_async(args=[job_id], retry=False)
+    except Exception as e:
+        logger.error(f"Celery indisponível, tarefa {job_id} não foi enviada: {str(e)}")
+        BackgroundJob.objects.filter(pk=job_id, status=BackgroundJob.PENDING).update(
+            status=BackgroundJob.FAILED,
+            error=f"Fila de tarefas indisponível: {str(e)}",
+            finished_at=timezone.now(),
+        )
+
+
+def run_job(job_id):
+    """
+    Executa uma tarefa registrando início, progresso, resultado e erro.
+
+    Args:
+        job_id: ID da tarefa
+
+    Returns:
+        BackgroundJob: Tarefa após a execução
+    """
+    updated = BackgroundJob.objects.filter(
+        pk=job_id,
+        status=BackgroundJob.PENDING
+    ).update(status=BackgroundJob.RUNNING, started_at=timezone.now())
+
+    job = BackgroundJob.objects.get(pk=job_id)
+    if not updated:
+        logger.warning(f"Tarefa {job_id} já foi iniciada (status {job.status})")
+        return job
+
+    progress = JobProgress(job_id)
+    try:
+        result = JOB_HANDLERS[job.kind](progress, **job.params)
+    except Exception as e:
+        logger.error(f"Erro na tarefa {job.kind} #{job_id}: {str(e)}")
+        job.status = BackgroundJob.FAILED
+        job.error = str(e)
+    else:
+        job.status = BackgroundJob.SUCCEEDED
+        job.result = result
+        logger.info(f"Tarefa {job.kind} #{job_id} concluída")
+
+    job.refresh_from_db(fields=["progress_current", "progress_total", "message"])
+    if job.status == BackgroundJob.SUCCEEDED:
+        job.progress_current = job.progress_total
+    job.finished_at = timezone.now()
+    job.save(update_fields=[
+        "status", "result", "error", "progress_current", "finished_at"
+    ])
+    return job
+
+
+def job_status(job):
+    """Representação JSON do status de uma tarefa (para polling)."""
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "status_display": job.get_status_display(),
+        "progress_current": job.progress_current,
+        "progress_total": job.progress_total,
+        "progress_percentage": job.progress_percentage,
+        "eta_seconds": job.eta_seconds,
+        "message": job.message,
+        "result": job.result,
+        "error": job.error,
+        "finished": job.is_finished,
+    }
+
+
+def start_product_activation(product, admin_user=None, new_total=None):
+    """
+    Agenda a ativação de um produto (criação de cotas + mudança de status).
+
+    Todas as rotas de ativação (admin, dashboard, formulário) passam por
+    aqui; o produto só fica ativo quando as cotas estiverem prontas. Com
+    `new_total`, a mesma tarefa redimensiona as cotas antes de ativar, para
+    que as duas operações nunca rodem em paralelo.
+
+    Returns:
+        BackgroundJob: Tarefa criada
+    """
+    args = {
+        "product_id": product.id,
+        "admin_id": admin_user.id if admin_user else None,
+    }
+    if new_total is not None:
+        args["new_total"] = new_total
+    return enqueue_job("activate_product", args, admin_user=admin_user)
+
+
+def start_quota_resize(product, new_total, admin_user=None):
+    """
+    Agenda o redimensionamento incremental das cotas de um produto.
+
+    Returns:
+        BackgroundJob: Tarefa criada
+    """
+    return enqueue_job(
+        "resize_quotas",
+        {
+            "product_id": product.id,
+            "new_total": new_total,
+            "admin_id": admin_user.id if admin_user else None,
+        },
+        admin_user=admin_user,
+    )
+
+
+# Handlers das operações administrativas
+
+@register_job("create_quotas")
+def _create_quotas_job(progress, product_id):
+    from .services import create_product_quotas
+
+    progress(0, message="Criando cotas...", force=True)
+    created = create_product_quotas(
+        product_id,
+        progress=lambda done, total: progress(done, total, f"{done} de {total} cotas criadas")
+    )
+    progress(created, message=f"{created} cotas criadas", force=True)
+    return {"product_id": product_id, "quotas_created": created}
+
+
+@register_job("activate_product")
+def _activate_product_job(progress, product_id, admin_id=None, new_total=None):
+    from django.contrib.auth import get_user_model
+    from .services import activate_product, resize_product_quotas
+
+    admin_user = get_user_model().objects.filter(pk=admin_id).first() if admin_id else None
+
+    if new_total is not None:
+        progress(0, message=f"Redimensionando para {new_total} cotas...", force=True)
+        resize_product_quotas(
+            product_id,
+            new_total,
+            admin_user=admin_user,
+            progress=lambda done, total: progress(done, total, f"{done} de {total} cotas processadas")
+        )
+
+    progress(0, message="Preparando cotas para ativação...", force=True)
+    result = activate_product(
+        product_id,
+        admin_user=admin_user,
+        progress=lambda done, total: progress(done, total, f"{done} de {total} cotas criadas")
+    )
+    progress(result["quotas_created"], message="Produto ativado", force=True)
+    return result
+
+
+@register_job("resize_quotas")
+def _resize_quotas_job(progress, product_id, new_total, admin_id=None):
+    from django.contrib.auth import get_user_model
+    from .services import resize_product_quotas
+
+    admin_user = get_user_model().objects.filter(pk=admin_id).first() if admin_id else None
+
+    progress(0, message=f"Redimensionando para {new_total} cotas...", force=True)
+    result = resize_product_quotas(
+        product_id,
+        new_total,
+        admin_user=admin_user,
+        progress=lambda done, total: progress(done, total, f"{done} de {total} cotas processadas")
+    )
+    progress(
+        result["quotas_created"] + result["quotas_removed"],
+        message=f"Total de cotas: {result['new_total']}",
+        force=True
+    )
+    return result
+
+
+@register_job("bulk_orders")
+def _bulk_orders_job(progress, action, order_ids, admin_id=None):
+    from django.contrib.auth import get_user_model
+    from .services import bulk_confirm_orders, bulk_cancel_orders
+
+    handler = {"confirm": bulk_confirm_orders, "cancel": bulk_cancel_orders}[action]
+    admin_user = get_user_model().objects.filter(pk=admin_id).first() if admin_id else None
+
+    progress(0, len(order_ids), force=True)
+    result = handler(order_ids, admin_user=admin_user)
+    result["rejected"] = {str(k): v for k, v in result["rejected"].items()}
+    return result
+
+
+@register_job("receipt_thumbnail")
+def _receipt_thumbnail_job(progress, blob_id):
+    from .receipts import generate_receipt_thumbnail
+
+    return {"blob_id": blob_id, "thumbnail": generate_receipt_thumbnail(blob_id)}
+
+
+@register_job("product_image_derivatives")
+def _product_image_derivatives_job(progress, image):
+    from .images import generate_derivatives
+
+    manifest = generate_derivatives(image)
+    return {"image": image, "widths": sorted(manifest["variants"]["jpeg"], key=int)}
+
+
+@register_job("export")
+def _export_job(progress, kind, fmt, filters):
+    from .exports import export_to_file
+
+    progress(0, message="Gerando exportação...", force=True)
+    name = export_to_file(
+        kind, fmt, filters,
+        progress=lambda rows: progress(rows, message=f"{rows} linhas exportadas")
+    )
+    # Link para a view da equipe (o arquivo não tem URL pública)
+    return {
+        "file": name,
+        "download_url": reverse("raffles:admin_export_download", args=[name]),
+    }
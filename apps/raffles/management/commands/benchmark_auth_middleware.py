@@ -0,0 +1,100 @@
+"""
+Management command que mede o custo por requisição do AuthRequiredMiddleware.
+"""
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import resolve
+import time
+
+from apps.raffles.middleware import AuthRequiredMiddleware
+
+SAMPLE_PATHS = [
+    '/',
+    '/vencedores/',
+    '/pedido/1/',
+    '/comprovante/1/',
+    '/dashboard/',
+    '/admin-pedidos/',
+    '/acoes/liberar-reservas/',
+]
+
+
+class _StaffUser:
+    is_authenticated = True
+
+
+def _legacy_check(request):
+    """Classificação antiga: listas recriadas e varredura de prefixos a cada requisição."""
+    public_urls = [
+        '/', '/login/', '/sucesso/', '/comprovante/', '/pedido/', '/produto/',
+        '/vencedores/', '/historico/', '/admin/login/', '/admin/logout/',
+        '/static/', '/media/',
+    ]
+    api_public_urls = ['/api/products/active/', '/api/products/']
+    any(request.path.startswith(url) for url in public_urls)
+    any(request.path.startswith(url) for url in api_public_urls)
+    return (
+        request.path.startswith('/dashboard/') or
+        request.path.startswith('/produtos/') or
+        request.path.startswith('/pedidos/') or
+        request.path.startswith('/logs/') or
+        request.path.startswith('/tarefas/') or
+        request.path.startswith('/acoes/')
+    ) and not request.user.is_authenticated
+
+
+class Command(BaseCommand):
+    help = "Mede o overhead por requisição da classificação de rotas do AuthRequiredMiddleware."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200000,
+            help='Número de requisições simuladas por rota',
+        )
+
+    def _time(self, func, requests, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for request in requests:
+                func(request)
+        elapsed = time.perf_counter() - start
+        return elapsed / (iterations * len(requests)) * 1e9
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        self.stdout.write(
+            self.style.SUCCESS('=== BENCHMARK AuthRequiredMiddleware ===')
+        )
+
+        middleware = AuthRequiredMiddleware(lambda request: HttpResponse())
+
+        # Tráfego típico: visitantes nas rotas públicas, equipe logada nas
+        # administrativas (nenhum redirecionamento entra na medição)
+        factory = RequestFactory()
+        requests = []
+        for path in SAMPLE_PATHS:
+            request = factory.get(path)
+            request.resolver_match = resolve(path)
+            if request.resolver_match.view_name in middleware.protected:
+                request.user = _StaffUser()
+            else:
+                request.user = AnonymousUser()
+            requests.append(request)
+
+        def compiled(request):
+            middleware.process_view(request, request.resolver_match.func, (), {})
+
+        legacy_ns = self._time(_legacy_check, requests, iterations)
+        compiled_ns = self._time(compiled, requests, iterations)
+
+        self.stdout.write(f'Rotas por rodada: {len(requests)} | Iterações: {iterations}')
+        self.stdout.write(f'Varredura de prefixos (antiga): {legacy_ns:8.1f} ns/requisição')
+        self.stdout.write(f'Rotas compiladas (atual):       {compiled_ns:8.1f} ns/requisição')
+        self.stdout.write(
+            self.style.SUCCESS(f'Redução: {legacy_ns / compiled_ns:.1f}x')
+        )
@@ -6,7 +6,7 @@ from django.db import transaction
 import logging
 
 from apps.raffles.models import Product, Quota
-from apps.raffles.services import create_product_quotas
+from apps.raffles.services import insert_quotas
 
 logger = logging.getLogger(__name__)
 
@@ -91,40 +91,35 @@ class Command(BaseCommand):
                             'Recriando todas as cotas...'
                         )
                     )
-                    if not dry_run:
-                        Quota.objects.filter(product=product).delete()
                 
-                # Cria as cotas
-                quotas_to_create = []
-                for number in range(1, product.total_quotas + 1):
-                    quotas_to_create.append(
-                        Quota(
-                            product=product,
-                            number=number,
-                            status=Quota.AVAILABLE
-                        )
-                    )
+                # Cria as cotas em lotes
+                total_quotas = product.total_quotas
                 
                 if dry_run:
                     self.stdout.write(
-                        f'  ✓ Simulação: {len(quotas_to_create)} cotas seriam criadas'
+                        f'  ✓ Simulação: {total_quotas} cotas seriam criadas'
                     )
                 else:
                     with transaction.atomic():
-                        Quota.objects.bulk_create(quotas_to_create)
+                        if existing_quotas > 0 and force:
+                            Quota.objects.filter(product=product).delete()
+                        insert_quotas(
+                            product.id, 1, total_quotas,
+                            progress=self._report_progress
+                        )
                         
                         logger.info(
-                            f'Criadas {len(quotas_to_create)} cotas para o produto {product.title}'
+                            f'Criadas {total_quotas} cotas para o produto {product.title}'
                         )
                 
                 self.stdout.write(
                     self.style.SUCCESS(
-                        f'  ✓ {len(quotas_to_create)} cotas criadas para "{product.title}"'
+                        f'  ✓ {total_quotas} cotas criadas para "{product.title}"'
                     )
                 )
                 
                 total_processed += 1
-                total_quotas_created += len(quotas_to_create)
+                total_quotas_created += total_quotas
                 
             except Exception as e:
                 logger.error(f'Erro ao criar cotas para produto {product.id}: {str(e)}')
@@ -150,3 +145,7 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.SUCCESS('Operação concluída com sucesso!')
             )
+
+    def _report_progress(self, inserted, total):
+        """Mostra o progresso da inserção em lotes."""
+        self.stdout.write(f'    {inserted}/{total} cotas inseridas')
@@ -0,0 +1,54 @@
+"""
+Management command para entregar os eventos pendentes do outbox.
+"""
+from django.core.management.base import BaseCommand
+import logging
+import time
+
+from apps.raffles.outbox import dispatch_pending, DISPATCH_BATCH_SIZE
+from apps.raffles.webhooks import dispatch_webhooks_pending
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Entrega os eventos pendentes do outbox (e-mail, WhatsApp, webhooks)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Continua executando, consultando o outbox periodicamente',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Intervalo entre consultas no modo --loop (segundos)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DISPATCH_BATCH_SIZE,
+            help='Quantidade de eventos por lote',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            self.style.SUCCESS('=== DISPATCHER DO OUTBOX ===')
+        )
+        
+        while True:
+            delivered, failed = dispatch_pending(options['batch_size'])
+            webhooks = dispatch_webhooks_pending()
+            
+            if delivered or failed or webhooks or not options['loop']:
+                self.stdout.write(
+                    f'Entregues: {delivered} | Falhas: {failed} | '
+                    f'Webhooks processados: {webhooks}'
+                )
+            
+            if not options['loop']:
+                break
+            
+            time.sleep(options['interval'])
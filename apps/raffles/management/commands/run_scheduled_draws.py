@@ -0,0 +1,59 @@
+"""
+Management command para executar os sorteios agendados vencidos.
+"""
+from django.core.management.base import BaseCommand
+from django.core.exceptions import ValidationError
+import logging
+
+from apps.raffles.services import due_scheduled_draws, run_scheduled_draw
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Executa os sorteios cujo horário agendado (draw_datetime) já passou."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Lista os sorteios pendentes sem executá-los',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        
+        self.stdout.write(
+            self.style.SUCCESS('=== SORTEIOS AGENDADOS ===')
+        )
+        
+        products = list(due_scheduled_draws().order_by('draw_datetime'))
+        
+        if not products:
+            self.stdout.write('Nenhum sorteio pendente.')
+            return
+        
+        for product in products:
+            if dry_run:
+                self.stdout.write(
+                    f'  {product.title} (ID: {product.id}) - agendado para {product.draw_datetime}'
+                )
+                continue
+            
+            try:
+                winner_info = run_scheduled_draw(product.id)
+            except ValidationError as e:
+                self.stdout.write(
+                    self.style.ERROR(f'✗ {product.title}: {e.messages[0]}')
+                )
+                continue
+            
+            if winner_info:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f'✓ {product.title}: número {winner_info["drawn_number"]} '
+                        f'({winner_info["winner_name"]})'
+                    )
+                )
+            else:
+                self.stdout.write(f'- {product.title}: nada a sortear')
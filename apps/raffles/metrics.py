@@ -0,0 +1,261 @@
+"""
+Métricas de desempenho por view.
+
+O `PerformanceMetricsMiddleware` registra, para cada requisição, o tempo
+total, o número e o tempo das consultas ao banco (via
+`connection.execute_wrapper`), o tempo de renderização de templates e o
+tamanho da resposta, em histogramas por view.
+
+Cada processo (worker do gunicorn) acumula seus histogramas em memória e
+grava periodicamente um snapshot em `METRICS_DIR/worker-<pid>.json`. O
+endpoint `/metrics` soma os arquivos de todos os workers e responde no
+formato texto do Prometheus. Membros da equipe recebem também o
+cabeçalho `Server-Timing` em cada resposta.
+"""
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+# Limites dos buckets de cada histograma
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    "http_request_duration_seconds": ("Tempo total da requisição por view", SECONDS_BUCKETS),
+    "db_queries_per_request": ("Consultas ao banco por requisição", QUERY_BUCKETS),
+    "db_duration_seconds": ("Tempo gasto no banco por requisição", SECONDS_BUCKETS),
+    "template_render_seconds": ("Tempo de renderização de templates por requisição", SECONDS_BUCKETS),
+    "http_response_size_bytes": ("Tamanho do corpo da resposta (sem streaming)", BYTES_BUCKETS),
+}
+COUNTERS = {
+    "http_responses_total": "Respostas por view e classe de status",
+}
+
+_registry = {}
+_lock = threading.Lock()
+_last_flush = 0.0
+_current = contextvars.ContextVar("raffles_request_metrics", default=None)
+
+
+def metrics_dir():
+    return settings.METRICS_DIR
+
+
+def _worker_file():
+    return os.path.join(metrics_dir(), f"worker-{os.getpid()}.json")
+
+
+def _key(name, labels):
+    return json.dumps([name, sorted(labels.items())])
+
+
+def observe(name, value, **labels):
+    """Registra uma observação em um histograma."""
+    buckets = HISTOGRAMS[name][1]
+    key = _key(name, labels)
+    with _lock:
+        entry = _registry.get(key)
+        if entry is None:
+            entry = _registry[key] = {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                entry["buckets"][index] += 1
+        entry["sum"] += value
+        entry["count"] += 1
+
+
+def increment(name, amount=1, **labels):
+    """Incrementa um contador."""
+    key = _key(name, labels)
+    with _lock:
+        entry = _registry.setdefault(key, {"value": 0})
+        entry["value"] += amount
+
+
+def flush(force=False):
+    """
+    Grava o snapshot deste processo no diretório compartilhado.
+
+    A escrita é atômica (arquivo temporário + `os.replace`), então quem lê
+    nunca vê um arquivo pela metade.
+    """
+    global _last_flush
+
+    now = time.monotonic()
+    if not force and now - _last_flush < settings.METRICS_FLUSH_SECONDS:
+        return
+    _last_flush = now
+
+    with _lock:
+        data = json.dumps(_registry)
+    os.makedirs(metrics_dir(), exist_ok=True)
+    path = _worker_file()
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def reset_registry():
+    """Apaga os snapshots de execuções anteriores (chamar antes de subir os workers)."""
+    with _lock:
+        _registry.clear()
+    for path in glob.glob(os.path.join(metrics_dir(), "worker-*.json")):
+        os.remove(path)
+
+
+def collect():
+    """Soma os snapshots de todos os workers."""
+    flush(force=True)
+    merged = {}
+    for path in glob.glob(os.path.join(metrics_dir(), "worker-*.json")):
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for key, entry in snapshot.items():
+            target = merged.get(key)
+            if target is None:
+                merged[key] = json.loads(json.dumps(entry))
+            elif "value" in entry:
+                target["value"] += entry["value"]
+            else:
+                target["buckets"] = [a + b for a, b in zip(target["buckets"], entry["buckets"])]
+                target["sum"] += entry["sum"]
+                target["count"] += entry["count"]
+    return merged
+
+
+def _format_labels(labels):
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return ",".join(f'{name}="{value}"' for name, value in escaped)
+
+
+def render_prometheus():
+    """Métricas agregadas no formato texto do Prometheus."""
+    series = {}
+    for key, entry in collect().items():
+        name, labels = json.loads(key)
+        series.setdefault(name, []).append((labels, entry))
+
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, entry in sorted(series.get(name, []), key=lambda item: item[0]):
+            for bound, count in zip(buckets, entry["buckets"]):
+                label_text = _format_labels(labels + [["le", bound]])
+                lines.append(f"{name}_bucket{{{label_text}}} {count}")
+            label_text = _format_labels(labels + [["le", "+Inf"]])
+            lines.append(f"{name}_bucket{{{label_text}}} {entry['count']}")
+            label_text = _format_labels(labels)
+            lines.append(f"{name}_sum{{{label_text}}} {entry['sum']:.6f}")
+            lines.append(f"{name}_count{{{label_text}}} {entry['count']}")
+    for name, help_text in COUNTERS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for labels, entry in sorted(series.get(name, []), key=lambda item: item[0]):
+            lines.append(f"{name}{{{_format_labels(labels)}}} {entry['value']}")
+    return "\n".join(lines) + "\n"
+
+
+class RequestMetrics:
+    """Medidas acumuladas durante uma requisição."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Wrapper de `connection.execute_wrapper`
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+def _install_template_timer():
+    """Mede `Template.render` do backend Django (uma vez por render de página)."""
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, "_raffles_timed", False):
+        return
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return original(self, context, request)
+        start = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            metrics.template_seconds += time.perf_counter() - start
+
+    render._raffles_timed = True
+    Template.render = render
+
+
+class PerformanceMetricsMiddleware:
+    """
+    Registra tempo, banco, templates e tamanho da resposta por view.
+
+    Deve ser o primeiro middleware para que o tempo total inclua os demais.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "METRICS_ENABLED", True)
+        if self.enabled:
+            _install_template_timer()
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "nao_resolvida"
+        observe("http_request_duration_seconds", elapsed, view=view)
+        observe("db_queries_per_request", metrics.queries, view=view)
+        observe("db_duration_seconds", metrics.db_seconds, view=view)
+        observe("template_render_seconds", metrics.template_seconds, view=view)
+        if not response.streaming:
+            observe("http_response_size_bytes", len(response.content), view=view)
+        increment("http_responses_total", view=view, status=f"{response.status_code // 100}xx")
+        flush()
+
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated and user.is_staff:
+            response["Server-Timing"] = (
+                f"app;dur={elapsed * 1000:.1f}, "
+                f'db;dur={metrics.db_seconds * 1000:.1f};desc="{metrics.queries} consultas", '
+                f"tpl;dur={metrics.template_seconds * 1000:.1f}"
+            )
+        return response
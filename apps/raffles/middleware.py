@@ -5,47 +5,41 @@ from django.shortcuts import redirect
 from django.urls import reverse
 
 
+def protected_view_names():
+    """
+    Nomes completos (`namespace:nome`) das rotas que exigem login.
+    
+    A lista é declarada em `apps.raffles.urls.protected_urlpatterns`.
+    """
+    from . import urls
+    
+    return frozenset(
+        f"{urls.app_name}:{pattern.name}"
+        for pattern in urls.protected_urlpatterns
+        if pattern.name
+    )
+
+
 class AuthRequiredMiddleware:
     """
     Middleware para redirecionar usuários não autenticados para a página de login.
+    
+    A classificação da rota é feita em `process_view`, depois da resolução
+    da URL: um único teste de pertinência em um frozenset calculado na
+    inicialização, sem varrer prefixos a cada requisição.
     """
     def __init__(self, get_response):
         self.get_response = get_response
+        self.protected = protected_view_names()
 
     def __call__(self, request):
-        # URLs que não precisam de autenticação
-        public_urls = [
-            '/',
-            '/login/',
-            '/sucesso/',
-            '/comprovante/',
-            '/pedido/',
-            '/produto/',
-            '/vencedores/',
-            '/historico/',
-            '/admin/login/',
-            '/admin/logout/',
-            '/static/',
-            '/media/',
-        ]
-        
-        # URLs da API que não precisam de autenticação
-        api_public_urls = [
-            '/api/products/active/',
-            '/api/products/',
-        ]
-        
-        # Verifica se a URL é pública
-        is_public_url = any(request.path.startswith(url) for url in public_urls)
-        is_api_public_url = any(request.path.startswith(url) for url in api_public_urls)
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.resolver_match.view_name not in self.protected:
+            return None
         
-        # Se for uma URL administrativa e o usuário não estiver autenticado
-        if (request.path.startswith('/dashboard/') or 
-            request.path.startswith('/produtos/') or 
-            request.path.startswith('/pedidos/') or 
-            request.path.startswith('/logs/') or 
-            request.path.startswith('/acoes/')) and not request.user.is_authenticated:
+        if not request.user.is_authenticated:
             return redirect(reverse('raffles:custom_login') + f'?next={request.path}')
         
-        response = self.get_response(request)
-        return response
+        return None
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quota',
+            index=models.Index(fields=['product', 'status'], name='quota_product_status_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffles', '0002_quota_product_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=60, verbose_name='Tipo')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='Parâmetros')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('executando', 'Executando'), ('concluida', 'Concluída'), ('falhou', 'Falhou')], default='pendente', max_length=20, verbose_name='Status')),
+                ('progress_current', models.PositiveBigIntegerField(default=0, verbose_name='Progresso atual')),
+                ('progress_total', models.PositiveBigIntegerField(default=0, verbose_name='Progresso total')),
+                ('message', models.CharField(blank=True, max_length=255, verbose_name='Mensagem')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Resultado')),
+                ('error', models.TextField(blank=True, verbose_name='Erro')),
+                ('admin_id', models.CharField(blank=True, max_length=120, verbose_name='ID do Administrador')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criada em')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Iniciada em')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finalizada em')),
+            ],
+            options={
+                'verbose_name': 'Tarefa em segundo plano',
+                'verbose_name_plural': 'Tarefas em segundo plano',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffles', '0003_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quota',
+            index=models.Index(fields=['product', 'status', 'number'], name='quota_product_status_num_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='quota',
+            name='quota_product_status_idx',
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffles', '0004_quota_product_status_number_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='draw_snapshot',
+            field=models.FileField(blank=True, help_text='Cotas vendidas por pedido no momento do sorteio (gzip)', upload_to='draws/', verbose_name='Snapshot do sorteio'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='draw_snapshot_sha256',
+            field=models.CharField(blank=True, help_text='Hash do conteúdo descomprimido do snapshot', max_length=64, verbose_name='SHA-256 do snapshot'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:09
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffles', '0005_product_draw_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(max_length=60, verbose_name='Tipo do evento')),
+                ('sink', models.CharField(max_length=30, verbose_name='Destino')),
+                ('payload', models.JSONField(default=dict, verbose_name='Dados')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('entregue', 'Entregue'), ('falhou', 'Falhou')], default='pendente', max_length=20, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Próxima tentativa de entrega', verbose_name='Disponível em')),
+                ('last_error', models.TextField(blank=True, verbose_name='Último erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('delivered_at', models.DateTimeField(blank=True, null=True, verbose_name='Entregue em')),
+            ],
+            options={
+                'verbose_name': 'Evento de saída',
+                'verbose_name_plural': 'Eventos de saída',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='outbox_status_available_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffles', '0006_outboxevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WhatsAppRateLimit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.CharField(max_length=60, unique=True, verbose_name='Conta do provedor')),
+                ('tokens', models.FloatField(default=0, verbose_name='Tokens disponíveis')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Atualizado em')),
+                ('paused_until', models.DateTimeField(blank=True, help_text='Definido quando o provedor responde 429', null=True, verbose_name='Pausado até')),
+            ],
+            options={
+                'verbose_name': 'Limite de envio de WhatsApp',
+                'verbose_name_plural': 'Limites de envio de WhatsApp',
+            },
+        ),
+        migrations.CreateModel(
+            name='WhatsAppMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.CharField(max_length=60, verbose_name='Conta do provedor')),
+                ('to', models.CharField(max_length=20, verbose_name='Destinatário')),
+                ('body', models.TextField(verbose_name='Mensagem')),
+                ('event_type', models.CharField(blank=True, max_length=60, verbose_name='Evento de origem')),
+                ('order_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='ID do pedido')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('enviada', 'Enviada'), ('entregue', 'Entregue'), ('lida', 'Lida'), ('falhou', 'Falhou')], default='pendente', max_length=20, verbose_name='Status')),
+                ('provider_message_id', models.CharField(blank=True, db_index=True, max_length=120, verbose_name='ID no provedor')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Disponível em')),
+                ('last_error', models.TextField(blank=True, verbose_name='Último erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criada em')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Enviada em')),
+                ('delivered_at', models.DateTimeField(blank=True, null=True, verbose_name='Entregue em')),
+            ],
+            options={
+                'verbose_name': 'Mensagem de WhatsApp',
+                'verbose_name_plural': 'Mensagens de WhatsApp',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['account', 'status', 'available_at'], name='whatsapp_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:13
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffles', '0007_whatsapp_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookSubscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=120, verbose_name='Nome')),
+                ('url', models.URLField(max_length=500, verbose_name='URL')),
+                ('secret', models.CharField(help_text='Usado para assinar o corpo com HMAC-SHA256', max_length=120, verbose_name='Segredo')),
+                ('event_types', models.JSONField(blank=True, default=list, help_text='Lista de tipos de evento; vazio recebe todos', verbose_name='Eventos')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Ativa')),
+                ('max_concurrency', models.PositiveSmallIntegerField(default=2, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Lotes simultâneos')),
+                ('batch_size', models.PositiveSmallIntegerField(default=50, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Eventos por lote')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criada em')),
+            ],
+            options={
+                'verbose_name': 'Assinatura de webhook',
+                'verbose_name_plural': 'Assinaturas de webhook',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WebhookDeadLetter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.PositiveBigIntegerField(verbose_name='ID do evento')),
+                ('event_type', models.CharField(max_length=60, verbose_name='Tipo do evento')),
+                ('payload', models.JSONField(default=dict, verbose_name='Dados')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('last_status_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Último HTTP status')),
+                ('last_error', models.TextField(blank=True, verbose_name='Último erro')),
+                ('failed_at', models.DateTimeField(auto_now_add=True, verbose_name='Falhou em')),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dead_letters', to='raffles.webhooksubscription', verbose_name='Assinatura')),
+            ],
+            options={
+                'verbose_name': 'Webhook não entregue',
+                'verbose_name_plural': 'Webhooks não entregues',
+                'ordering': ['-failed_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WebhookDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.PositiveBigIntegerField(verbose_name='ID do evento')),
+                ('event_type', models.CharField(max_length=60, verbose_name='Tipo do evento')),
+                ('payload', models.JSONField(default=dict, verbose_name='Dados')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('enviando', 'Enviando'), ('entregue', 'Entregue')], default='pendente', max_length=20, verbose_name='Status')),
+                ('batch_id', models.CharField(blank=True, max_length=32, verbose_name='Lote')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Disponível em')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='Reservada até')),
+                ('last_status_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Último HTTP status')),
+                ('last_error', models.TextField(blank=True, verbose_name='Último erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criada em')),
+                ('delivered_at', models.DateTimeField(blank=True, null=True, verbose_name='Entregue em')),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='raffles.webhooksubscription', verbose_name='Assinatura')),
+            ],
+            options={
+                'verbose_name': 'Entrega de webhook',
+                'verbose_name_plural': 'Entregas de webhook',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['subscription', 'status', 'available_at'], name='webhook_delivery_queue_idx')],
+            },
+        ),
+    ]
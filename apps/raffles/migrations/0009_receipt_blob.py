@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffles', '0008_webhooks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('file', models.FileField(upload_to='receipts/', verbose_name='Arquivo')),
+                ('content_type', models.CharField(max_length=60, verbose_name='Tipo de conteúdo')),
+                ('size', models.PositiveIntegerField(verbose_name='Tamanho (bytes)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+            ],
+            options={
+                'verbose_name': 'Arquivo de comprovante',
+                'verbose_name_plural': 'Arquivos de comprovante',
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='receipt_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='SHA-256 do comprovante'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffles', '0009_receipt_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receiptblob',
+            name='thumbnail',
+            field=models.FileField(blank=True, upload_to='receipts/thumbs/', verbose_name='Miniatura'),
+        ),
+    ]
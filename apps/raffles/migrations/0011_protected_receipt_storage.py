@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:25
+
+import apps.raffles.protected_media
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffles', '0010_receiptblob_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='receipt',
+            field=models.FileField(blank=True, null=True, storage=apps.raffles.protected_media.protected_storage, upload_to='receipts/', verbose_name='Comprovante de pagamento'),
+        ),
+        migrations.AlterField(
+            model_name='receiptblob',
+            name='file',
+            field=models.FileField(storage=apps.raffles.protected_media.protected_storage, upload_to='receipts/', verbose_name='Arquivo'),
+        ),
+        migrations.AlterField(
+            model_name='receiptblob',
+            name='thumbnail',
+            field=models.FileField(blank=True, storage=apps.raffles.protected_media.protected_storage, upload_to='receipts/thumbs/', verbose_name='Miniatura'),
+        ),
+    ]
@@ -2,14 +2,88 @@
 Models for the raffles app.
 """
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 from django.contrib.auth import get_user_model
 
+from .protected_media import protected_storage
 
-class Product(models.Model):
+
+class ProductQuerySet(models.QuerySet):
+    """QuerySet de produtos com agregações de cotas."""
+
+    def with_quota_stats(self):
+        """
+        Anota vendidas/reservadas com subqueries correlacionadas.
+
+        As subqueries usam o índice (product, status) e só são avaliadas
+        para as linhas retornadas, então combinam bem com paginação. As
+        propriedades `sold_count`, `reserved_count`, `available_count` e
+        `progress_percentage` passam a usar as anotações sem novas queries.
+        """
+        return self.annotate(
+            sold_quotas_count=_quota_count_subquery(Quota.SOLD),
+            reserved_quotas_count=_quota_count_subquery(Quota.RESERVED),
+        )
+
+
+def _quota_count_subquery(status):
+    """Subquery com a contagem de cotas do produto em um status."""
+    counts = (
+        Quota.objects
+        .filter(product=OuterRef('pk'), status=status)
+        .order_by()
+        .values('product')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+class FieldTrackerMixin:
+    """
+    Guarda os valores de `tracked_fields` como foram lidos do banco.
+
+    O snapshot é feito em `from_db` e renovado após cada `save()`, então
+    os signals conseguem comparar o estado anterior sem uma nova query.
+    Campos adiados (`only`/`defer`) não entram no snapshot.
+    """
+
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_tracked_fields()
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot_tracked_fields()
+
+    def _snapshot_tracked_fields(self):
+        loaded = self.__dict__
+        self._initial_values = {
+            field: loaded[field] for field in self.tracked_fields if field in loaded
+        }
+
+    def initial_value(self, field):
+        """Valor do campo quando a instância foi carregada/salva."""
+        return getattr(self, '_initial_values', {}).get(field)
+
+    def has_changed(self, field):
+        """Indica se o campo mudou desde a leitura (False se desconhecido)."""
+        initial = getattr(self, '_initial_values', {})
+        return field in initial and initial[field] != getattr(self, field)
+
+
+class Product(FieldTrackerMixin, models.Model):
     """Modelo para produtos/sorteios."""
     
+    tracked_fields = ('status', 'draw_datetime', 'image')
+    
     DRAFT = "rascunho"
     ACTIVE = "ativo"
     CLOSED = "encerrado"
@@ -71,6 +145,18 @@ class Product(models.Model):
         verbose_name="Fonte do sorteio",
         help_text="Descrição de como foi realizado o sorteio"
     )
+    draw_snapshot = models.FileField(
+        upload_to="draws/",
+        blank=True,
+        verbose_name="Snapshot do sorteio",
+        help_text="Cotas vendidas por pedido no momento do sorteio (gzip)"
+    )
+    draw_snapshot_sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name="SHA-256 do snapshot",
+        help_text="Hash do conteúdo descomprimido do snapshot"
+    )
 
     created_at = models.DateTimeField(
         auto_now_add=True,
@@ -81,6 +167,8 @@ class Product(models.Model):
         verbose_name="Atualizado em"
     )
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Produto"
         verbose_name_plural = "Produtos"
@@ -89,6 +177,8 @@ class Product(models.Model):
     @property
     def sold_count(self):
         """Retorna o número de cotas vendidas."""
+        if hasattr(self, 'sold_quotas_count'):
+            return self.sold_quotas_count
         return Quota.objects.filter(
             product=self,
             status=Quota.SOLD
@@ -97,6 +187,8 @@ class Product(models.Model):
     @property
     def reserved_count(self):
         """Retorna o número de cotas reservadas."""
+        if hasattr(self, 'reserved_quotas_count'):
+            return self.reserved_quotas_count
         return Quota.objects.filter(
             product=self,
             status=Quota.RESERVED
@@ -176,10 +268,17 @@ class Order(models.Model):
     )
     receipt = models.FileField(
         upload_to="receipts/",
+        storage=protected_storage,
         null=True,
         blank=True,
         verbose_name="Comprovante de pagamento"
     )
+    receipt_sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        verbose_name="SHA-256 do comprovante"
+    )
     reserve_expires_at = models.DateTimeField(
         null=True,
         blank=True,
@@ -220,9 +319,11 @@ class Order(models.Model):
         return f"Pedido #{self.pk} - {self.full_name}"
 
 
-class Quota(models.Model):
+class Quota(FieldTrackerMixin, models.Model):
     """Modelo para cotas individuais."""
     
+    tracked_fields = ('status',)
+    
     AVAILABLE = "disponivel"
     RESERVED = "reservada"
     SOLD = "vendida"
@@ -265,6 +366,9 @@ class Quota(models.Model):
         verbose_name_plural = "Cotas"
         unique_together = ("product", "number")
         ordering = ['product', 'number']
+        indexes = [
+            models.Index(fields=['product', 'status', 'number'], name='quota_product_status_num_idx'),
+        ]
 
     @property
     def is_expired(self):
@@ -306,3 +410,523 @@ class AdminLog(models.Model):
 
     def __str__(self):
         return f"{self.action} - {self.created_at.strftime('%d/%m/%Y %H:%M')}"
+
+
+class BackgroundJob(models.Model):
+    """Modelo para tarefas longas executadas fora do ciclo da requisição."""
+    
+    PENDING = "pendente"
+    RUNNING = "executando"
+    SUCCEEDED = "concluida"
+    FAILED = "falhou"
+    
+    STATUS_CHOICES = [
+        (PENDING, "Pendente"),
+        (RUNNING, "Executando"),
+        (SUCCEEDED, "Concluída"),
+        (FAILED, "Falhou"),
+    ]
+
+    kind = models.CharField(
+        max_length=60,
+        verbose_name="Tipo"
+    )
+    params = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Parâmetros"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        verbose_name="Status"
+    )
+    progress_current = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name="Progresso atual"
+    )
+    progress_total = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name="Progresso total"
+    )
+    message = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Mensagem"
+    )
+    result = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name="Resultado"
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name="Erro"
+    )
+    admin_id = models.CharField(
+        max_length=120,
+        blank=True,
+        verbose_name="ID do Administrador"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Criada em"
+    )
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Iniciada em"
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Finalizada em"
+    )
+
+    class Meta:
+        verbose_name = "Tarefa em segundo plano"
+        verbose_name_plural = "Tarefas em segundo plano"
+        ordering = ['-created_at']
+
+    @property
+    def is_finished(self):
+        """Verifica se a tarefa terminou (com sucesso ou falha)."""
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    @property
+    def progress_percentage(self):
+        """Retorna a porcentagem concluída."""
+        if self.status == self.SUCCEEDED:
+            return 100
+        if not self.progress_total:
+            return 0
+        return round((self.progress_current / self.progress_total) * 100, 1)
+
+    @property
+    def eta_seconds(self):
+        """Estimativa de segundos restantes, pela taxa observada até agora."""
+        if self.status != self.RUNNING or not self.started_at or not self.progress_current:
+            return None
+        elapsed = (timezone.now() - self.started_at).total_seconds()
+        remaining = max(self.progress_total - self.progress_current, 0)
+        return round(elapsed * remaining / self.progress_current)
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class OutboxEvent(models.Model):
+    """
+    Evento de domínio a ser entregue a um destino (e-mail, WhatsApp, webhook).
+
+    Gravado na mesma transação da operação que o originou; o dispatcher
+    lê os eventos pendentes em lotes e faz a entrega fora da requisição.
+    """
+    
+    PENDING = "pendente"
+    DELIVERED = "entregue"
+    FAILED = "falhou"
+    
+    STATUS_CHOICES = [
+        (PENDING, "Pendente"),
+        (DELIVERED, "Entregue"),
+        (FAILED, "Falhou"),
+    ]
+
+    event_type = models.CharField(
+        max_length=60,
+        verbose_name="Tipo do evento"
+    )
+    sink = models.CharField(
+        max_length=30,
+        verbose_name="Destino"
+    )
+    payload = models.JSONField(
+        default=dict,
+        verbose_name="Dados"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        verbose_name="Status"
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Tentativas"
+    )
+    available_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Disponível em",
+        help_text="Próxima tentativa de entrega"
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name="Último erro"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Criado em"
+    )
+    delivered_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Entregue em"
+    )
+
+    class Meta:
+        verbose_name = "Evento de saída"
+        verbose_name_plural = "Eventos de saída"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_status_available_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} → {self.sink} ({self.get_status_display()})"
+
+
+class WhatsAppMessage(models.Model):
+    """Mensagem de WhatsApp na fila de envio, com recibos de entrega."""
+    
+    PENDING = "pendente"
+    SENT = "enviada"
+    DELIVERED = "entregue"
+    READ = "lida"
+    FAILED = "falhou"
+    
+    STATUS_CHOICES = [
+        (PENDING, "Pendente"),
+        (SENT, "Enviada"),
+        (DELIVERED, "Entregue"),
+        (READ, "Lida"),
+        (FAILED, "Falhou"),
+    ]
+
+    account = models.CharField(
+        max_length=60,
+        verbose_name="Conta do provedor"
+    )
+    to = models.CharField(
+        max_length=20,
+        verbose_name="Destinatário"
+    )
+    body = models.TextField(
+        verbose_name="Mensagem"
+    )
+    event_type = models.CharField(
+        max_length=60,
+        blank=True,
+        verbose_name="Evento de origem"
+    )
+    order_id = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="ID do pedido"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        verbose_name="Status"
+    )
+    provider_message_id = models.CharField(
+        max_length=120,
+        blank=True,
+        db_index=True,
+        verbose_name="ID no provedor"
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Tentativas"
+    )
+    available_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Disponível em"
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name="Último erro"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Criada em"
+    )
+    sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Enviada em"
+    )
+    delivered_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Entregue em"
+    )
+
+    class Meta:
+        verbose_name = "Mensagem de WhatsApp"
+        verbose_name_plural = "Mensagens de WhatsApp"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['account', 'status', 'available_at'], name='whatsapp_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.to} ({self.get_status_display()})"
+
+
+class WhatsAppRateLimit(models.Model):
+    """Token bucket compartilhado entre workers para uma conta do provedor."""
+
+    account = models.CharField(
+        max_length=60,
+        unique=True,
+        verbose_name="Conta do provedor"
+    )
+    tokens = models.FloatField(
+        default=0,
+        verbose_name="Tokens disponíveis"
+    )
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Atualizado em"
+    )
+    paused_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Pausado até",
+        help_text="Definido quando o provedor responde 429"
+    )
+
+    class Meta:
+        verbose_name = "Limite de envio de WhatsApp"
+        verbose_name_plural = "Limites de envio de WhatsApp"
+
+    def __str__(self):
+        return self.account
+
+
+class WebhookSubscription(models.Model):
+    """Endpoint externo que recebe eventos de pedidos e sorteios."""
+
+    name = models.CharField(
+        max_length=120,
+        verbose_name="Nome"
+    )
+    url = models.URLField(
+        max_length=500,
+        verbose_name="URL"
+    )
+    secret = models.CharField(
+        max_length=120,
+        verbose_name="Segredo",
+        help_text="Usado para assinar o corpo com HMAC-SHA256"
+    )
+    event_types = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name="Eventos",
+        help_text="Lista de tipos de evento; vazio recebe todos"
+    )
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name="Ativa"
+    )
+    max_concurrency = models.PositiveSmallIntegerField(
+        default=2,
+        validators=[MinValueValidator(1)],
+        verbose_name="Lotes simultâneos"
+    )
+    batch_size = models.PositiveSmallIntegerField(
+        default=50,
+        validators=[MinValueValidator(1)],
+        verbose_name="Eventos por lote"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Criada em"
+    )
+
+    class Meta:
+        verbose_name = "Assinatura de webhook"
+        verbose_name_plural = "Assinaturas de webhook"
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    def wants(self, event_type):
+        """Indica se a assinatura recebe o tipo de evento."""
+        return not self.event_types or event_type in self.event_types
+
+
+class WebhookDelivery(models.Model):
+    """Entrega pendente/em andamento de um evento para uma assinatura."""
+    
+    PENDING = "pendente"
+    DELIVERING = "enviando"
+    DELIVERED = "entregue"
+    
+    STATUS_CHOICES = [
+        (PENDING, "Pendente"),
+        (DELIVERING, "Enviando"),
+        (DELIVERED, "Entregue"),
+    ]
+
+    subscription = models.ForeignKey(
+        WebhookSubscription,
+        on_delete=models.CASCADE,
+        related_name="deliveries",
+        verbose_name="Assinatura"
+    )
+    event_id = models.PositiveBigIntegerField(
+        verbose_name="ID do evento"
+    )
+    event_type = models.CharField(
+        max_length=60,
+        verbose_name="Tipo do evento"
+    )
+    payload = models.JSONField(
+        default=dict,
+        verbose_name="Dados"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        verbose_name="Status"
+    )
+    batch_id = models.CharField(
+        max_length=32,
+        blank=True,
+        verbose_name="Lote"
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Tentativas"
+    )
+    available_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Disponível em"
+    )
+    locked_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Reservada até"
+    )
+    last_status_code = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Último HTTP status"
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name="Último erro"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Criada em"
+    )
+    delivered_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Entregue em"
+    )
+
+    class Meta:
+        verbose_name = "Entrega de webhook"
+        verbose_name_plural = "Entregas de webhook"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['subscription', 'status', 'available_at'], name='webhook_delivery_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} → {self.subscription} ({self.get_status_display()})"
+
+
+class WebhookDeadLetter(models.Model):
+    """Evento que esgotou as tentativas de entrega a uma assinatura."""
+
+    subscription = models.ForeignKey(
+        WebhookSubscription,
+        on_delete=models.CASCADE,
+        related_name="dead_letters",
+        verbose_name="Assinatura"
+    )
+    event_id = models.PositiveBigIntegerField(
+        verbose_name="ID do evento"
+    )
+    event_type = models.CharField(
+        max_length=60,
+        verbose_name="Tipo do evento"
+    )
+    payload = models.JSONField(
+        default=dict,
+        verbose_name="Dados"
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Tentativas"
+    )
+    last_status_code = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Último HTTP status"
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name="Último erro"
+    )
+    failed_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Falhou em"
+    )
+
+    class Meta:
+        verbose_name = "Webhook não entregue"
+        verbose_name_plural = "Webhooks não entregues"
+        ordering = ['-failed_at']
+
+    def __str__(self):
+        return f"{self.event_type} → {self.subscription}"
+
+
+class ReceiptBlob(models.Model):
+    """Arquivo de comprovante endereçado pelo conteúdo (um por SHA-256)."""
+
+    sha256 = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name="SHA-256"
+    )
+    file = models.FileField(
+        upload_to="receipts/",
+        storage=protected_storage,
+        verbose_name="Arquivo"
+    )
+    content_type = models.CharField(
+        max_length=60,
+        verbose_name="Tipo de conteúdo"
+    )
+    size = models.PositiveIntegerField(
+        verbose_name="Tamanho (bytes)"
+    )
+    thumbnail = models.FileField(
+        upload_to="receipts/thumbs/",
+        storage=protected_storage,
+        blank=True,
+        verbose_name="Miniatura"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Criado em"
+    )
+
+    class Meta:
+        verbose_name = "Arquivo de comprovante"
+        verbose_name_plural = "Arquivos de comprovante"
+
+    def __str__(self):
+        return self.sha256
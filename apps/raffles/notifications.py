@@ -0,0 +1,191 @@
+"""
+Notificações em massa aos participantes de um produto.
+
+Os destinatários são divididos em blocos; cada bloco é uma task do Celery
+que abre uma única conexão SMTP (`get_connection`) e envia todas as
+mensagens por ela. Falhas são registradas por destinatário e apenas esses
+e-mails são reenviados depois, com espera exponencial.
+"""
+import logging
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Count, Max, Q
+
+from .models import Order, Product, Quota
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_CHUNK_SIZE = 500
+MAX_SEND_ATTEMPTS = 4
+RETRY_BASE_SECONDS = 60
+
+
+def participant_email_chunks(product_id, chunk_size=NOTIFICATION_CHUNK_SIZE):
+    """
+    Gera blocos de e-mails distintos dos participantes confirmados.
+
+    Args:
+        product_id: ID do produto
+        chunk_size: Tamanho de cada bloco
+
+    Yields:
+        list: E-mails (ordenados) de um bloco
+    """
+    emails = (
+        Order.objects
+        .filter(product_id=product_id, status=Order.CONFIRMED)
+        # Pedidos só com WhatsApp não têm e-mail
+        .exclude(email__isnull=True)
+        .exclude(email="")
+        .order_by("email")
+        .values_list("email", flat=True)
+        .distinct()
+        .iterator(chunk_size=chunk_size)
+    )
+
+    chunk = []
+    for email in emails:
+        chunk.append(email)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def build_draw_messages(product, emails, connection=None):
+    """
+    Monta as mensagens de resultado do sorteio para um bloco de e-mails.
+
+    Usa uma única query agregada para nome e quantidade de cotas de cada
+    participante do bloco.
+
+    Returns:
+        list: Pares (e-mail, EmailMessage)
+    """
+    winner_order_id = (
+        Quota.objects
+        .filter(product=product, number=product.drawn_number)
+        .values_list("order_id", flat=True)
+        .first()
+    )
+    is_winner = Q(id=winner_order_id) if winner_order_id else Q(pk__in=[])
+
+    participants = (
+        Order.objects
+        .filter(product=product, status=Order.CONFIRMED, email__in=emails)
+        .values("email")
+        .annotate(
+            name=Max("full_name"),
+            quotas=Count("quota", distinct=True),
+            winner=Count("id", filter=is_winner),
+        )
+        .order_by("email")
+    )
+
+    messages = []
+    for participant in participants:
+        if participant["winner"]:
+            subject = f"Sorteio Realizado - {product.title} - Você ganhou!"
+            body = (
+                f"Olá {participant['name']},\n\n"
+                f"Parabéns! Você ganhou o sorteio de {product.title}!\n\n"
+                f"Número sorteado: {product.drawn_number}\n\n"
+                f"Entre em contato conosco para receber seu prêmio.\n\n"
+                f"Atenciosamente,\nEquipe Sistema de Cotas\n"
+            )
+        else:
+            subject = f"Sorteio Realizado - {product.title}"
+            body = (
+                f"Olá {participant['name']},\n\n"
+                f"O sorteio de {product.title} foi realizado.\n\n"
+                f"Número sorteado: {product.drawn_number}\n"
+                f"Suas cotas: {participant['quotas']}\n\n"
+                f"Obrigado por participar! Confira os próximos sorteios em nosso site.\n\n"
+                f"Atenciosamente,\nEquipe Sistema de Cotas\n"
+            )
+        messages.append((
+            participant["email"],
+            EmailMessage(
+                subject,
+                body,
+                settings.DEFAULT_FROM_EMAIL,
+                [participant["email"]],
+                connection=connection,
+            ),
+        ))
+    return messages
+
+
+def send_pooled(messages):
+    """
+    Envia as mensagens por uma única conexão, uma a uma.
+
+    Se um envio falhar, a conexão é reaberta e a chave da mensagem é
+    marcada como falha, sem interromper o restante do bloco.
+
+    Args:
+        messages: Pares (chave, EmailMessage); a chave identifica a
+            mensagem nas falhas (e-mail, ID do evento...)
+
+    Returns:
+        tuple: (enviados, lista de chaves com falha)
+    """
+    if not messages:
+        return 0, []
+
+    connection = get_connection(fail_silently=False)
+    sent = 0
+    failed = []
+
+    connection.open()
+    try:
+        for key, message in messages:
+            message.connection = connection
+            try:
+                sent += connection.send_messages([message]) or 0
+            except Exception as e:
+                logger.warning(f"Falha ao enviar e-mail ({key}): {str(e)}")
+                failed.append(key)
+                connection.close()
+                connection.open()
+    finally:
+        connection.close()
+
+    return sent, failed
+
+
+def send_draw_notifications_chunk(product_id, emails):
+    """
+    Envia o resultado do sorteio para um bloco de participantes.
+
+    Returns:
+        tuple: (enviados, lista de e-mails com falha)
+    """
+    product = Product.objects.get(id=product_id)
+    if product.drawn_number is None:
+        logger.error(f"Produto {product_id} não tem número sorteado")
+        return 0, []
+
+    return send_pooled(build_draw_messages(product, emails))
+
+
+def notify_draw_participants(product_id):
+    """
+    Agenda a notificação do resultado do sorteio aos participantes.
+
+    Returns:
+        bool: True se a task foi enviada ao Celery
+    """
+    from .tasks import notify_draw_participants_task
+
+    try:
+        notify_draw_participants_task.apply_async(args=[product_id], retry=False)
+        return True
+    except Exception as e:
+        logger.error(
+            f"Não foi possível agendar as notificações do sorteio do "
+            f"produto {product_id}: {str(e)}"
+        )
+        return False
@@ -0,0 +1,388 @@
+"""
+Outbox transacional de eventos de pedidos e sorteios.
+
+`publish_event` grava um `OutboxEvent` por destino habilitado, na mesma
+transação da operação de negócio: se a transação for desfeita, nenhum
+evento é emitido, e a requisição nunca espera pela entrega. O
+dispatcher (`dispatch_outbox`) reserva os pendentes em lotes com
+`SELECT ... FOR UPDATE SKIP LOCKED` numa transação curta, entrega fora
+dela (agrupando por destino) e grava os resultados, com novas tentativas
+exponenciais.
+
+Destinos são habilitados em `settings.OUTBOX_SINKS`. O destino `local`
+apenas registra os eventos em memória e no log, permitindo exercitar todo
+o fluxo sem rede.
+"""
+import logging
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# Tipos de evento
+ORDER_RESERVED = "order.reserved"
+ORDER_CONFIRMED = "order.confirmed"
+ORDER_CANCELED = "order.canceled"
+ORDER_EXPIRED = "order.expired"
+DRAW_COMPLETED = "draw.completed"
+
+DISPATCH_BATCH_SIZE = 100
+MAX_ATTEMPTS = 8
+RETRY_BASE_SECONDS = 30
+LEASE_SECONDS = 300  # Reserva de um lote; vencida, outro dispatcher o retoma
+
+SINKS = {}
+
+
+def register_sink(cls):
+    """Registra uma classe de destino pelo seu `name`."""
+    SINKS[cls.name] = cls()
+    return cls
+
+
+class OutboxSink:
+    """
+    Destino de entrega de eventos.
+
+    Subclasses definem `name`, os `event_types` tratados (vazio = todos) e
+    `deliver`, que recebe um lote de eventos e devolve um dicionário
+    `{event_id: mensagem de erro}` com as falhas.
+    """
+
+    name = ""
+    event_types = ()
+
+    def handles(self, event_type):
+        return not self.event_types or event_type in self.event_types
+
+    def is_configured(self):
+        return True
+
+    def deliver(self, events):
+        raise NotImplementedError
+
+
+def enabled_sinks():
+    """Destinos habilitados em `OUTBOX_SINKS` e configurados."""
+    names = getattr(settings, "OUTBOX_SINKS", ["email"])
+    return [
+        SINKS[name] for name in names
+        if name in SINKS and SINKS[name].is_configured()
+    ]
+
+
+def order_payload(order, **extra):
+    """Dados de um pedido usados nos eventos."""
+    return {
+        "order_id": order.id,
+        "product_id": order.product_id,
+        "status": order.status,
+        "full_name": order.full_name,
+        "email": order.email,
+        "whatsapp": order.whatsapp,
+        "quantity": order.quantity,
+        "total_price_cents": order.total_price_cents,
+        **extra,
+    }
+
+
+def publish_event(event_type, payload):
+    """
+    Grava o evento para cada destino habilitado que o trata.
+
+    Deve ser chamada dentro da transação da operação que gerou o evento.
+
+    Returns:
+        int: Número de eventos gravados
+    """
+    return publish_events([(event_type, payload)])
+
+
+def publish_events(events):
+    """
+    Versão em lote de `publish_event` (um único INSERT).
+
+    Args:
+        events: Pares (tipo do evento, dados)
+
+    Returns:
+        int: Número de eventos gravados
+    """
+    sinks = enabled_sinks()
+    rows = [
+        OutboxEvent(event_type=event_type, sink=sink.name, payload=payload)
+        for event_type, payload in events
+        for sink in sinks
+        if sink.handles(event_type)
+    ]
+    OutboxEvent.objects.bulk_create(rows)
+    return len(rows)
+
+
+def claim_events(batch_size=DISPATCH_BATCH_SIZE):
+    """
+    Reserva um lote de eventos pendentes.
+
+    Os eventos são bloqueados (SKIP LOCKED) só durante a reserva, que
+    adia `available_at` por `LEASE_SECONDS`: outros dispatchers não os
+    pegam enquanto são entregues, e se este processo morrer no meio da
+    entrega o lote volta a ficar disponível quando a reserva vencer.
+
+    Returns:
+        list: Eventos reservados
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=OutboxEvent.PENDING, available_at__lte=now)
+            .order_by("id")[:batch_size]
+        )
+        OutboxEvent.objects.filter(id__in=[event.id for event in events]).update(
+            available_at=now + timezone.timedelta(seconds=LEASE_SECONDS)
+        )
+    return events
+
+
+def dispatch_outbox(batch_size=DISPATCH_BATCH_SIZE):
+    """
+    Entrega um lote de eventos pendentes.
+
+    A entrega (SMTP, HTTP) acontece fora de qualquer transação; vários
+    dispatchers podem rodar em paralelo sem duplicar entregas.
+
+    Returns:
+        tuple: (entregues, falhas)
+    """
+    events = claim_events(batch_size)
+    delivered = failed = 0
+
+    by_sink = {}
+    for event in events:
+        by_sink.setdefault(event.sink, []).append(event)
+
+    for sink_name, sink_events in by_sink.items():
+        sink = SINKS.get(sink_name)
+        if sink is None:
+            errors = {event.id: f"Destino desconhecido: {sink_name}" for event in sink_events}
+        else:
+            try:
+                errors = sink.deliver(sink_events)
+            except Exception as e:
+                logger.error(f"Erro no destino {sink_name}: {str(e)}")
+                errors = {event.id: str(e) for event in sink_events}
+
+        now = timezone.now()
+        for event in sink_events:
+            event.attempts += 1
+            if event.id in errors:
+                failed += 1
+                event.last_error = errors[event.id]
+                if event.attempts >= MAX_ATTEMPTS:
+                    event.status = OutboxEvent.FAILED
+                    logger.error(
+                        f"Evento {event.id} ({event.event_type} → {sink_name}) "
+                        f"descartado após {event.attempts} tentativas"
+                    )
+                else:
+                    event.available_at = now + timezone.timedelta(
+                        seconds=RETRY_BASE_SECONDS * 2 ** (event.attempts - 1)
+                    )
+            else:
+                delivered += 1
+                event.status = OutboxEvent.DELIVERED
+                event.delivered_at = now
+                event.last_error = ""
+
+        # Resultado gravado por destino: um destino lento não atrasa os demais
+        OutboxEvent.objects.bulk_update(
+            sink_events,
+            ["status", "attempts", "available_at", "last_error", "delivered_at"]
+        )
+
+    if events:
+        logger.info(f"Outbox: {delivered} evento(s) entregue(s), {failed} falha(s)")
+    return delivered, failed
+
+
+def dispatch_pending(batch_size=DISPATCH_BATCH_SIZE, max_batches=None):
+    """
+    Entrega lotes até não haver mais eventos disponíveis.
+
+    Returns:
+        tuple: (entregues, falhas)
+    """
+    total_delivered = total_failed = batches = 0
+    while max_batches is None or batches < max_batches:
+        delivered, failed = dispatch_outbox(batch_size)
+        total_delivered += delivered
+        total_failed += failed
+        batches += 1
+        if delivered + failed < batch_size:
+            break
+    return total_delivered, total_failed
+
+
+# Destinos
+
+@register_sink
+class LocalSink(OutboxSink):
+    """Destino de desenvolvimento: guarda os eventos em memória e no log."""
+
+    name = "local"
+
+    def __init__(self):
+        self.delivered = []
+
+    def deliver(self, events):
+        for event in events:
+            self.delivered.append((event.event_type, event.payload))
+            logger.info(f"[outbox local] {event.event_type}: {event.payload}")
+        return {}
+
+
+@register_sink
+class EmailSink(OutboxSink):
+    """E-mails transacionais de pedidos e resultado de sorteios."""
+
+    name = "email"
+    event_types = (ORDER_CONFIRMED, ORDER_CANCELED, DRAW_COMPLETED)
+
+    def deliver(self, events):
+        from .notifications import send_pooled, notify_draw_participants
+
+        errors = {}
+        messages = []
+        for event in events:
+            if event.event_type == DRAW_COMPLETED:
+                product_id = event.payload["product_id"]
+                if not notify_draw_participants(product_id):
+                    # Sem Celery, o próprio dispatcher envia os blocos
+                    failed = self._send_draw_inline(product_id)
+                    if failed:
+                        errors[event.id] = f"Falha no envio para {len(failed)} participante(s)"
+            elif event.payload.get("email"):
+                messages.append((event.id, self._order_message(event)))
+
+        _, failed = send_pooled(messages)
+        for event_id in failed:
+            errors[event_id] = "Falha no envio do e-mail"
+        return errors
+
+    def _send_draw_inline(self, product_id):
+        from .notifications import participant_email_chunks, send_draw_notifications_chunk
+
+        failed = []
+        for emails in participant_email_chunks(product_id):
+            failed += send_draw_notifications_chunk(product_id, emails)[1]
+        return failed
+
+    def _order_message(self, event):
+        data = event.payload
+        if event.event_type == ORDER_CONFIRMED:
+            if data.get("numbers"):
+                quotas = ", ".join(str(number) for number in data["numbers"])
+            else:
+                quotas = f"{data['quantity']} cota(s)"
+            subject = f"Pedido #{data['order_id']} confirmado - Sistema de Cotas"
+            body = (
+                f"Olá {data['full_name']},\n\n"
+                f"Seu pedido #{data['order_id']} foi confirmado!\n"
+                f"Suas cotas: {quotas}\n\n"
+                f"Suas cotas estão garantidas para o sorteio.\n\n"
+                f"Atenciosamente,\nEquipe Sistema de Cotas\n"
+            )
+        else:
+            subject = f"Pedido #{data['order_id']} cancelado - Sistema de Cotas"
+            body = (
+                f"Olá {data['full_name']},\n\n"
+                f"Seu pedido #{data['order_id']} foi cancelado e as cotas foram liberadas.\n\n"
+                f"Atenciosamente,\nEquipe Sistema de Cotas\n"
+            )
+        return EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [data["email"]])
+
+
+@register_sink
+class WhatsAppSink(OutboxSink):
+    """Coloca mensagens na fila de WhatsApp (enviada com limite de taxa)."""
+
+    name = "whatsapp"
+    event_types = (ORDER_RESERVED, ORDER_CONFIRMED, ORDER_CANCELED, DRAW_COMPLETED)
+
+    TEMPLATES = {
+        ORDER_RESERVED: "Olá {full_name}! Seu pedido #{order_id} foi reservado. Envie o comprovante para garantir suas cotas.",
+        ORDER_CONFIRMED: "Olá {full_name}! Seu pedido #{order_id} foi confirmado. Boa sorte!",
+        ORDER_CANCELED: "Olá {full_name}, seu pedido #{order_id} foi cancelado.",
+    }
+
+    def is_configured(self):
+        from .whatsapp import get_provider
+
+        return get_provider() is not None
+
+    def deliver(self, events):
+        from .whatsapp import enqueue_messages
+
+        for event in events:
+            data = event.payload
+            if event.event_type == DRAW_COMPLETED:
+                enqueue_messages(self._draw_messages(data), event_type=event.event_type)
+            elif data.get("whatsapp"):
+                enqueue_messages(
+                    [(data["whatsapp"], self.TEMPLATES[event.event_type].format(**data), data["order_id"])],
+                    event_type=event.event_type
+                )
+        return {}
+
+    def _draw_messages(self, data):
+        """Uma mensagem por número de WhatsApp dos participantes confirmados."""
+        from .models import Order
+
+        participants = (
+            Order.objects
+            .filter(product_id=data["product_id"], status=Order.CONFIRMED)
+            .exclude(whatsapp="")
+            .order_by("id")
+            .values_list("id", "full_name", "whatsapp")
+            .iterator(chunk_size=2000)
+        )
+        seen = set()
+        for order_id, full_name, whatsapp in participants:
+            if whatsapp in seen:
+                continue
+            seen.add(whatsapp)
+            if order_id == data["winning_order_id"]:
+                body = (
+                    f"Parabéns, {full_name}! Você ganhou o sorteio de {data['product']} "
+                    f"com o número {data['drawn_number']}!"
+                )
+            else:
+                body = (
+                    f"Olá {full_name}! O sorteio de {data['product']} foi realizado. "
+                    f"Número sorteado: {data['drawn_number']}."
+                )
+            yield whatsapp, body, order_id
+
+
+@register_sink
+class WebhookSink(OutboxSink):
+    """
+    Cria as entregas para as assinaturas de webhook ativas.
+
+    O envio HTTP (lotes assinados, concorrência por endpoint, novas
+    tentativas e fila de não entregues) fica em `webhooks.py`.
+    """
+
+    name = "webhook"
+
+    def deliver(self, events):
+        from .webhooks import fan_out
+
+        fan_out(events)
+        return {}
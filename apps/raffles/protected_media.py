@@ -0,0 +1,86 @@
+"""
+Arquivos de mídia protegidos (comprovantes e miniaturas).
+
+Os arquivos continuam em `MEDIA_ROOT`, mas suas URLs apontam para
+`PROTECTED_MEDIA_URL`, atendida pela view `protected_media`. Só recebem o
+arquivo membros da equipe ou quem tiver um token assinado para aquele
+arquivo (o dono do pedido). Com `PROTECTED_MEDIA_ACCEL_PREFIX` definido, a
+transferência é entregue ao nginx via `X-Accel-Redirect` (sendfile, sem
+ocupar um worker); sem ele, o Django envia com `FileResponse`.
+"""
+import mimetypes
+import os
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, HttpResponse
+from django.urls import reverse
+from django.utils.http import urlencode
+
+# Prefixos do storage que podem ser servidos pela view
+PROTECTED_PREFIXES = ("receipts/",)
+
+_signer = signing.TimestampSigner(salt="raffles.protected-media")
+
+
+class ProtectedMediaStorage(FileSystemStorage):
+    """Storage em `MEDIA_ROOT` com URLs da view de mídia protegida."""
+
+    def url(self, name):
+        return reverse("raffles:protected_media", args=[name])
+
+
+def protected_storage():
+    """Storage dos campos de comprovante (callable, fora das migrações)."""
+    return ProtectedMediaStorage()
+
+
+def media_token(name):
+    """Token assinado que libera o acesso a um arquivo."""
+    return _signer.sign(name)[len(name) + 1:]
+
+
+def signed_media_url(name):
+    """URL do arquivo com token para quem não é da equipe."""
+    return f"{reverse('raffles:protected_media', args=[name])}?{urlencode({'t': media_token(name)})}"
+
+
+def has_media_access(request, name):
+    """Verifica se a requisição pode baixar o arquivo."""
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+
+    token = request.GET.get("t", "")
+    if not token:
+        return False
+    try:
+        _signer.unsign(f"{name}:{token}", max_age=settings.PROTECTED_MEDIA_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def media_response(name):
+    """
+    Resposta que entrega o arquivo.
+
+    Args:
+        name: Nome do arquivo no storage (já autorizado)
+
+    Returns:
+        HttpResponse: `X-Accel-Redirect` para o nginx ou `FileResponse`
+    """
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    accel_prefix = getattr(settings, "PROTECTED_MEDIA_ACCEL_PREFIX", "")
+
+    if accel_prefix:
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = f"{accel_prefix.rstrip('/')}/{name}"
+    else:
+        response = FileResponse(protected_storage().open(name, "rb"), content_type=content_type)
+
+    response["Content-Disposition"] = f'inline; filename="{os.path.basename(name)}"'
+    response["Cache-Control"] = "private, max-age=3600"
+    response["X-Content-Type-Options"] = "nosniff"
+    return response
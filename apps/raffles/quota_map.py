@@ -0,0 +1,151 @@
+"""
+Mapa binário compacto do status das cotas de um produto.
+
+Cada número ocupa 2 bits, quatro números por byte. O número `n` fica no
+byte `(n - 1) // 4`, deslocado `((n - 1) % 4) * 2` bits a partir do bit
+menos significativo. Um milhão de cotas cabem em ~250 KB antes da
+compressão.
+"""
+import gzip
+import hashlib
+
+from django.core.cache import cache
+
+from .models import Quota
+
+try:
+    import brotli
+except ImportError:  # Dependência opcional
+    brotli = None
+
+# Códigos de 2 bits por status
+CODE_MISSING = 0
+CODE_AVAILABLE = 1
+CODE_RESERVED = 2
+CODE_SOLD = 3
+
+STATUS_CODES = {
+    Quota.AVAILABLE: CODE_AVAILABLE,
+    Quota.RESERVED: CODE_RESERVED,
+    Quota.SOLD: CODE_SOLD,
+}
+
+ENCODING_DESCRIPTION = "2bit-le; 0=inexistente,1=disponivel,2=reservada,3=vendida"
+CACHE_SECONDS = 5
+ITERATOR_CHUNK_SIZE = 10000
+
+# Byte com quatro cotas disponíveis (01 01 01 01)
+_ALL_AVAILABLE = 0b01010101
+
+
+class QuotaMap:
+    """Mapa empacotado com ETag e variantes comprimidas."""
+
+    def __init__(self, total, data):
+        self.total = total
+        self.data = bytes(data)
+        self.etag = '"%s"' % hashlib.sha256(self.data).hexdigest()[:32]
+        self._encoded = {}
+
+    def encoded(self, encoding):
+        """Retorna o mapa comprimido com `gzip` ou `br` (memorizado)."""
+        if encoding not in self._encoded:
+            if encoding == "br":
+                self._encoded[encoding] = brotli.compress(self.data)
+            else:
+                self._encoded[encoding] = gzip.compress(self.data, compresslevel=6)
+        return self._encoded[encoding]
+
+
+def _set_code(buffer, number, code):
+    index = number - 1
+    shift = (index % 4) * 2
+    byte = index // 4
+    buffer[byte] = (buffer[byte] & ~(0b11 << shift)) | (code << shift)
+
+
+def build_quota_map(product):
+    """
+    Gera o mapa empacotado de um produto.
+
+    Quando todas as cotas existem, parte de um buffer "tudo disponível" e
+    lê apenas as cotas reservadas/vendidas; caso contrário percorre todas
+    as cotas do produto.
+
+    Args:
+        product: Instância do produto
+
+    Returns:
+        QuotaMap: Mapa empacotado
+    """
+    total = product.total_quotas
+    size = (total + 3) // 4
+    quotas = Quota.objects.filter(product=product, number__lte=total)
+
+    if quotas.count() == total:
+        buffer = bytearray([_ALL_AVAILABLE]) * size
+        rows = quotas.exclude(status=Quota.AVAILABLE)
+    else:
+        buffer = bytearray(size)
+        rows = quotas
+
+    for number, status in rows.values_list("number", "status").iterator(
+        chunk_size=ITERATOR_CHUNK_SIZE
+    ):
+        _set_code(buffer, number, STATUS_CODES.get(status, CODE_MISSING))
+
+    # Zera os bits de preenchimento após o último número
+    for number in range(total + 1, size * 4 + 1):
+        _set_code(buffer, number, CODE_MISSING)
+
+    return QuotaMap(total, buffer)
+
+
+def get_quota_map(product):
+    """
+    Retorna o mapa do produto, reaproveitando o cache por alguns segundos.
+
+    Args:
+        product: Instância do produto
+
+    Returns:
+        QuotaMap: Mapa empacotado
+    """
+    key = f"raffles:quota-map:{product.pk}:{product.total_quotas}"
+    quota_map = cache.get(key)
+    if quota_map is None:
+        quota_map = build_quota_map(product)
+        quota_map.encoded("gzip")
+        cache.set(key, quota_map, CACHE_SECONDS)
+    return quota_map
+
+
+def parse_range(header, length):
+    """
+    Interpreta um cabeçalho `Range: bytes=a-b` com um único intervalo.
+
+    Returns:
+        tuple | None: (início, fim inclusivo) ou None se ausente/inválido
+
+    Raises:
+        ValueError: Se o intervalo não puder ser satisfeito
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+
+    start, _, end = header[len("bytes="):].strip().partition("-")
+    try:
+        if start == "":
+            # Sufixo: últimos N bytes
+            suffix = int(end)
+            if suffix <= 0:
+                raise ValueError("Intervalo inválido")
+            return max(length - suffix, 0), length - 1
+        start = int(start)
+        end = int(end) if end else length - 1
+    except ValueError:
+        return None
+
+    if start >= length or end < start:
+        raise ValueError("Intervalo inválido")
+    return start, min(end, length - 1)
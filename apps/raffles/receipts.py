@@ -0,0 +1,318 @@
+"""
+Upload e armazenamento de comprovantes de pagamento.
+
+Os uploads são gravados em arquivo temporário em blocos pelo
+`HashingUploadHandler`, que calcula o SHA-256 incrementalmente e guarda
+os primeiros bytes para identificar o tipo real do arquivo (assinatura
+"mágica"), em vez de confiar na extensão.
+
+Os arquivos são armazenados pelo conteúdo em
+`receipts/sha256/<aa>/<sha256>.<ext>`, indexados por `ReceiptBlob`: o
+mesmo comprovante enviado em pedidos diferentes é guardado uma vez e o
+pedido é sinalizado como duplicado na hora (`Order.receipt_sha256`).
+
+Cada arquivo novo ganha uma miniatura gerada em segundo plano
+(`receipt_thumbnail`), usada na fila de revisão de comprovantes; para PDFs
+é renderizada a primeira página quando `pypdfium2` está instalado.
+"""
+import hashlib
+import io
+import logging
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.urls import reverse
+from django.utils import timezone
+
+from .jobs import enqueue_job
+from .models import AdminLog, Order, ReceiptBlob
+from .protected_media import protected_storage
+
+try:
+    import pypdfium2
+except ImportError:  # Dependência opcional (miniaturas de PDF)
+    pypdfium2 = None
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_MAX_SIZE = 10 * 1024 * 1024  # 10MB
+SNIFF_BYTES = 16
+THUMBNAIL_SIZE = (480, 640)
+THUMBNAIL_QUALITY = 80
+REVIEW_PAGE_SIZE = 25
+
+# Extensão -> (assinatura inicial, content type)
+RECEIPT_TYPES = {
+    "pdf": (b"%PDF-", "application/pdf"),
+    "jpg": (b"\xff\xd8\xff", "image/jpeg"),
+    "png": (b"\x89PNG\r\n\x1a\n", "image/png"),
+}
+
+
+def sniff_type(head):
+    """
+    Identifica o tipo do comprovante pelos primeiros bytes.
+
+    Returns:
+        str | None: Extensão (pdf, jpg, png) ou None se não reconhecido
+    """
+    for ext, (magic, _) in RECEIPT_TYPES.items():
+        if head.startswith(magic):
+            return ext
+    return None
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """
+    Grava o upload em arquivo temporário calculando o SHA-256 por bloco.
+
+    O arquivo resultante ganha os atributos `sha256` e `sniffed_type`.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._sha256 = hashlib.sha256()
+        self._head = b""
+
+    def receive_data_chunk(self, raw_data, start):
+        self._sha256.update(raw_data)
+        if len(self._head) < SNIFF_BYTES:
+            self._head += raw_data[:SNIFF_BYTES - len(self._head)]
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self._sha256.hexdigest()
+        file.sniffed_type = sniff_type(self._head)
+        return file
+
+
+def _digest(uploaded):
+    """SHA-256 e tipo do arquivo, reaproveitando o cálculo do upload handler."""
+    if getattr(uploaded, "sha256", None):
+        return uploaded.sha256, uploaded.sniffed_type
+
+    sha256 = hashlib.sha256()
+    head = b""
+    uploaded.seek(0)
+    for chunk in uploaded.chunks():
+        sha256.update(chunk)
+        if len(head) < SNIFF_BYTES:
+            head += chunk[:SNIFF_BYTES - len(head)]
+    uploaded.seek(0)
+    uploaded.sha256 = sha256.hexdigest()
+    uploaded.sniffed_type = sniff_type(head)
+    return uploaded.sha256, uploaded.sniffed_type
+
+
+def validate_receipt(uploaded):
+    """
+    Valida tamanho e tipo real de um comprovante.
+
+    Raises:
+        ValidationError: Se o arquivo for grande demais ou não for PDF/JPG/PNG
+    """
+    if uploaded.size > RECEIPT_MAX_SIZE:
+        raise ValidationError(
+            "Arquivo muito grande. Tamanho máximo permitido: 10MB"
+        )
+
+    _, ext = _digest(uploaded)
+    if ext is None:
+        raise ValidationError(
+            "Tipo de arquivo não permitido. "
+            "Use apenas PDF, JPG ou PNG."
+        )
+
+
+def receipt_path(sha256, ext):
+    """Caminho endereçado pelo conteúdo de um comprovante."""
+    return f"receipts/sha256/{sha256[:2]}/{sha256}.{ext}"
+
+
+def store_receipt(uploaded):
+    """
+    Armazena um comprovante uma única vez por conteúdo.
+
+    Args:
+        uploaded: Arquivo enviado
+
+    Returns:
+        ReceiptBlob: Registro do arquivo (existente ou recém-criado)
+
+    Raises:
+        ValidationError: Se o arquivo não for um comprovante válido
+    """
+    validate_receipt(uploaded)
+    sha256, ext = _digest(uploaded)
+    blob = ReceiptBlob.objects.filter(sha256=sha256).first()
+    if blob:
+        return blob
+
+    storage = protected_storage()
+    path = receipt_path(sha256, ext)
+    if not storage.exists(path):
+        saved = storage.save(path, uploaded)
+        if saved != path:
+            # Outro upload gravou o mesmo conteúdo ao mesmo tempo
+            storage.delete(saved)
+
+    try:
+        with transaction.atomic():
+            blob = ReceiptBlob.objects.create(
+                sha256=sha256,
+                file=path,
+                content_type=RECEIPT_TYPES[ext][1],
+                size=uploaded.size,
+            )
+    except IntegrityError:
+        return ReceiptBlob.objects.get(sha256=sha256)
+
+    enqueue_job("receipt_thumbnail", {"blob_id": blob.id})
+    return blob
+
+
+def _first_page_image(blob):
+    """Imagem Pillow do comprovante (primeira página, para PDFs)."""
+    from PIL import Image
+
+    if blob.content_type != "application/pdf":
+        with blob.file.open("rb") as f:
+            image = Image.open(f)
+            image.load()
+        return image
+
+    if pypdfium2 is None:
+        return None
+    with blob.file.open("rb") as f:
+        pdf = pypdfium2.PdfDocument(f.read())
+    try:
+        return pdf[0].render(scale=1.5).to_pil()
+    finally:
+        pdf.close()
+
+
+def generate_receipt_thumbnail(blob_id):
+    """
+    Gera a miniatura JPEG de um comprovante.
+
+    Returns:
+        str: Nome da miniatura no storage ("" se não foi possível gerar)
+    """
+    from PIL import ImageOps
+
+    blob = ReceiptBlob.objects.get(id=blob_id)
+    if blob.thumbnail:
+        return blob.thumbnail.name
+
+    image = _first_page_image(blob)
+    if image is None:
+        logger.info(f"Sem miniatura para o comprovante {blob.sha256} (pypdfium2 ausente)")
+        return ""
+
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    image.thumbnail(THUMBNAIL_SIZE)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+
+    blob.thumbnail.save(f"{blob.sha256}.jpg", ContentFile(buffer.getvalue()), save=False)
+    blob.save(update_fields=["thumbnail"])
+    return blob.thumbnail.name
+
+
+def attach_receipt(order, uploaded):
+    """
+    Armazena o comprovante e o associa ao pedido (sem salvar o pedido).
+
+    Returns:
+        ReceiptBlob: Registro do arquivo
+    """
+    blob = store_receipt(uploaded)
+    order.receipt = blob.file.name
+    order.receipt_sha256 = blob.sha256
+    return blob
+
+
+def duplicate_receipt_orders(order):
+    """IDs de outros pedidos com o mesmo comprovante."""
+    if not order.receipt_sha256:
+        return []
+    return list(
+        Order.objects
+        .filter(receipt_sha256=order.receipt_sha256)
+        .exclude(id=order.id)
+        .order_by("id")
+        .values_list("id", flat=True)[:50]
+    )
+
+
+def flag_duplicate_receipt(order):
+    """
+    Registra no AdminLog quando o comprovante do pedido já foi usado.
+
+    Returns:
+        list: IDs dos outros pedidos com o mesmo comprovante
+    """
+    duplicates = duplicate_receipt_orders(order)
+    if duplicates:
+        AdminLog.objects.create(
+            admin_id="system",
+            action="receipt_duplicate",
+            details={
+                "order_id": order.id,
+                "receipt_sha256": order.receipt_sha256,
+                "other_orders": duplicates,
+            }
+        )
+        logger.warning(
+            f"Comprovante do pedido {order.id} já usado nos pedidos {duplicates}"
+        )
+    return duplicates
+
+
+def review_queue(after_id=0, limit=REVIEW_PAGE_SIZE):
+    """
+    Próximos pedidos aguardando revisão de comprovante (mais antigos primeiro).
+
+    Usa paginação por cursor (`after_id`) e busca miniaturas e contagem de
+    duplicados em uma consulta cada.
+
+    Returns:
+        list: Itens serializáveis em JSON
+    """
+    orders = list(
+        Order.objects
+        .filter(status=Order.WAITING_PROOF, id__gt=after_id)
+        .select_related("product")
+        .order_by("id")[:limit]
+    )
+    hashes = {order.receipt_sha256 for order in orders if order.receipt_sha256}
+    blobs = {blob.sha256: blob for blob in ReceiptBlob.objects.filter(sha256__in=hashes)}
+    usage = dict(
+        Order.objects
+        .filter(receipt_sha256__in=hashes)
+        .values("receipt_sha256")
+        .annotate(total=Count("id"))
+        .values_list("receipt_sha256", "total")
+    )
+
+    items = []
+    for order in orders:
+        blob = blobs.get(order.receipt_sha256)
+        items.append({
+            "id": order.id,
+            "full_name": order.full_name,
+            "product": order.product.title,
+            "quantity": order.quantity,
+            "total": order.total_price_display,
+            "created_at": timezone.localtime(order.created_at).strftime("%d/%m/%Y %H:%M"),
+            "receipt_url": order.receipt.url if order.receipt else "",
+            "thumbnail_url": blob.thumbnail.url if blob and blob.thumbnail else "",
+            "content_type": blob.content_type if blob else "",
+            "duplicates": usage.get(order.receipt_sha256, 1) - 1,
+            "detail_url": reverse("raffles:admin_order_detail", args=[order.id]),
+        })
+    return items
@@ -3,15 +3,35 @@ Serviços para alocação e gerenciamento de cotas.
 """
 import secrets
 import logging
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import Count, Max
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
 from .models import Product, Order, Quota, AdminLog
+from .draw_snapshot import write_draw_snapshot
+from .outbox import (
+    publish_event, publish_events, order_payload,
+    ORDER_RESERVED, ORDER_CONFIRMED, ORDER_CANCELED, ORDER_EXPIRED, DRAW_COMPLETED
+)
 
 logger = logging.getLogger(__name__)
 
 # Configurações
 RESERVE_MINUTES = 15  # Tempo de reserva em minutos
+BULK_BATCH_SIZE = 1000  # Tamanho dos lotes em operações em massa
+QUOTA_INSERT_BATCH_SIZE = 5000  # Lote de bulk_create na criação de cotas
+QUOTA_SERIES_BATCH_SIZE = 100000  # Lote de generate_series no PostgreSQL
+
+# Status a partir dos quais um pedido pode ser confirmado (em lote)
+CONFIRMABLE_STATUSES = [Order.RESERVED, Order.WAITING_CONFIRM, Order.WAITING_PROOF]
+
+# Status aceitos pelas confirmações individuais
+CONFIRM_STATUSES = [Order.RESERVED, Order.WAITING_CONFIRM]
+CONFIRM_WITH_RECEIPT_STATUSES = [Order.WAITING_PROOF, Order.WAITING_CONFIRM]
+
+# Status em que o prazo da reserva ainda vale (com comprovante enviado, não expira)
+EXPIRABLE_STATUSES = [Order.RESERVED, Order.WAITING_CONFIRM]
 
 
 def _random_pick(queryset, k):
@@ -37,6 +57,47 @@ def _random_pick(queryset, k):
     return ids[:k]
 
 
+def _admin_id(admin_user):
+    """Identificador do administrador para o AdminLog."""
+    return str(admin_user.id) if admin_user else "system"
+
+
+def _sell_order_quotas(order_id):
+    """
+    Marca as cotas reservadas de um pedido como vendidas.
+    
+    Usa UPDATE ... RETURNING quando o banco suporta, obtendo os números
+    atualizados no mesmo round-trip. Deve ser chamada dentro de uma
+    transação com o pedido bloqueado.
+    
+    Returns:
+        list: Números das cotas vendidas, em ordem crescente
+    """
+    if _supports_update_returning():
+        table = connection.ops.quote_name(Quota._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET status = %s, reserved_until = NULL "
+                f"WHERE order_id = %s AND status = %s RETURNING number",
+                [Quota.SOLD, order_id, Quota.RESERVED]
+            )
+            return sorted(row[0] for row in cursor.fetchall())
+    
+    quotas = Quota.objects.filter(order_id=order_id, status=Quota.RESERVED)
+    numbers = sorted(quotas.values_list("number", flat=True))
+    quotas.update(status=Quota.SOLD, reserved_until=None)
+    return numbers
+
+
+def _supports_update_returning():
+    """Verifica se o banco atual suporta UPDATE ... RETURNING."""
+    if connection.vendor == "postgresql":
+        return True
+    if connection.vendor == "sqlite":
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return False
+
+
 @transaction.atomic
 def allocate_random_quotas(product_id: int, quantity: int, order: Order):
     """
@@ -102,6 +163,8 @@ def allocate_random_quotas(product_id: int, quantity: int, order: Order):
     picked_quotas = Quota.objects.filter(id__in=picked_ids)
     numbers = sorted(q.number for q in picked_quotas)
     
+    publish_event(ORDER_RESERVED, order_payload(order, numbers=numbers))
+    
     logger.info(
         f"Alocadas {len(numbers)} cotas para pedido {order.id}: {numbers}"
     )
@@ -109,6 +172,31 @@ def allocate_random_quotas(product_id: int, quantity: int, order: Order):
     return numbers
 
 
+def _expire_orders(orders):
+    """
+    Marca pedidos como expirados e publica `order.expired` para cada um.
+    
+    Deve ser chamada dentro de uma transação.
+    
+    Returns:
+        int: Número de pedidos expirados
+    """
+    expiring = list(
+        orders.select_for_update(of=("self",)).only(
+            "id", "product_id", "status", "full_name", "email",
+            "whatsapp", "quantity", "total_price_cents"
+        )
+    )
+    if not expiring:
+        return 0
+    
+    Order.objects.filter(id__in=[order.id for order in expiring]).update(status=Order.EXPIRED)
+    for order in expiring:
+        order.status = Order.EXPIRED
+    publish_events([(ORDER_EXPIRED, order_payload(order)) for order in expiring])
+    return len(expiring)
+
+
 def release_expired_reservations():
     """
     Libera cotas com reservas expiradas e marca pedidos como expirados.
@@ -130,10 +218,10 @@ def release_expired_reservations():
         )
         
         # Marca pedidos como expirados
-        expired_orders = Order.objects.filter(
-            status__in=[Order.RESERVED, Order.WAITING_CONFIRM],
+        expired_orders = _expire_orders(Order.objects.filter(
+            status__in=EXPIRABLE_STATUSES,
             reserve_expires_at__lt=now
-        ).update(status=Order.EXPIRED)
+        ))
         
         logger.info(
             f"Liberadas {released_quotas} cotas e expirados {expired_orders} pedidos"
@@ -142,65 +230,89 @@ def release_expired_reservations():
         return released_quotas, expired_orders
 
 
-def confirm_order(order_id: int, admin_user=None):
+def confirm_order(order_id: int, admin_user=None, require_receipt=False,
+                  action="order_confirmed", extra_details=None,
+                  allowed_statuses=None, count_key="quotas_updated"):
     """
     Confirma um pedido e marca suas cotas como vendidas.
     
+    Caminho único de confirmação usado pelo admin e pelas views
+    administrativas: bloqueia o pedido e vende as cotas com um único
+    UPDATE ... RETURNING.
+    
     Args:
         order_id: ID do pedido
         admin_user: Usuário administrador que confirmou
+        require_receipt: Exige comprovante anexado ao pedido
+        action: Ação registrada no AdminLog
+        extra_details: Detalhes adicionais para o AdminLog
+        allowed_statuses: Status aceitos (padrão: CONFIRM_STATUSES)
+        count_key: Chave do número de cotas nos detalhes do AdminLog
         
     Returns:
-        bool: True se confirmado com sucesso
+        dict: Pedido confirmado e números das cotas vendidas
         
     Raises:
         ValidationError: Se o pedido não puder ser confirmado
     """
     try:
         with transaction.atomic():
-            order = Order.objects.select_for_update().get(id=order_id)
+            order = (
+                Order.objects.select_for_update(of=("self",))
+                .select_related("product")
+                .get(id=order_id)
+            )
             
-            if order.status not in [Order.RESERVED, Order.WAITING_CONFIRM]:
+            if order.status not in (allowed_statuses or CONFIRM_STATUSES):
                 raise ValidationError(
                     f"Pedido não pode ser confirmado. Status atual: {order.status}"
                 )
             
-            if order.is_expired:
+            if require_receipt and not order.receipt:
+                raise ValidationError("Este pedido não possui comprovante de pagamento.")
+            
+            if order.status in EXPIRABLE_STATUSES and order.is_expired:
                 raise ValidationError("Pedido expirado. Não pode ser confirmado.")
             
             # Atualiza status do pedido
             order.status = Order.CONFIRMED
-            order.save(update_fields=["status"])
+            order.save(update_fields=["status", "updated_at"])
             
             # Marca cotas como vendidas
-            updated_quotas = Quota.objects.filter(
-                order=order,
-                status=Quota.RESERVED
-            ).update(
-                status=Quota.SOLD,
-                reserved_until=None
-            )
+            numbers = _sell_order_quotas(order.id)
+            
+            details = {
+                "order_id": order_id,
+                count_key: len(numbers),
+                "quotas_numbers": numbers,
+                "product_id": order.product_id,
+                "product": order.product.title,
+                "customer_name": order.full_name,
+            }
+            if admin_user:
+                details["admin_user"] = admin_user.username
+            details.update(extra_details or {})
             
             # Log da ação
             AdminLog.objects.create(
-                admin_id=str(admin_user.id) if admin_user else "system",
-                action="order_confirmed",
-                details={
-                    "order_id": order_id,
-                    "quotas_updated": updated_quotas,
-                    "product_id": order.product.id
-                }
+                admin_id=_admin_id(admin_user),
+                action=action,
+                details=details
             )
             
+            publish_event(ORDER_CONFIRMED, order_payload(order, numbers=numbers))
+            
             logger.info(
                 f"Pedido {order_id} confirmado. "
-                f"Atualizadas {updated_quotas} cotas."
+                f"Atualizadas {len(numbers)} cotas."
             )
             
-            return True
+            return {"order": order, "numbers": numbers}
             
     except Order.DoesNotExist:
         raise ValidationError("Pedido não encontrado.")
+    except ValidationError:
+        raise
     except Exception as e:
         logger.error(f"Erro ao confirmar pedido {order_id}: {str(e)}")
         raise ValidationError(f"Erro interno: {str(e)}")
@@ -240,7 +352,7 @@ def cancel_order(order_id: int, admin_user=None):
             
             # Log da ação
             AdminLog.objects.create(
-                admin_id=str(admin_user.id) if admin_user else "system",
+                admin_id=_admin_id(admin_user),
                 action="order_canceled",
                 details={
                     "order_id": order_id,
@@ -249,6 +361,8 @@ def cancel_order(order_id: int, admin_user=None):
                 }
             )
             
+            publish_event(ORDER_CANCELED, order_payload(order))
+            
             logger.info(
                 f"Pedido {order_id} cancelado. "
                 f"Liberadas {released_quotas} cotas."
@@ -263,6 +377,190 @@ def cancel_order(order_id: int, admin_user=None):
         raise ValidationError(f"Erro interno: {str(e)}")
 
 
+def bulk_confirm_orders(order_ids, admin_user=None):
+    """
+    Confirma vários pedidos em uma única transação.
+    
+    Usa UPDATEs em conjunto para pedidos e cotas e grava o AdminLog com
+    bulk_create, em vez de uma transação por pedido.
+    
+    Args:
+        order_ids: IDs dos pedidos
+        admin_user: Usuário administrador que confirmou
+        
+    Returns:
+        dict: {"confirmed": [ids], "rejected": {id: motivo}}
+    """
+    order_ids = set(order_ids)
+    now = timezone.now()
+    rejected = {}
+    
+    with transaction.atomic():
+        orders = {
+            order.id: order
+            for order in Order.objects.select_for_update()
+            .filter(id__in=order_ids)
+            .only(
+                "id", "product_id", "status", "reserve_expires_at", "receipt",
+                "full_name", "email", "whatsapp", "quantity", "total_price_cents"
+            )
+        }
+        
+        for order_id in order_ids - orders.keys():
+            rejected[order_id] = "Pedido não encontrado."
+        
+        for order in orders.values():
+            if order.status not in CONFIRMABLE_STATUSES:
+                rejected[order.id] = (
+                    f"Pedido não pode ser confirmado. Status atual: {order.status}"
+                )
+            elif order.status == Order.WAITING_PROOF and not order.receipt:
+                # Mesma regra da confirmação individual com comprovante
+                rejected[order.id] = "Este pedido não possui comprovante de pagamento."
+            elif (
+                order.status in EXPIRABLE_STATUSES
+                and order.reserve_expires_at
+                and order.reserve_expires_at < now
+            ):
+                rejected[order.id] = "Pedido expirado. Não pode ser confirmado."
+        
+        confirmed = sorted(order_id for order_id in orders if order_id not in rejected)
+        if not confirmed:
+            return {"confirmed": [], "rejected": rejected}
+        
+        quota_counts = dict(
+            Quota.objects.filter(order_id__in=confirmed, status=Quota.RESERVED)
+            .values("order_id")
+            .annotate(total=Count("id"))
+            .values_list("order_id", "total")
+        )
+        
+        Order.objects.filter(id__in=confirmed).update(
+            status=Order.CONFIRMED,
+            updated_at=now
+        )
+        updated_quotas = Quota.objects.filter(
+            order_id__in=confirmed,
+            status=Quota.RESERVED
+        ).update(
+            status=Quota.SOLD,
+            reserved_until=None
+        )
+        
+        admin_id = _admin_id(admin_user)
+        AdminLog.objects.bulk_create([
+            AdminLog(
+                admin_id=admin_id,
+                action="order_confirmed",
+                details={
+                    "order_id": order_id,
+                    "quotas_updated": quota_counts.get(order_id, 0),
+                    "product_id": orders[order_id].product_id,
+                    "bulk": True
+                }
+            )
+            for order_id in confirmed
+        ], batch_size=BULK_BATCH_SIZE)
+        
+        for order_id in confirmed:
+            orders[order_id].status = Order.CONFIRMED
+        publish_events([
+            (ORDER_CONFIRMED, order_payload(orders[order_id])) for order_id in confirmed
+        ])
+    
+    logger.info(
+        f"Confirmação em lote: {len(confirmed)} pedidos confirmados, "
+        f"{updated_quotas} cotas vendidas, {len(rejected)} rejeitados."
+    )
+    
+    return {"confirmed": confirmed, "rejected": rejected}
+
+
+def bulk_cancel_orders(order_ids, admin_user=None):
+    """
+    Cancela vários pedidos em uma única transação e libera suas cotas.
+    
+    Args:
+        order_ids: IDs dos pedidos
+        admin_user: Usuário administrador que cancelou
+        
+    Returns:
+        dict: {"canceled": [ids], "rejected": {id: motivo}}
+    """
+    order_ids = set(order_ids)
+    rejected = {}
+    
+    with transaction.atomic():
+        orders = {
+            order.id: order
+            for order in Order.objects.select_for_update()
+            .filter(id__in=order_ids)
+            .only(
+                "id", "product_id", "status", "full_name", "email", "whatsapp",
+                "quantity", "total_price_cents"
+            )
+        }
+        
+        for order_id in order_ids - orders.keys():
+            rejected[order_id] = "Pedido não encontrado."
+        
+        for order in orders.values():
+            if order.status == Order.CANCELED:
+                rejected[order.id] = "Pedido já está cancelado."
+        
+        canceled = sorted(order_id for order_id in orders if order_id not in rejected)
+        if not canceled:
+            return {"canceled": [], "rejected": rejected}
+        
+        quota_counts = dict(
+            Quota.objects.filter(order_id__in=canceled, status=Quota.RESERVED)
+            .values("order_id")
+            .annotate(total=Count("id"))
+            .values_list("order_id", "total")
+        )
+        
+        Order.objects.filter(id__in=canceled).update(
+            status=Order.CANCELED,
+            updated_at=timezone.now()
+        )
+        released_quotas = Quota.objects.filter(
+            order_id__in=canceled,
+            status=Quota.RESERVED
+        ).update(
+            status=Quota.AVAILABLE,
+            order=None,
+            reserved_until=None
+        )
+        
+        admin_id = _admin_id(admin_user)
+        AdminLog.objects.bulk_create([
+            AdminLog(
+                admin_id=admin_id,
+                action="order_canceled",
+                details={
+                    "order_id": order_id,
+                    "quotas_released": quota_counts.get(order_id, 0),
+                    "product_id": orders[order_id].product_id,
+                    "bulk": True
+                }
+            )
+            for order_id in canceled
+        ], batch_size=BULK_BATCH_SIZE)
+        
+        for order_id in canceled:
+            orders[order_id].status = Order.CANCELED
+        publish_events([
+            (ORDER_CANCELED, order_payload(orders[order_id])) for order_id in canceled
+        ])
+    
+    logger.info(
+        f"Cancelamento em lote: {len(canceled)} pedidos cancelados, "
+        f"{released_quotas} cotas liberadas, {len(rejected)} rejeitados."
+    )
+    
+    return {"canceled": canceled, "rejected": rejected}
+
+
 def draw_winner(product_id: int, draw_source: str = "", admin_user=None):
     """
     Realiza o sorteio de um produto e define o vencedor.
@@ -278,6 +576,7 @@ def draw_winner(product_id: int, draw_source: str = "", admin_user=None):
     Raises:
         ValidationError: Se o sorteio não puder ser realizado
     """
+    snapshot_name = None
     try:
         with transaction.atomic():
             product = Product.objects.select_for_update().get(id=product_id)
@@ -299,39 +598,61 @@ def draw_winner(product_id: int, draw_source: str = "", admin_user=None):
             if not sold_quotas.exists():
                 raise ValidationError("Não há cotas vendidas para sortear.")
             
-            # Sorteia um número aleatório
-            quota_numbers = list(sold_quotas.values_list('number', flat=True))
-            drawn_number = secrets.choice(quota_numbers)
+            # Congela o mapeamento cota -> pedido e sorteia a cota na mesma
+            # leitura, para que o vencedor venha do snapshot publicado
+            snapshot_name, snapshot_sha256, total_sold, winner = (
+                write_draw_snapshot(product)
+            )
+            if winner is None:
+                raise ValidationError("Não há cotas vendidas para sortear.")
             
-            # Busca a cota sorteada e o pedido
-            winning_quota = sold_quotas.get(number=drawn_number)
-            winning_order = winning_quota.order
+            rank, winning_order_id, drawn_number = winner
+            winning_order = Order.objects.get(id=winning_order_id)
             
             # Atualiza o produto
             product.drawn_number = drawn_number
             product.draw_source = draw_source
             product.status = Product.CLOSED
-            product.save(update_fields=["drawn_number", "draw_source", "status"])
+            product.draw_snapshot.name = snapshot_name
+            product.draw_snapshot_sha256 = snapshot_sha256
+            product.save(update_fields=[
+                "drawn_number", "draw_source", "status",
+                "draw_snapshot", "draw_snapshot_sha256"
+            ])
             
             # Log da ação
             AdminLog.objects.create(
-                admin_id=str(admin_user.id) if admin_user else "system",
+                admin_id=_admin_id(admin_user),
                 action="draw_completed",
                 details={
                     "product_id": product_id,
                     "drawn_number": drawn_number,
+                    "draw_rank": rank,
                     "winning_order_id": winning_order.id,
-                    "total_sold": len(quota_numbers)
+                    "winner_name": winning_order.full_name,
+                    "total_sold": total_sold,
+                    "snapshot_file": snapshot_name,
+                    "snapshot_sha256": snapshot_sha256
                 }
             )
             
+            publish_event(DRAW_COMPLETED, {
+                "product_id": product_id,
+                "product": product.title,
+                "drawn_number": drawn_number,
+                "winning_order_id": winning_order.id,
+                "total_sold": total_sold,
+                "snapshot_sha256": snapshot_sha256
+            })
+            
             winner_info = {
                 "drawn_number": drawn_number,
                 "winner_name": winning_order.full_name,
                 "winner_email": winning_order.email,
                 "winner_whatsapp": winning_order.whatsapp,
                 "order_id": winning_order.id,
-                "total_sold": len(quota_numbers)
+                "total_sold": total_sold,
+                "snapshot_sha256": snapshot_sha256
             }
             
             logger.info(
@@ -345,16 +666,111 @@ def draw_winner(product_id: int, draw_source: str = "", admin_user=None):
     except Product.DoesNotExist:
         raise ValidationError("Produto não encontrado.")
     except Exception as e:
+        # A transação foi desfeita: o snapshot gravado não vale mais
+        if snapshot_name:
+            default_storage.delete(snapshot_name)
         logger.error(f"Erro ao realizar sorteio do produto {product_id}: {str(e)}")
         raise ValidationError(f"Erro interno: {str(e)}")
 
 
-def create_product_quotas(product_id: int):
+def insert_quotas(product_id: int, first: int, last: int, progress=None):
+    """
+    Insere as cotas `first..last` (inclusive) de um produto em lotes.
+    
+    No PostgreSQL usa INSERT ... SELECT generate_series, gerando os números
+    no servidor; nos demais bancos usa bulk_create com lotes de tamanho
+    fixo. Em ambos os casos a memória é constante. Deve ser chamada dentro
+    de uma transação.
+    
+    Args:
+        product_id: ID do produto
+        first: Primeiro número a criar
+        last: Último número a criar
+        progress: Callback opcional chamado com (inseridas, total)
+        
+    Returns:
+        int: Número de cotas inseridas
+    """
+    total = max(last - first + 1, 0)
+    inserted = 0
+    
+    if connection.vendor == "postgresql":
+        table = connection.ops.quote_name(Quota._meta.db_table)
+        batch_size = QUOTA_SERIES_BATCH_SIZE
+    else:
+        batch_size = QUOTA_INSERT_BATCH_SIZE
+    
+    for batch_start in range(first, last + 1, batch_size):
+        batch_end = min(batch_start + batch_size - 1, last)
+        
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {table} (product_id, number, status) "
+                    f"SELECT %s, n, %s FROM generate_series(%s, %s) AS n",
+                    [product_id, Quota.AVAILABLE, batch_start, batch_end]
+                )
+        else:
+            Quota.objects.bulk_create(
+                [
+                    Quota(product_id=product_id, number=number, status=Quota.AVAILABLE)
+                    for number in range(batch_start, batch_end + 1)
+                ],
+                batch_size=batch_size
+            )
+        
+        inserted += batch_end - batch_start + 1
+        if progress:
+            progress(inserted, total)
+    
+    return inserted
+
+
+def insert_quotas_committed(product_id: int, first: int, last: int, progress=None):
+    """
+    Insere as cotas `first..last` com uma transação curta por lote.
+    
+    Cada lote é confirmado antes de o progresso ser reportado, então a
+    tarefa em segundo plano (que grava o progresso na mesma conexão) mostra
+    o avanço real. Se a execução for interrompida, os lotes já confirmados
+    permanecem e a próxima execução continua a partir do maior número.
+    
+    Args:
+        product_id: ID do produto
+        first: Primeiro número a criar
+        last: Último número a criar
+        progress: Callback opcional chamado com (inseridas, total)
+        
+    Returns:
+        int: Número de cotas inseridas
+    """
+    total = max(last - first + 1, 0)
+    inserted = 0
+    batch_size = (
+        QUOTA_SERIES_BATCH_SIZE if connection.vendor == "postgresql"
+        else QUOTA_INSERT_BATCH_SIZE
+    )
+    
+    for batch_start in range(first, last + 1, batch_size):
+        batch_end = min(batch_start + batch_size - 1, last)
+        with transaction.atomic():
+            inserted += insert_quotas(product_id, batch_start, batch_end)
+        if progress:
+            progress(inserted, total)
+    
+    return inserted
+
+
+def create_product_quotas(product_id: int, progress=None):
     """
     Cria todas as cotas para um produto (1 até total_quotas).
     
+    Os lotes são confirmados um a um (`insert_quotas_committed`); se uma
+    execução anterior foi interrompida, cria apenas as cotas que faltam.
+    
     Args:
         product_id: ID do produto
+        progress: Callback opcional chamado com (criadas, total)
         
     Returns:
         int: Número de cotas criadas
@@ -362,36 +778,318 @@ def create_product_quotas(product_id: int):
     try:
         product = Product.objects.get(id=product_id)
         
-        # Verifica se já existem cotas
-        existing_count = Quota.objects.filter(product=product).count()
-        if existing_count > 0:
+        # As cotas são sempre criadas em sequência a partir de 1
+        last_number = Quota.objects.filter(product=product).aggregate(
+            last=Max("number")
+        )["last"] or 0
+        if last_number >= product.total_quotas:
             logger.warning(
-                f"Produto {product_id} já possui {existing_count} cotas. "
+                f"Produto {product_id} já possui cotas. "
                 "Não foram criadas novas cotas."
             )
             return 0
         
-        # Cria as cotas
-        quotas_to_create = []
-        for number in range(1, product.total_quotas + 1):
-            quotas_to_create.append(
-                Quota(
-                    product=product,
-                    number=number,
-                    status=Quota.AVAILABLE
-                )
-            )
-        
-        Quota.objects.bulk_create(quotas_to_create)
+        # Cria as cotas em lotes
+        created = insert_quotas_committed(
+            product.id, last_number + 1, product.total_quotas, progress=progress
+        )
         
         logger.info(
-            f"Criadas {product.total_quotas} cotas para o produto {product.title}"
+            f"Criadas {created} cotas para o produto {product.title}"
         )
         
-        return product.total_quotas
+        return created
         
     except Product.DoesNotExist:
         raise ValidationError("Produto não encontrado.")
     except Exception as e:
         logger.error(f"Erro ao criar cotas para produto {product_id}: {str(e)}")
         raise ValidationError(f"Erro interno: {str(e)}")
+
+
+def activate_product(product_id: int, admin_user=None, progress=None):
+    """
+    Pipeline de ativação de um produto.
+    
+    Materializa as cotas que ainda não existem em lotes confirmados um a um
+    (o produto continua em rascunho e o progresso fica visível) e só então,
+    em uma transação curta com o produto bloqueado, completa eventuais
+    cotas restantes e muda o status para ativo. O produto nunca fica
+    visível sem cotas. Deve ser executada por uma tarefa em segundo plano
+    (`enqueue_job("activate_product", ...)`).
+    
+    Args:
+        product_id: ID do produto
+        admin_user: Usuário administrador que solicitou a ativação
+        progress: Callback opcional chamado com (criadas, total)
+        
+    Returns:
+        dict: {"product_id": ..., "quotas_created": ...}
+    """
+    try:
+        product = Product.objects.get(id=product_id)
+        
+        if product.status == Product.ACTIVE:
+            logger.info(f"Produto {product_id} já está ativo")
+            return {"product_id": product_id, "quotas_created": 0}
+        
+        if product.total_quotas <= 0:
+            raise ValidationError("O produto não possui cotas configuradas.")
+        
+        # As cotas são sempre criadas em sequência a partir de 1
+        quotas = Quota.objects.filter(product_id=product_id)
+        last_number = quotas.aggregate(last=Max("number"))["last"] or 0
+        created = insert_quotas_committed(
+            product_id, last_number + 1, product.total_quotas, progress=progress
+        )
+        
+        with transaction.atomic():
+            product = Product.objects.select_for_update().get(id=product_id)
+            
+            if product.status == Product.ACTIVE:
+                logger.info(f"Produto {product_id} já está ativo")
+                return {"product_id": product_id, "quotas_created": created}
+            
+            # O total pode ter mudado enquanto os lotes eram criados
+            last_number = quotas.aggregate(last=Max("number"))["last"] or 0
+            created += insert_quotas(product_id, last_number + 1, product.total_quotas)
+            
+            product.status = Product.ACTIVE
+            product.save(update_fields=["status", "updated_at"])
+            
+            AdminLog.objects.create(
+                admin_id=_admin_id(admin_user),
+                action="product_activated",
+                details={
+                    "product_id": product_id,
+                    "quotas_created": created,
+                    "total_quotas": product.total_quotas
+                }
+            )
+        
+        logger.info(
+            f"Produto {product.title} ativado ({created} cotas criadas)"
+        )
+        
+        return {"product_id": product_id, "quotas_created": created}
+        
+    except Product.DoesNotExist:
+        raise ValidationError("Produto não encontrado.")
+    except ValidationError:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao ativar produto {product_id}: {str(e)}")
+        raise ValidationError(f"Erro interno: {str(e)}")
+
+
+def resize_product_quotas(product_id: int, new_total: int, admin_user=None, progress=None):
+    """
+    Altera o total de cotas de um produto de forma incremental.
+    
+    Para aumentar, cria os números `atual+1..novo` em lotes; para diminuir,
+    remove apenas números finais ainda disponíveis, do maior para o menor.
+    Cada lote roda em uma transação curta que bloqueia o produto só durante
+    o lote, e `total_quotas` é atualizado a cada lote, então as compras
+    continuam durante o redimensionamento. Se uma cota final for reservada
+    no meio da redução, a operação para no maior número ocupado.
+    
+    Args:
+        product_id: ID do produto
+        new_total: Novo total de cotas
+        admin_user: Usuário administrador que solicitou a alteração
+        progress: Callback opcional chamado com (processadas, total)
+        
+    Returns:
+        dict: Totais anterior/final e cotas criadas/removidas
+        
+    Raises:
+        ValidationError: Se o produto não existir, estiver encerrado ou
+            houver cotas ocupadas acima do novo total
+    """
+    try:
+        product = Product.objects.get(id=product_id)
+    except Product.DoesNotExist:
+        raise ValidationError("Produto não encontrado.")
+    
+    if product.status == Product.CLOSED:
+        raise ValidationError("Não é possível alterar as cotas de um produto encerrado.")
+    if new_total <= 0:
+        raise ValidationError("Total de cotas deve ser maior que zero.")
+    
+    old_total = product.total_quotas
+    quotas = Quota.objects.filter(product_id=product_id)
+    last_number = quotas.aggregate(last=Max("number"))["last"] or 0
+    created = removed = 0
+    final_total = new_total
+    
+    if not last_number:
+        # Produto sem cotas (rascunho): a ativação cria as cotas
+        pass
+    elif new_total > last_number:
+        total = new_total - last_number
+        for batch_start in range(last_number + 1, new_total + 1, QUOTA_INSERT_BATCH_SIZE):
+            batch_end = min(batch_start + QUOTA_INSERT_BATCH_SIZE - 1, new_total)
+            with transaction.atomic():
+                Product.objects.select_for_update().filter(id=product_id).update(
+                    total_quotas=batch_end, updated_at=timezone.now()
+                )
+                created += insert_quotas(product_id, batch_start, batch_end)
+            if progress:
+                progress(created, total)
+    else:
+        occupied = (
+            quotas.filter(number__gt=new_total)
+            .exclude(status=Quota.AVAILABLE)
+            .order_by("-number")
+            .values_list("number", flat=True)
+            .first()
+        )
+        if occupied:
+            raise ValidationError(
+                f"A cota {occupied} já está reservada ou vendida; "
+                f"não é possível reduzir para {new_total} cotas."
+            )
+        
+        total = last_number - new_total
+        for batch_end in range(last_number, new_total, -QUOTA_INSERT_BATCH_SIZE):
+            batch_start = max(batch_end - QUOTA_INSERT_BATCH_SIZE + 1, new_total + 1)
+            with transaction.atomic():
+                Product.objects.select_for_update().filter(id=product_id).first()
+                batch = quotas.filter(number__gte=batch_start, number__lte=batch_end)
+                removed += batch.filter(status=Quota.AVAILABLE).delete()[0]
+                
+                # Alguma cota foi reservada depois da verificação inicial
+                occupied = batch.order_by("-number").values_list("number", flat=True).first()
+                final_total = occupied or batch_start - 1
+                Product.objects.filter(id=product_id).update(
+                    total_quotas=final_total, updated_at=timezone.now()
+                )
+            if progress:
+                progress(removed, total)
+            if occupied:
+                logger.warning(
+                    f"Redução do produto {product_id} interrompida na cota {occupied}"
+                )
+                break
+    
+    Product.objects.filter(id=product_id).update(
+        total_quotas=final_total, updated_at=timezone.now()
+    )
+    
+    AdminLog.objects.create(
+        admin_id=_admin_id(admin_user),
+        action="product_resized",
+        details={
+            "product_id": product_id,
+            "old_total": old_total,
+            "new_total": final_total,
+            "quotas_created": created,
+            "quotas_removed": removed
+        }
+    )
+    
+    logger.info(
+        f"Cotas do produto {product_id} redimensionadas de {old_total} "
+        f"para {final_total} (+{created}/-{removed})"
+    )
+    
+    return {
+        "product_id": product_id,
+        "old_total": old_total,
+        "new_total": final_total,
+        "quotas_created": created,
+        "quotas_removed": removed,
+    }
+
+
+def due_scheduled_draws(now=None):
+    """
+    Produtos ativos cujo sorteio agendado já deveria ter ocorrido.
+    
+    Returns:
+        QuerySet: Produtos com draw_datetime vencido e ainda sem sorteio
+    """
+    return Product.objects.filter(
+        status=Product.ACTIVE,
+        drawn_number__isnull=True,
+        draw_datetime__lte=now or timezone.now()
+    )
+
+
+def run_scheduled_draw(product_id: int):
+    """
+    Executa o sorteio agendado de um produto.
+    
+    Bloqueia a linha do produto com SKIP LOCKED, o que funciona como trava
+    distribuída: se outro worker já está sorteando o produto, ou se o
+    sorteio já ocorreu ou foi reagendado, retorna None sem fazer nada.
+    Com o produto bloqueado nenhuma nova reserva é aceita; as reservas
+    pendentes são liberadas e então `draw_winner` encerra o produto. Sem
+    cotas vendidas, o produto é encerrado sem vencedor.
+    
+    Args:
+        product_id: ID do produto
+        
+    Returns:
+        dict | None: Informações do vencedor, ou None se nada foi feito
+    """
+    with transaction.atomic():
+        product = (
+            due_scheduled_draws()
+            .select_for_update(skip_locked=True)
+            .filter(id=product_id)
+            .first()
+        )
+        if product is None:
+            logger.info(f"Sorteio agendado do produto {product_id} não está pendente")
+            return None
+        
+        # Libera as reservas pendentes: não podem mais ser confirmadas
+        pending_orders = Order.objects.filter(
+            product=product,
+            status__in=CONFIRMABLE_STATUSES
+        )
+        released_quotas = Quota.objects.filter(
+            product=product,
+            status=Quota.RESERVED
+        ).update(
+            status=Quota.AVAILABLE,
+            order=None,
+            reserved_until=None
+        )
+        expired_orders = _expire_orders(pending_orders)
+        
+        if not Quota.objects.filter(product=product, status=Quota.SOLD).exists():
+            product.status = Product.CLOSED
+            product.save(update_fields=["status", "updated_at"])
+            
+            AdminLog.objects.create(
+                admin_id=_admin_id(None),
+                action="draw_skipped",
+                details={
+                    "product_id": product_id,
+                    "reason": "no_sold_quotas",
+                    "quotas_released": released_quotas,
+                    "orders_expired": expired_orders
+                }
+            )
+            logger.warning(
+                f"Produto {product.title} encerrado sem sorteio: nenhuma cota vendida"
+            )
+            return None
+        
+        winner_info = draw_winner(
+            product_id,
+            draw_source=f"Sorteio automático agendado para {timezone.localtime(product.draw_datetime):%d/%m/%Y %H:%M}"
+        )
+        winner_info.update({
+            "quotas_released": released_quotas,
+            "orders_expired": expired_orders
+        })
+        
+        logger.info(
+            f"Sorteio agendado do produto {product_id} concluído "
+            f"({released_quotas} cotas liberadas, {expired_orders} pedidos expirados)"
+        )
+        
+        return winner_info
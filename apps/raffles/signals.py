@@ -11,57 +11,49 @@ from .models import Product, Quota
 logger = logging.getLogger(__name__)
 
 
+@receiver(pre_save, sender=Product)
+def log_product_status_change(sender, instance, **kwargs):
+    """
+    Registra mudanças de status do produto.
+    
+    Usa o estado carregado do banco (FieldTrackerMixin), sem nova query.
+    """
+    if instance.has_changed('status'):
+        logger.info(
+            f'Status do produto {instance.title} mudou de '
+            f'{instance.initial_value("status")} para {instance.status}'
+        )
+
+
 @receiver(post_save, sender=Product)
-def create_quotas_on_product_activation(sender, instance, created, **kwargs):
+def schedule_product_draw_on_save(sender, instance, created, **kwargs):
     """
-    Cria cotas automaticamente quando um produto é ativado.
+    Agenda o sorteio automático quando o produto fica ativo com data
+    definida ou quando a data do sorteio muda.
     """
-    # Só executa se o produto foi salvo e mudou para ativo
-    if instance.status == Product.ACTIVE:
-        # Verifica se já existem cotas para este produto
-        existing_quotas = Quota.objects.filter(product=instance).count()
+    if instance.status != Product.ACTIVE or not instance.draw_datetime:
+        return
+    if instance.drawn_number is not None:
+        return
+    
+    if created or instance.has_changed('status') or instance.has_changed('draw_datetime'):
+        from .tasks import schedule_product_draw
         
-        if existing_quotas == 0 and instance.total_quotas > 0:
-            try:
-                # Cria as cotas usando bulk_create para eficiência
-                quotas_to_create = []
-                for number in range(1, instance.total_quotas + 1):
-                    quotas_to_create.append(
-                        Quota(
-                            product=instance,
-                            number=number,
-                            status=Quota.AVAILABLE
-                        )
-                    )
-                
-                Quota.objects.bulk_create(quotas_to_create)
-                
-                logger.info(
-                    f'Criadas {len(quotas_to_create)} cotas automaticamente '
-                    f'para o produto {instance.title}'
-                )
-                
-            except Exception as e:
-                logger.error(
-                    f'Erro ao criar cotas automaticamente para produto {instance.id}: {str(e)}'
-                )
+        schedule_product_draw(instance)
 
 
-@receiver(pre_save, sender=Product)
-def log_product_status_change(sender, instance, **kwargs):
+@receiver(post_save, sender=Product)
+def generate_product_image_derivatives(sender, instance, created, **kwargs):
     """
-    Registra mudanças de status do produto.
+    Agenda a geração das variantes quando a imagem do produto é enviada.
     """
-    if instance.pk:  # Produto existente
-        try:
-            old_instance = Product.objects.get(pk=instance.pk)
-            if old_instance.status != instance.status:
-                logger.info(
-                    f'Status do produto {instance.title} mudou de '
-                    f'{old_instance.status} para {instance.status}'
-                )
-        except Product.DoesNotExist:
-            pass  # Produto novo
+    if not instance.image:
+        return
+    
+    if created or instance.has_changed('image'):
+        from .images import schedule_derivatives
+        
+        schedule_derivatives(instance.image.name)
 
 
 @receiver(post_save, sender=Quota)
@@ -70,15 +62,9 @@ def log_quota_status_change(sender, instance, created, **kwargs):
     Registra mudanças importantes no status das cotas.
     """
     if created:
-        logger.debug(f'Nova cota criada: {instance.number} para produto {instance.product.title}')
-    else:
-        # Verifica se o status mudou
-        try:
-            old_instance = Quota.objects.get(pk=instance.pk)
-            if old_instance.status != instance.status:
-                logger.info(
-                    f'Status da cota {instance.number} (produto {instance.product.title}) '
-                    f'mudou de {old_instance.status} para {instance.status}'
-                )
-        except Quota.DoesNotExist:
-            pass
+        logger.debug(f'Nova cota criada: {instance.number} para produto {instance.product_id}')
+    elif instance.has_changed('status'):
+        logger.info(
+            f'Status da cota {instance.number} (produto {instance.product_id}) '
+            f'mudou de {instance.initial_value("status")} para {instance.status}'
+        )
@@ -5,6 +5,7 @@ from celery import shared_task
 from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
 import logging
 
 from .services import release_expired_reservations
@@ -93,7 +94,7 @@ def send_draw_notification_email(product_id):
             return
         
         # Busca o vencedor
-        winning_quota = product.quotas.filter(number=product.drawn_number).first()
+        winning_quota = product.quota_set.filter(number=product.drawn_number).first()
         if not winning_quota or not winning_quota.order:
             logger.error(f'Vencedor não encontrado para produto {product_id}')
             return
@@ -133,6 +134,190 @@ def send_draw_notification_email(product_id):
         logger.error(f'Erro ao enviar notificação de sorteio: {str(e)}')
 
 
+@shared_task
+def notify_draw_participants_task(product_id):
+    """
+    Distribui o resultado do sorteio para todos os participantes.
+    
+    Divide os e-mails em blocos e cria uma task por bloco.
+    """
+    from .notifications import participant_email_chunks
+    
+    chunks = 0
+    for emails in participant_email_chunks(product_id):
+        send_draw_notifications_chunk_task.delay(product_id, emails)
+        chunks += 1
+    
+    logger.info(f'Notificação do sorteio do produto {product_id} dividida em {chunks} blocos')
+    
+    return {'product_id': product_id, 'chunks': chunks}
+
+
+@shared_task
+def send_draw_notifications_chunk_task(product_id, emails, attempt=1):
+    """
+    Envia um bloco de notificações por uma única conexão SMTP.
+    
+    Os destinatários que falharem são reenviados em uma nova task com
+    espera exponencial, até MAX_SEND_ATTEMPTS tentativas.
+    """
+    from .notifications import (
+        send_draw_notifications_chunk, MAX_SEND_ATTEMPTS, RETRY_BASE_SECONDS
+    )
+    
+    sent, failed = send_draw_notifications_chunk(product_id, emails)
+    
+    if failed and attempt < MAX_SEND_ATTEMPTS:
+        send_draw_notifications_chunk_task.apply_async(
+            args=[product_id, failed, attempt + 1],
+            countdown=RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+        )
+    elif failed:
+        logger.error(
+            f'Notificação do sorteio do produto {product_id} falhou para '
+            f'{len(failed)} destinatário(s) após {attempt} tentativas: {failed}'
+        )
+    
+    return {'sent': sent, 'failed': failed, 'attempt': attempt}
+
+
+@shared_task
+def run_job_task(job_id):
+    """
+    Executa uma tarefa em segundo plano registrada em BackgroundJob.
+    """
+    from .jobs import run_job
+    
+    job = run_job(job_id)
+    
+    return {'job_id': job.id, 'status': job.status}
+
+
+@shared_task
+def run_scheduled_draw_task(product_id):
+    """
+    Executa o sorteio agendado de um produto (agendada com ETA).
+    """
+    from .services import run_scheduled_draw
+    
+    return run_scheduled_draw(product_id)
+
+
+def schedule_product_draw(product):
+    """
+    Agenda o sorteio do produto para `draw_datetime` (ETA do Celery).
+    
+    O envio acontece após o commit. Se o broker estiver indisponível, o
+    sorteio ainda é executado pela task periódica `run_due_draws_task`
+    ou pelo comando `run_scheduled_draws`.
+    """
+    def dispatch():
+        try:
+            run_scheduled_draw_task.apply_async(
+                args=[product.id],
+                eta=product.draw_datetime,
+                retry=False
+            )
+            logger.info(f'Sorteio do produto {product.id} agendado para {product.draw_datetime}')
+        except Exception as e:
+            logger.error(
+                f'Não foi possível agendar o sorteio do produto {product.id} '
+                f'no Celery, será executado pelo fallback: {str(e)}'
+            )
+    
+    transaction.on_commit(dispatch)
+
+
+@shared_task
+def run_due_draws_task():
+    """
+    Task periódica de fallback: dispara os sorteios agendados vencidos.
+    
+    Cobre ETAs perdidas (broker reiniciado, produto criado sem worker).
+    Cada sorteio vira uma task separada, então sorteios no mesmo minuto
+    rodam em paralelo nos workers.
+    """
+    from .services import due_scheduled_draws
+    
+    product_ids = list(due_scheduled_draws().values_list('id', flat=True))
+    
+    for product_id in product_ids:
+        run_scheduled_draw_task.delay(product_id)
+    
+    if product_ids:
+        logger.info(f'Disparados {len(product_ids)} sorteios agendados: {product_ids}')
+    
+    return {'dispatched': product_ids}
+
+
+@shared_task
+def dispatch_outbox_task():
+    """
+    Task periódica que entrega os eventos pendentes do outbox.
+    """
+    from .outbox import dispatch_pending
+    
+    delivered, failed = dispatch_pending()
+    
+    return {'delivered': delivered, 'failed': failed}
+
+
+@shared_task
+def dispatch_whatsapp_task():
+    """
+    Task periódica que envia a fila de WhatsApp dentro do limite de taxa.
+    """
+    from .whatsapp import dispatch_whatsapp_pending
+    
+    sent, failed = dispatch_whatsapp_pending()
+    
+    return {'sent': sent, 'failed': failed}
+
+
+@shared_task
+def dispatch_webhooks_task():
+    """
+    Task periódica que distribui os lotes de webhook pendentes.
+    
+    Agenda até `max_concurrency` entregas por assinatura; o limite é
+    garantido de novo na reserva de cada lote.
+    """
+    from .models import WebhookSubscription
+    from .webhooks import subscriptions_with_pending
+    
+    scheduled = 0
+    subscriptions = WebhookSubscription.objects.filter(id__in=subscriptions_with_pending())
+    for subscription in subscriptions:
+        for _ in range(subscription.max_concurrency):
+            deliver_webhook_batch_task.delay(subscription.id)
+            scheduled += 1
+    
+    return {'scheduled': scheduled}
+
+
+@shared_task
+def deliver_webhook_batch_task(subscription_id):
+    """
+    Entrega um lote de uma assinatura de webhook.
+    
+    Se o lote veio cheio, agenda o próximo imediatamente.
+    """
+    from .models import WebhookSubscription
+    from .webhooks import deliver_batch
+    
+    count = deliver_batch(subscription_id)
+    batch_size = (
+        WebhookSubscription.objects
+        .filter(id=subscription_id)
+        .values_list('batch_size', flat=True)
+        .first()
+    )
+    if count and count == batch_size:
+        deliver_webhook_batch_task.delay(subscription_id)
+    
+    return {'subscription_id': subscription_id, 'events': count}
+
+
 @shared_task
 def cleanup_old_logs():
     """
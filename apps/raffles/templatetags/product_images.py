@@ -0,0 +1,37 @@
+"""
+Template tags para imagens responsivas de produtos.
+"""
+from django import template
+from django.utils.html import format_html
+
+from ..images import fallback_url, get_manifest, srcset
+
+register = template.Library()
+
+
+@register.simple_tag
+def product_picture(product, sizes="100vw", css_class="", style="", alt=None, loading="lazy"):
+    """
+    Renderiza a imagem do produto como `<picture>` com `srcset` WebP/JPEG.
+
+    Uso:
+        {% product_picture product sizes="(max-width: 768px) 100vw, 33vw" css_class="card-img-top" %}
+    """
+    alt = product.title if alt is None else alt
+    manifest = get_manifest(product.image.name) if product.image else None
+    if manifest is None:
+        return format_html(
+            '<img src="{}" class="{}" alt="{}" style="{}" loading="{}" />',
+            product.image.url, css_class, alt, style, loading
+        )
+
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}" />'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" class="{}" alt="{}" '
+        'style="{}" loading="{}" decoding="async" />'
+        '</picture>',
+        srcset(manifest, "webp"), sizes,
+        fallback_url(manifest), srcset(manifest, "jpeg"), sizes,
+        manifest["width"], manifest["height"], css_class, alt, style, loading
+    )
@@ -0,0 +1,717 @@
+"""
+Testes da app raffles.
+"""
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import images, outbox, services, webhooks, whatsapp
+from .draw_snapshot import verify_draw_snapshot
+from .dashboard import get_dashboard_data
+from .models import (
+    BackgroundJob, Order, OutboxEvent, Product, Quota, WebhookDeadLetter, WebhookDelivery,
+    WebhookSubscription, WhatsAppMessage, WhatsAppRateLimit
+)
+
+
+class DashboardQueryBudgetTests(TestCase):
+    """O dashboard executa um número fixo de queries, independente do volume."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user("admin", password="senha", is_staff=True)
+        for index in range(3):
+            product = Product.objects.create(
+                title=f"Produto {index}",
+                price_cents=1000,
+                total_quotas=20,
+                status=Product.ACTIVE,
+            )
+            orders = [
+                Order.objects.create(
+                    product=product,
+                    full_name=f"Cliente {number}",
+                    email=f"cliente{number}@example.com",
+                    quantity=2,
+                    total_price_cents=2000,
+                    status=status,
+                )
+                for number, status in enumerate([Order.RESERVED, Order.CONFIRMED, Order.CANCELED])
+            ]
+            Quota.objects.bulk_create(
+                Quota(
+                    product=product,
+                    number=number,
+                    order=orders[number % 2] if number < 6 else None,
+                    status=Quota.SOLD if number < 6 else Quota.AVAILABLE,
+                )
+                for number in range(1, 21)
+            )
+
+    def test_get_dashboard_data_query_budget(self):
+        with self.assertNumQueries(3):
+            context = get_dashboard_data()
+        self.assertEqual(len(context["products"]), 3)
+
+    def test_get_dashboard_data_for_product_query_budget(self):
+        product = Product.objects.order_by("id").first()
+        with self.assertNumQueries(3):
+            get_dashboard_data(product.id)
+
+    def test_dashboard_view_query_budget(self):
+        self.client.force_login(self.admin)
+        # Sessão + usuário + as 3 queries do dashboard
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("raffles:admin_dashboard"))
+        self.assertEqual(response.status_code, 200)
+
+
+class OrderConfirmationTests(TestCase):
+    """O prazo da reserva não vale mais depois que o comprovante é enviado."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user("admin", password="senha", is_staff=True)
+        self.product = Product.objects.create(
+            title="Produto", price_cents=1000, total_quotas=10, status=Product.ACTIVE
+        )
+
+    def make_order(self, status, receipt=""):
+        deadline = timezone.now() - timedelta(minutes=5)
+        order = Order.objects.create(
+            product=self.product,
+            full_name="Cliente",
+            email="cliente@example.com",
+            quantity=2,
+            total_price_cents=2000,
+            status=status,
+            receipt=receipt,
+            reserve_expires_at=deadline,
+        )
+        Quota.objects.bulk_create(
+            Quota(
+                product=self.product,
+                number=number,
+                order=order,
+                status=Quota.RESERVED,
+                reserved_until=deadline,
+            )
+            for number in (1, 2)
+        )
+        return order
+
+    def test_receipt_uploaded_before_deadline_can_be_confirmed_after_it(self):
+        order = self.make_order(Order.WAITING_PROOF, receipt="receipts/comprovante.png")
+
+        result = services.confirm_order(
+            order.id,
+            admin_user=self.admin,
+            require_receipt=True,
+            allowed_statuses=services.CONFIRM_WITH_RECEIPT_STATUSES,
+        )
+
+        self.assertEqual(result["numbers"], [1, 2])
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.CONFIRMED)
+
+    def test_bulk_confirm_accepts_waiting_proof_after_deadline(self):
+        order = self.make_order(Order.WAITING_PROOF, receipt="receipts/comprovante.png")
+
+        result = services.bulk_confirm_orders([order.id], admin_user=self.admin)
+
+        self.assertEqual(result["confirmed"], [order.id])
+        self.assertEqual(
+            Quota.objects.filter(order=order, status=Quota.SOLD).count(), 2
+        )
+
+    def test_expired_reservation_cannot_be_confirmed(self):
+        order = self.make_order(Order.RESERVED)
+
+        with self.assertRaises(ValidationError):
+            services.confirm_order(order.id, admin_user=self.admin)
+        result = services.bulk_confirm_orders([order.id], admin_user=self.admin)
+        self.assertIn(order.id, result["rejected"])
+
+    def test_bulk_confirm_requires_receipt_for_waiting_proof(self):
+        order = self.make_order(Order.WAITING_PROOF)
+
+        result = services.bulk_confirm_orders([order.id], admin_user=self.admin)
+
+        self.assertEqual(result["confirmed"], [])
+        self.assertIn(order.id, result["rejected"])
+        self.assertFalse(Quota.objects.filter(status=Quota.SOLD).exists())
+
+    def test_bulk_api_rejects_order_ids_that_are_not_a_list(self):
+        self.client.force_login(self.admin)
+        for order_ids in ("12", {"3": True}, 7):
+            response = self.client.post(
+                reverse("raffles_api:bulk_orders"),
+                json.dumps({"action": "confirm", "order_ids": order_ids}),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 400)
+
+
+class DrawWinnerTests(TestCase):
+    """O vencedor sai do mesmo snapshot que é publicado."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.product = Product.objects.create(
+            title="Produto", price_cents=1000, total_quotas=30, status=Product.ACTIVE
+        )
+        for index in range(3):
+            order = Order.objects.create(
+                product=self.product,
+                full_name=f"Cliente {index}",
+                email=f"cliente{index}@example.com",
+                quantity=5,
+                total_price_cents=5000,
+                status=Order.CONFIRMED,
+            )
+            Quota.objects.bulk_create(
+                Quota(product=self.product, number=number, order=order, status=Quota.SOLD)
+                for number in range(index * 10 + 1, index * 10 + 6)
+            )
+
+    def snapshot_quotas(self, name):
+        with default_storage.open(name, "rb") as stored:
+            lines = gzip.decompress(stored.read()).decode("utf-8").splitlines()
+        quotas = {}
+        for line in lines:
+            if line.startswith("#"):
+                continue
+            order_id, runs = line.split(":")
+            for run in runs.split(","):
+                first, _, last = run.partition("-")
+                for number in range(int(first), int(last or first) + 1):
+                    quotas[number] = int(order_id)
+        return quotas
+
+    def test_winner_comes_from_the_published_snapshot(self):
+        winner = services.draw_winner(self.product.id, draw_source="teste")
+
+        self.product.refresh_from_db()
+        self.assertTrue(verify_draw_snapshot(self.product))
+        quotas = self.snapshot_quotas(self.product.draw_snapshot.name)
+        self.assertEqual(len(quotas), winner["total_sold"])
+        self.assertEqual(quotas[winner["drawn_number"]], winner["order_id"])
+        self.assertEqual(self.product.status, Product.CLOSED)
+
+    def test_snapshot_is_deleted_when_the_draw_rolls_back(self):
+        with mock.patch.object(services, "publish_event", side_effect=RuntimeError("falha")):
+            with self.assertRaises(ValidationError):
+                services.draw_winner(self.product.id)
+
+        self.product.refresh_from_db()
+        self.assertIsNone(self.product.drawn_number)
+        self.assertEqual(default_storage.listdir("draws")[1], [])
+
+
+@override_settings(JOBS_ALWAYS_SYNC=True)
+class ProductJobTests(TestCase):
+    """Ativação e redimensionamento pedidos juntos rodam em uma única tarefa."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user("admin", password="senha", is_staff=True)
+        self.product = Product.objects.create(
+            title="Produto", price_cents=1000, total_quotas=10, status=Product.DRAFT
+        )
+        services.insert_quotas(self.product.id, 1, 10)
+
+    def test_edit_with_new_total_and_activation_enqueues_one_job(self):
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("raffles:admin_product_edit", args=[self.product.id]),
+                {
+                    "title": "Produto",
+                    "description": "",
+                    "price_cents": 1000,
+                    "total_quotas": 15,
+                    "status": Product.ACTIVE,
+                },
+            )
+
+        job = BackgroundJob.objects.get()
+        self.assertRedirects(
+            response, reverse("raffles:admin_job_detail", args=[job.id]),
+            fetch_redirect_response=False,
+        )
+        self.assertEqual(job.kind, "activate_product")
+        self.assertEqual(job.status, BackgroundJob.SUCCEEDED)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.status, Product.ACTIVE)
+        self.assertEqual(self.product.total_quotas, 15)
+        self.assertEqual(Quota.objects.filter(product=self.product).count(), 15)
+
+
+class QuotaAdminSearchTests(TestCase):
+    """Busca do admin de cotas."""
+
+    def setUp(self):
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "senha")
+        )
+        self.product = Product.objects.create(
+            title="Bicicleta", price_cents=1000, total_quotas=5, status=Product.ACTIVE
+        )
+        services.insert_quotas(self.product.id, 1, 5)
+
+    def search(self, term):
+        response = self.client.get(reverse("admin:raffles_quota_changelist"), {"q": term})
+        self.assertEqual(response.status_code, 200)
+        return response.context["cl"].result_count
+
+    def test_numbers_beyond_the_column_range_do_not_overflow(self):
+        self.assertEqual(self.search("9" * 30), 0)
+        self.assertEqual(self.search("3"), 1)
+
+    def test_text_matches_the_product_title(self):
+        self.assertEqual(self.search("bicicleta"), 5)
+        self.assertEqual(self.search("²"), 0)
+
+
+class ProductPictureTests(TestCase):
+    """A template tag nunca gera variantes durante a requisição."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new("RGB", (800, 600), "red").save(buffer, "PNG")
+        image = default_storage.save("products/foto.png", ContentFile(buffer.getvalue()))
+        self.product = Product.objects.create(
+            title="Produto", price_cents=1000, total_quotas=10, image=image
+        )
+        # Descarta o agendamento feito pelo upload
+        cache.clear()
+        BackgroundJob.objects.all().delete()
+
+    def render(self):
+        return Template(
+            "{% load product_images %}{% product_picture product %}"
+        ).render(Context({"product": self.product}))
+
+    def test_missing_derivatives_fall_back_to_the_original_and_schedule_one_job(self):
+        for _ in range(3):
+            html = self.render()
+            self.assertIn(f'src="{self.product.image.url}"', html)
+            self.assertNotIn("<picture>", html)
+
+        job = BackgroundJob.objects.get()
+        self.assertEqual(job.kind, "product_image_derivatives")
+        self.assertEqual(job.params, {"image": self.product.image.name})
+        self.assertFalse(default_storage.exists(images.derivatives_dir(self.product.image.name)))
+
+    def test_generated_derivatives_are_used(self):
+        self.render()
+        images.generate_derivatives(self.product.image.name)
+
+        html = self.render()
+        self.assertIn("<picture>", html)
+        self.assertIn('type="image/webp"', html)
+
+
+class FailingSink(outbox.OutboxSink):
+    """Destino de teste que recusa todos os eventos."""
+
+    name = "falha"
+
+    def deliver(self, events):
+        return {event.id: "Recusado" for event in events}
+
+
+@override_settings(OUTBOX_SINKS=["local"])
+class OutboxTests(TestCase):
+    """Gravação transacional, reserva e novas tentativas do outbox."""
+
+    def make_available(self):
+        OutboxEvent.objects.update(available_at=timezone.now())
+
+    def test_events_roll_back_with_the_enclosing_transaction(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.assertEqual(outbox.publish_event(outbox.ORDER_RESERVED, {"order_id": 1}), 1)
+                raise RuntimeError("desfaz")
+
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_claim_leases_events_until_the_lease_expires(self):
+        outbox.publish_event(outbox.ORDER_CONFIRMED, {"order_id": 1})
+        before = timezone.now()
+
+        claimed = outbox.claim_events()
+
+        self.assertEqual(len(claimed), 1)
+        event = OutboxEvent.objects.get()
+        delay = (event.available_at - before).total_seconds()
+        self.assertAlmostEqual(delay, outbox.LEASE_SECONDS, delta=2)
+        self.assertEqual(outbox.claim_events(), [])
+
+    def test_local_sink_delivers_pending_events(self):
+        sink = outbox.SINKS["local"]
+        sink.delivered.clear()
+        outbox.publish_event(outbox.ORDER_CANCELED, {"order_id": 2})
+
+        self.assertEqual(outbox.dispatch_outbox(), (1, 0))
+        self.assertEqual(sink.delivered, [(outbox.ORDER_CANCELED, {"order_id": 2})])
+        self.assertEqual(OutboxEvent.objects.get().status, OutboxEvent.DELIVERED)
+
+    @override_settings(OUTBOX_SINKS=["falha"])
+    def test_failing_sink_backs_off_exponentially_until_failed(self):
+        with mock.patch.dict(outbox.SINKS, {"falha": FailingSink()}):
+            outbox.publish_event(outbox.ORDER_CONFIRMED, {"order_id": 3})
+            event = OutboxEvent.objects.get()
+
+            for attempt in range(1, outbox.MAX_ATTEMPTS):
+                before = timezone.now()
+                self.assertEqual(outbox.dispatch_outbox(), (0, 1))
+                event.refresh_from_db()
+                self.assertEqual(event.attempts, attempt)
+                self.assertEqual(event.status, OutboxEvent.PENDING)
+                self.assertEqual(event.last_error, "Recusado")
+                delay = (event.available_at - before).total_seconds()
+                expected = outbox.RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+                self.assertAlmostEqual(delay, expected, delta=2)
+                self.make_available()
+
+            outbox.dispatch_outbox()
+        event.refresh_from_db()
+        self.assertEqual(event.status, OutboxEvent.FAILED)
+        self.assertEqual(event.attempts, outbox.MAX_ATTEMPTS)
+
+    def test_unknown_sink_is_recorded_as_failure(self):
+        OutboxEvent.objects.create(
+            event_type=outbox.ORDER_CONFIRMED, sink="inexistente", payload={"order_id": 4}
+        )
+
+        self.assertEqual(outbox.dispatch_outbox(), (0, 1))
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.attempts, 1)
+        self.assertEqual(event.status, OutboxEvent.PENDING)
+        self.assertIn("inexistente", event.last_error)
+
+
+class WhatsAppDispatchTests(TestCase):
+    """Fila de WhatsApp com o provedor em memória (`FakeProvider`)."""
+
+    account = "fake:testes"
+
+    def make_provider(self, rate_per_second=0.001, burst=100, batch_size=50):
+        return whatsapp.FakeProvider(
+            rate_per_second=rate_per_second, burst=burst, batch_size=batch_size
+        )
+
+    def enqueue(self, count, number="11999990000"):
+        return whatsapp.enqueue_messages(
+            [(number, f"Mensagem {index}", None) for index in range(count)],
+            account=self.account,
+        )
+
+    def make_available(self):
+        WhatsAppMessage.objects.update(available_at=timezone.now())
+
+    def test_token_bucket_limits_each_dispatch_to_burst(self):
+        provider = self.make_provider(burst=3)
+        self.enqueue(5)
+
+        self.assertEqual(whatsapp.dispatch_whatsapp(provider, self.account), (3, 0))
+        self.assertEqual(whatsapp.dispatch_whatsapp(provider, self.account), (0, 0))
+        self.assertEqual(len(provider.sent), 3)
+        self.assertEqual(
+            WhatsAppMessage.objects.filter(status=WhatsAppMessage.PENDING).count(), 2
+        )
+
+    def test_unused_tokens_are_returned_up_to_burst(self):
+        provider = self.make_provider(burst=5)
+        self.enqueue(2)
+
+        self.assertEqual(whatsapp.dispatch_whatsapp(provider, self.account), (2, 0))
+        bucket = WhatsAppRateLimit.objects.get(account=self.account)
+        self.assertAlmostEqual(bucket.tokens, 3, places=2)
+
+        whatsapp.return_tokens(self.account, 100, provider.burst)
+        bucket.refresh_from_db()
+        self.assertEqual(bucket.tokens, 5)
+
+    def test_rate_limited_batch_pauses_the_account(self):
+        provider = self.make_provider()
+        provider.rate_limit_next = 1
+        self.enqueue(2)
+
+        self.assertEqual(whatsapp.dispatch_whatsapp(provider, self.account), (0, 0))
+
+        bucket = WhatsAppRateLimit.objects.get(account=self.account)
+        self.assertGreater(bucket.paused_until, timezone.now())
+        self.assertEqual(bucket.tokens, 0)
+        self.assertEqual(
+            whatsapp.take_tokens(self.account, 10, provider.rate_per_second, provider.burst), 0
+        )
+        # As mensagens continuam na fila, reagendadas para depois da pausa
+        self.assertFalse(
+            WhatsAppMessage.objects.filter(
+                status=WhatsAppMessage.PENDING, available_at__lte=timezone.now()
+            ).exists()
+        )
+        self.assertEqual(provider.sent, [])
+
+    def test_failures_back_off_exponentially_until_failed(self):
+        provider = self.make_provider()
+        provider.fail_numbers = {"5511999990000"}
+        self.enqueue(1)
+        message = WhatsAppMessage.objects.get()
+
+        for attempt in range(1, whatsapp.MAX_ATTEMPTS):
+            before = timezone.now()
+            self.assertEqual(whatsapp.dispatch_whatsapp(provider, self.account), (0, 1))
+            message.refresh_from_db()
+            self.assertEqual(message.attempts, attempt)
+            self.assertEqual(message.status, WhatsAppMessage.PENDING)
+            delay = (message.available_at - before).total_seconds()
+            expected = whatsapp.RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+            self.assertAlmostEqual(delay, expected, delta=2)
+            self.make_available()
+
+        whatsapp.dispatch_whatsapp(provider, self.account)
+        message.refresh_from_db()
+        self.assertEqual(message.status, WhatsAppMessage.FAILED)
+        self.assertEqual(message.attempts, whatsapp.MAX_ATTEMPTS)
+
+    def test_receipts_never_move_status_backwards(self):
+        provider = self.make_provider()
+        self.enqueue(1)
+        whatsapp.dispatch_whatsapp(provider, self.account)
+        message = WhatsAppMessage.objects.get()
+        self.assertEqual(message.status, WhatsAppMessage.SENT)
+
+        self.assertTrue(whatsapp.record_receipt(message.provider_message_id, "read"))
+        self.assertFalse(whatsapp.record_receipt(message.provider_message_id, "delivered"))
+        self.assertFalse(whatsapp.record_receipt(message.provider_message_id, "failed"))
+        message.refresh_from_db()
+        self.assertEqual(message.status, WhatsAppMessage.READ)
+
+    def test_delivered_receipt_advances_sent_message(self):
+        provider = self.make_provider()
+        self.enqueue(1)
+        whatsapp.dispatch_whatsapp(provider, self.account)
+
+        provider.deliver_all()
+        message = WhatsAppMessage.objects.get()
+        self.assertEqual(message.status, WhatsAppMessage.DELIVERED)
+        self.assertIsNotNone(message.delivered_at)
+        self.assertFalse(whatsapp.record_receipt(message.provider_message_id, "desconhecido"))
+
+    @override_settings(WHATSAPP_RECEIPT_TOKEN="segredo")
+    def test_receipts_api_rejects_malformed_payloads(self):
+        url = reverse("raffles_api:whatsapp_receipts")
+        for body in (
+            {"receipts": "delivered"},
+            {"receipts": {"id": "1"}},
+            {"receipts": ["delivered"]},
+            {"receipts": [{"id": "1", "status": ["read"]}]},
+            [],
+        ):
+            response = self.client.post(
+                url, json.dumps(body), content_type="application/json",
+                HTTP_X_RECEIPT_TOKEN="segredo",
+            )
+            self.assertEqual(response.status_code, 400, body)
+
+    @override_settings(WHATSAPP_RECEIPT_TOKEN="segredo")
+    def test_receipts_api_records_valid_receipts(self):
+        provider = self.make_provider()
+        self.enqueue(1)
+        whatsapp.dispatch_whatsapp(provider, self.account)
+        message = WhatsAppMessage.objects.get()
+
+        response = self.client.post(
+            reverse("raffles_api:whatsapp_receipts"),
+            json.dumps({"receipts": [{"id": message.provider_message_id, "status": "read"}]}),
+            content_type="application/json",
+            HTTP_X_RECEIPT_TOKEN="segredo",
+        )
+
+        self.assertEqual(response.json(), {"received": 1, "updated": 1})
+
+
+class WebhookStubServer:
+    """
+    Servidor HTTP local (porta efêmera) que recebe webhooks nos testes.
+
+    Guarda cada requisição em `requests` (cabeçalhos e corpo) e responde
+    com os códigos de `statuses`, na ordem; esgotada a lista, responde 200.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.statuses = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                stub.requests.append({"headers": dict(self.headers), "body": body})
+                self.send_response(stub.statuses.pop(0) if stub.statuses else 200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/hooks"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class WebhookDeliveryTests(TestCase):
+    """Entrega de webhooks em lotes assinados contra o servidor local."""
+
+    secret = "segredo-de-teste"
+
+    def setUp(self):
+        self.stub = WebhookStubServer().__enter__()
+        self.addCleanup(self.stub.__exit__, None, None, None)
+        self.subscription = WebhookSubscription.objects.create(
+            name="Stub", url=self.stub.url, secret=self.secret, batch_size=2, max_concurrency=1
+        )
+
+    def publish(self, count):
+        events = [
+            OutboxEvent.objects.create(
+                event_type="order.confirmed", sink="webhook", payload={"order_id": index}
+            )
+            for index in range(count)
+        ]
+        return webhooks.fan_out(events)
+
+    def make_available(self):
+        WebhookDelivery.objects.update(available_at=timezone.now())
+
+    def test_sign_payload_is_hmac_of_timestamp_and_body(self):
+        body = b'{"batch_id": "x", "events": []}'
+        expected = hmac.new(
+            self.secret.encode(), b"1700000000." + body, hashlib.sha256
+        ).hexdigest()
+        self.assertEqual(
+            webhooks.sign_payload(self.secret, "1700000000", body), f"sha256={expected}"
+        )
+        self.assertNotEqual(
+            webhooks.sign_payload(self.secret, "1700000001", body), f"sha256={expected}"
+        )
+
+    def test_batches_are_signed_and_delivered(self):
+        self.assertEqual(self.publish(3), 3)
+
+        self.assertEqual(webhooks.dispatch_webhooks_pending(), 3)
+
+        self.assertEqual(len(self.stub.requests), 2)
+        sizes = []
+        for request in self.stub.requests:
+            headers, body = request["headers"], request["body"]
+            self.assertEqual(
+                headers["X-Cotas-Signature"],
+                webhooks.sign_payload(self.secret, headers["X-Cotas-Timestamp"], body),
+            )
+            payload = json.loads(body)
+            self.assertEqual(payload["batch_id"], headers["X-Cotas-Batch"])
+            sizes.append(len(payload["events"]))
+        self.assertEqual(sizes, [2, 1])
+        self.assertEqual(
+            WebhookDelivery.objects.filter(status=WebhookDelivery.DELIVERED).count(), 3
+        )
+
+    def test_claim_respects_max_concurrency(self):
+        self.subscription.batch_size = 1
+        self.subscription.save()
+        self.publish(3)
+
+        _, first_batch, first = webhooks.claim_batch(self.subscription.id)
+        self.assertEqual(len(first), 1)
+        # O único lote permitido está em andamento
+        self.assertEqual(webhooks.claim_batch(self.subscription.id), (self.subscription, None, []))
+
+        WebhookSubscription.objects.filter(id=self.subscription.id).update(max_concurrency=2)
+        _, second_batch, second = webhooks.claim_batch(self.subscription.id)
+        self.assertEqual(len(second), 1)
+        self.assertNotEqual(first_batch, second_batch)
+        self.assertEqual(webhooks.claim_batch(self.subscription.id)[1], None)
+
+    def test_failed_batches_back_off_exponentially(self):
+        self.publish(1)
+        delivery = WebhookDelivery.objects.get()
+
+        for attempt in (1, 2, 3):
+            self.stub.statuses.append(500)
+            before = timezone.now()
+            self.assertEqual(webhooks.deliver_batch(self.subscription.id), 1)
+            delivery.refresh_from_db()
+            self.assertEqual(delivery.status, WebhookDelivery.PENDING)
+            self.assertEqual(delivery.attempts, attempt)
+            self.assertEqual(delivery.last_status_code, 500)
+            delay = (delivery.available_at - before).total_seconds()
+            self.assertAlmostEqual(
+                delay, webhooks.RETRY_BASE_SECONDS * 2 ** (attempt - 1), delta=2
+            )
+            # Ainda em espera: nada a enviar
+            self.assertEqual(webhooks.deliver_batch(self.subscription.id), 0)
+            self.make_available()
+
+    def test_exhausted_deliveries_move_to_dead_letters(self):
+        self.publish(2)
+        WebhookDelivery.objects.update(attempts=webhooks.MAX_ATTEMPTS - 1)
+        self.stub.statuses.append(503)
+
+        self.assertEqual(webhooks.deliver_batch(self.subscription.id), 2)
+
+        self.assertFalse(WebhookDelivery.objects.exists())
+        letters = list(WebhookDeadLetter.objects.order_by("event_id"))
+        self.assertEqual(len(letters), 2)
+        self.assertEqual(letters[0].attempts, webhooks.MAX_ATTEMPTS)
+        self.assertEqual(letters[0].last_status_code, 503)
+
+        self.assertEqual(webhooks.requeue_dead_letters(WebhookDeadLetter.objects.all()), 2)
+        self.assertFalse(WebhookDeadLetter.objects.exists())
+        self.assertEqual(webhooks.dispatch_webhooks_pending(), 2)
+        self.assertEqual(
+            WebhookDelivery.objects.filter(status=WebhookDelivery.DELIVERED).count(), 2
+        )
@@ -9,10 +9,9 @@ from . import views_auth
 
 app_name = "raffles"
 
-urlpatterns = [
-    # URLs de autenticação
-    path("login/", views_auth.custom_login, name="custom_login"),
-    path("logout/", views_auth.custom_logout, name="custom_logout"),
+# Rotas que exigem login: o AuthRequiredMiddleware redireciona visitantes
+# anônimos para a tela de login com base nesta lista (resolvida uma vez).
+protected_urlpatterns = [
     path("profile/", views_auth.profile, name="profile"),
     
     # URLs administrativas (devem vir antes das públicas para evitar conflitos)
@@ -27,26 +26,40 @@ urlpatterns = [
     path("produto/<int:product_id>/toggle-status/", views_admin_products.admin_product_toggle_status, name="admin_product_toggle_status"),
     path("admin-pedidos/", views_admin.admin_orders, name="admin_orders"),
     path("admin-pedido/<int:order_id>/", views_admin.admin_order_detail, name="admin_order_detail"),
+    path("admin-pedidos/comprovantes/", views_admin.admin_receipt_review, name="admin_receipt_review"),
     path("admin-pedidos/historico/", views.admin_order_history, name="admin_order_history"),
+    path("admin-pedidos/exportar/<str:kind>/", views_admin.admin_export, name="admin_export"),
+    path("admin-pedidos/exportacoes/<path:name>", views_admin.admin_export_download, name="admin_export_download"),
     path("admin-pedido/<int:order_id>/detalhes/", views.admin_order_detail_full, name="admin_order_detail_full"),
     path("logs/", views_admin.admin_logs, name="admin_logs"),
+    path("tarefas/<int:job_id>/", views_admin.admin_job_detail, name="admin_job_detail"),
+    
+    # Ações administrativas
+    path("acoes/confirmar-pedido/<int:order_id>/", views_admin.confirm_order_action, name="confirm_order"),
+    path("acoes/cancelar-pedido/<int:order_id>/", views_admin.cancel_order_action, name="cancel_order"),
+    path("acoes/confirmar-com-comprovante/<int:order_id>/", views_admin.confirm_order_with_receipt, name="confirm_order_with_receipt"),
+    path("acoes/confirmar-sem-comprovante/<int:order_id>/", views_admin.confirm_order_without_receipt, name="confirm_order_without_receipt"),
+    path("acoes/sortear-produto/<int:product_id>/", views_admin.draw_product_action, name="draw_product"),
+    path("acoes/criar-cotas/<int:product_id>/", views_admin.create_quotas_action, name="create_quotas"),
+    path("acoes/liberar-reservas/", views_admin.release_reservations_action, name="release_reservations"),
+]
+
+urlpatterns = [
+    # URLs de autenticação
+    path("login/", views_auth.custom_login, name="custom_login"),
+    path("logout/", views_auth.custom_logout, name="custom_logout"),
+    
+    *protected_urlpatterns,
     
     # URLs públicas
     path("", views.home, name="home"),
     path("sucesso/", views.order_success, name="order_success"),
     path("comprovante/<int:order_id>/", views.upload_receipt, name="upload_receipt"),
+    path("media-protegida/<path:name>", views.protected_media, name="protected_media"),
     path("pedido/<int:order_id>/", views.order_status, name="order_status"),
     path("pedido/<int:order_id>/detalhes/", views.order_detail_full, name="order_detail_full"),
     path("produto/<int:product_id>/", views.product_detail, name="product_detail"),
     path("vencedores/", views.winners_list, name="winners_list"),
     path("historico/", views.order_history, name="order_history"),
-    
-    # Ações administrativas
-    path("acoes/confirmar-pedido/<int:order_id>/", views_admin.confirm_order_action, name="confirm_order"),
-    path("acoes/cancelar-pedido/<int:order_id>/", views_admin.cancel_order_action, name="cancel_order"),
-    path("acoes/confirmar-com-comprovante/<int:order_id>/", views_admin.confirm_order_with_receipt, name="confirm_order_with_receipt"),
-    path("acoes/confirmar-sem-comprovante/<int:order_id>/", views_admin.confirm_order_without_receipt, name="confirm_order_without_receipt"),
-    path("acoes/sortear-produto/<int:product_id>/", views_admin.draw_product_action, name="draw_product"),
-    path("acoes/criar-cotas/<int:product_id>/", views_admin.create_quotas_action, name="create_quotas"),
-    path("acoes/liberar-reservas/", views_admin.release_reservations_action, name="release_reservations"),
+    path("metrics", views.metrics, name="metrics"),
 ]
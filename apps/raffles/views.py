@@ -1,14 +1,18 @@
 """
 Views públicas para a app raffles.
 """
+import hmac
+import json
 import logging
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.http import urlencode
 from django.db import transaction
 from django.contrib import messages
-from django.core.exceptions import ValidationError
-from django.http import JsonResponse, Http404
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.http import HttpResponse, JsonResponse, Http404
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
@@ -20,10 +24,29 @@ from django.contrib.auth.decorators import login_required
 from .forms import PublicOrderForm, ReceiptUploadForm
 from .models import Product, Order, Quota
 from .services import allocate_random_quotas
+from .exports import filter_orders
+from .whatsapp import record_receipt
+from .receipts import attach_receipt, flag_duplicate_receipt, store_receipt
+from .protected_media import (
+    PROTECTED_PREFIXES, has_media_access, media_response, protected_storage, signed_media_url
+)
+from .metrics import render_prometheus
+from .quota_map import (
+    get_quota_map, parse_range, brotli, ENCODING_DESCRIPTION,
+    CACHE_SECONDS as QUOTA_MAP_CACHE_SECONDS
+)
 
 logger = logging.getLogger(__name__)
 
 
+def _receipt_fields(uploaded):
+    """Campos de comprovante para criação de um pedido."""
+    if not uploaded:
+        return {}
+    blob = store_receipt(uploaded)
+    return {"receipt": blob.file.name, "receipt_sha256": blob.sha256}
+
+
 def home(request):
     """
     Página inicial com lista de produtos ativos e formulário de pedido.
@@ -50,8 +73,9 @@ def home(request):
                     quantity=quantity,
                     total_price_cents=total_cents,
                     status=Order.RESERVED,
-                    receipt=form.cleaned_data.get("receipt")
+                    **_receipt_fields(form.cleaned_data.get("receipt"))
                 )
+                flag_duplicate_receipt(order)
                 
                 try:
                     # Aloca cotas aleatórias
@@ -120,6 +144,7 @@ def order_success(request):
         "numbers": numbers,
         "order_total": order_total,
         "reserve_expires_at": order.reserve_expires_at,
+        "receipt_url": signed_media_url(order.receipt.name) if order.receipt else "",
     }
     
     return render(request, "raffles/order_success.html", context)
@@ -144,9 +169,10 @@ def upload_receipt(request, order_id):
         
         if form.is_valid():
             try:
-                order.receipt = form.cleaned_data["receipt"]
+                attach_receipt(order, form.cleaned_data["receipt"])
                 order.status = Order.WAITING_PROOF
-                order.save(update_fields=["receipt", "status"])
+                order.save(update_fields=["receipt", "receipt_sha256", "status"])
+                flag_duplicate_receipt(order)
                 
                 messages.success(request, "Comprovante enviado com sucesso!")
                 
@@ -216,7 +242,7 @@ def winners_list(request):
     products = Product.objects.filter(
         status=Product.CLOSED,
         drawn_number__isnull=False
-    ).order_by("-draw_datetime")
+    ).with_quota_stats().order_by("-draw_datetime")
     
     context = {
         "products": products,
@@ -279,6 +305,61 @@ def api_product_quotas(request, product_id):
         )
 
 
+@require_http_methods(["GET", "HEAD"])
+def api_product_quota_map(request, product_id):
+    """
+    API endpoint com o status de todas as cotas em 2 bits por número.
+    
+    Suporta ETag/If-None-Match, compressão gzip/brotli e requisições
+    parciais (`Range: bytes=a-b`, servidas sem compressão).
+    """
+    product = Product.objects.filter(id=product_id).exclude(status=Product.DRAFT).first()
+    if product is None:
+        return JsonResponse(
+            {"error": "Produto não encontrado ou não está ativo"},
+            status=404
+        )
+    
+    quota_map = get_quota_map(product)
+    
+    if quota_map.etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponse(status=304)
+    else:
+        try:
+            byte_range = parse_range(request.headers.get("Range"), len(quota_map.data))
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{len(quota_map.data)}"
+            return response
+        
+        accepted = request.headers.get("Accept-Encoding", "")
+        if byte_range:
+            start, end = byte_range
+            response = HttpResponse(
+                quota_map.data[start:end + 1],
+                status=206,
+                content_type="application/octet-stream"
+            )
+            response["Content-Range"] = f"bytes {start}-{end}/{len(quota_map.data)}"
+        elif brotli is not None and "br" in accepted:
+            response = HttpResponse(quota_map.encoded("br"), content_type="application/octet-stream")
+            response["Content-Encoding"] = "br"
+        elif "gzip" in accepted:
+            response = HttpResponse(quota_map.encoded("gzip"), content_type="application/octet-stream")
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(quota_map.data, content_type="application/octet-stream")
+        
+        response["X-Quota-Total"] = quota_map.total
+        response["X-Quota-Encoding"] = ENCODING_DESCRIPTION
+        response["Accept-Ranges"] = "bytes"
+    
+    response["ETag"] = quota_map.etag
+    response["Cache-Control"] = f"public, max-age={QUOTA_MAP_CACHE_SECONDS}"
+    response["Vary"] = "Accept-Encoding"
+    return response
+
+
 class ProductListView(TemplateView):
     """
     View baseada em classe para listar produtos (alternativa à função home).
@@ -358,26 +439,17 @@ def admin_order_history(request):
     """
     Página administrativa para visualizar todos os pedidos com filtros.
     """
-    orders = Order.objects.all().order_by("-created_at")
-    
     # Filtros
     status_filter = request.GET.get("status", "")
     product_filter = request.GET.get("product", "")
     search_filter = request.GET.get("search", "")
     
-    if status_filter:
-        orders = orders.filter(status=status_filter)
-    
-    if product_filter:
-        orders = orders.filter(product_id=product_filter)
-    
-    if search_filter:
-        orders = orders.filter(
-            Q(full_name__icontains=search_filter) |
-            Q(email__icontains=search_filter) |
-            Q(whatsapp__icontains=search_filter) |
-            Q(id__icontains=search_filter)
-        )
+    orders = filter_orders(
+        Order.objects.all().order_by("-created_at"),
+        status=status_filter,
+        product=product_filter,
+        search=search_filter,
+    )
     
     # Paginação simples
     from django.core.paginator import Paginator
@@ -395,6 +467,12 @@ def admin_order_history(request):
         "status_filter": status_filter,
         "product_filter": product_filter,
         "search_filter": search_filter,
+        # Filtros atuais para os links de exportação (valores codificados)
+        "export_query": urlencode({
+            "status": status_filter,
+            "product": product_filter,
+            "search": search_filter,
+        }),
     }
     
     return render(request, "raffles/admin_order_history_modern.html", context)
@@ -420,3 +498,76 @@ def admin_order_detail_full(request, order_id):
     }
     
     return render(request, "raffles/admin_order_detail_full.html", context)
+
+
+@require_http_methods(["GET", "HEAD"])
+def protected_media(request, name):
+    """
+    Entrega um comprovante para a equipe ou para quem tem o link assinado.
+    
+    Em produção o arquivo é enviado pelo nginx (`X-Accel-Redirect`).
+    """
+    if not name.startswith(PROTECTED_PREFIXES) or not has_media_access(request, name):
+        raise Http404("Arquivo não encontrado")
+    
+    try:
+        if not protected_storage().exists(name):
+            raise Http404("Arquivo não encontrado")
+    except SuspiciousFileOperation:
+        raise Http404("Arquivo não encontrado")
+    
+    return media_response(name)
+
+
+def metrics(request):
+    """
+    Métricas por view no formato texto do Prometheus.
+    
+    Acesso para a equipe logada ou com `Authorization: Bearer <METRICS_TOKEN>`
+    (para o coletor do Prometheus); os demais recebem 404.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if not authorized and token:
+        authorized = hmac.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        )
+    if not authorized:
+        raise Http404("Página não encontrada")
+    
+    return HttpResponse(
+        render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_whatsapp_receipts(request):
+    """
+    Webhook de recibos de entrega/leitura do provedor de WhatsApp.
+    
+    Espera o cabeçalho `X-Receipt-Token` igual a `WHATSAPP_RECEIPT_TOKEN` e
+    um corpo `{"receipts": [{"id": ..., "status": "delivered|read|failed"}]}`.
+    """
+    token = getattr(settings, "WHATSAPP_RECEIPT_TOKEN", "")
+    if not token or not hmac.compare_digest(
+        request.headers.get("X-Receipt-Token", ""), token
+    ):
+        return JsonResponse({"error": "Não autorizado"}, status=401)
+    
+    try:
+        receipts = json.loads(request.body or b"{}").get("receipts", [])
+        if not isinstance(receipts, list):
+            raise ValueError("receipts deve ser uma lista")
+        for item in receipts:
+            if not isinstance(item, dict) or not isinstance(item.get("status", ""), str):
+                raise ValueError("Recibo inválido")
+    except (ValueError, AttributeError):
+        return JsonResponse({"error": "JSON inválido"}, status=400)
+    
+    updated = sum(
+        record_receipt(str(item.get("id", "")), item.get("status", ""), str(item.get("error", "")))
+        for item in receipts
+    )
+    
+    return JsonResponse({"received": len(receipts), "updated": updated})
@@ -1,6 +1,7 @@
 """
 Views administrativas para a app raffles.
 """
+import json
 import logging
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
@@ -9,93 +10,40 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 from django.utils import timezone
 from django.contrib import messages
-from django.core.exceptions import ValidationError
-from django.http import JsonResponse
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.generic import TemplateView
 from django.db.models import Count, Q
 
-from .models import Product, Order, Quota, AdminLog
+from .models import Product, Order, Quota, AdminLog, BackgroundJob
 from .forms import ProductForm, OrderStatusForm
 from .services import (
     confirm_order, cancel_order, draw_winner, 
-    create_product_quotas, release_expired_reservations
+    release_expired_reservations,
+    bulk_confirm_orders, bulk_cancel_orders,
+    CONFIRM_STATUSES, CONFIRM_WITH_RECEIPT_STATUSES
 )
+from .dashboard import get_dashboard_data, get_global_stats
+from .exports import export_lines, export_filename, EXPORT_DIR, EXPORT_FORMATS
+from .jobs import enqueue_job, job_status
+from .protected_media import media_response, protected_storage
+from .receipts import duplicate_receipt_orders, review_queue, REVIEW_PAGE_SIZE
 
 logger = logging.getLogger(__name__)
 
+BULK_ORDER_ACTIONS = {
+    "confirm": bulk_confirm_orders,
+    "cancel": bulk_cancel_orders,
+}
+
 
 @login_required
 def admin_dashboard(request, product_id=None):
     """
     Dashboard administrativo principal.
     """
-    products = Product.objects.all().order_by("-created_at")
-    
-    if product_id is None:
-        product = products.first() if products.exists() else None
-    else:
-        product = get_object_or_404(Product, id=product_id)
-    
-    # Estatísticas gerais
-    total_products = Product.objects.count()
-    active_products = Product.objects.filter(status=Product.ACTIVE).count()
-    closed_products = Product.objects.filter(status=Product.CLOSED).count()
-    
-    # Estatísticas do produto selecionado
-    if product:
-        total_quotas = product.total_quotas
-        sold_count = product.sold_count
-        reserved_count = product.reserved_count
-        available_count = product.available_count
-        progress_percentage = getattr(product, 'progress_percentage', 0)
-        
-        # Pedidos recentes para o produto
-        recent_orders = Order.objects.filter(
-            product=product
-        ).order_by("-created_at")[:50]
-        
-        # Estatísticas de pedidos
-        orders_stats = Order.objects.filter(product=product).aggregate(
-            total_orders=Count('id'),
-            confirmed_orders=Count('id', filter=Q(status=Order.CONFIRMED)),
-            pending_orders=Count('id', filter=Q(status__in=[
-                Order.RESERVED, Order.WAITING_CONFIRM, Order.WAITING_PROOF
-            ])),
-            expired_orders=Count('id', filter=Q(status=Order.EXPIRED)),
-            canceled_orders=Count('id', filter=Q(status=Order.CANCELED)),
-        )
-        
-        # Receita total (apenas pedidos confirmados)
-        confirmed_orders = Order.objects.filter(
-            product=product,
-            status=Order.CONFIRMED
-        )
-        total_revenue_cents = sum(order.total_price_cents for order in confirmed_orders)
-        total_revenue = f"R$ {total_revenue_cents / 100:.2f}".replace('.', ',')
-        
-    else:
-        total_quotas = sold_count = reserved_count = available_count = 0
-        progress_percentage = 0
-        recent_orders = []
-        orders_stats = {}
-        total_revenue = "R$ 0,00"
-    
-    context = {
-        "products": products,
-        "product": product,
-        "total_products": total_products,
-        "active_products": active_products,
-        "closed_products": closed_products,
-        "total_quotas": total_quotas,
-        "sold_count": sold_count,
-        "reserved_count": reserved_count,
-        "available_count": available_count,
-        "progress_percentage": progress_percentage,
-        "recent_orders": recent_orders,
-        "orders_stats": orders_stats,
-        "total_revenue": total_revenue,
-    }
+    context = get_dashboard_data(product_id)
     
     return render(request, "raffles/dashboard_modern.html", context)
 
@@ -215,6 +163,7 @@ def admin_order_detail(request, order_id):
     context = {
         "order": order,
         "quotas": quotas,
+        "duplicate_receipt_orders": duplicate_receipt_orders(order),
     }
     
     return render(request, "raffles/admin_order_detail.html", context)
@@ -226,15 +175,16 @@ def confirm_order_action(request, order_id):
     Ação para confirmar um pedido.
     """
     try:
-        success = confirm_order(order_id, admin_user=request.user)
+        result = confirm_order(order_id, admin_user=request.user)
         
-        if success:
-            messages.success(request, f"Pedido #{order_id} confirmado com sucesso!")
-        else:
-            messages.error(request, f"Erro ao confirmar pedido #{order_id}")
+        messages.success(
+            request,
+            f"Pedido #{order_id} confirmado com sucesso! "
+            f"{len(result['numbers'])} cotas foram marcadas como vendidas."
+        )
             
     except ValidationError as e:
-        messages.error(request, str(e))
+        messages.error(request, e.messages[0])
     except Exception as e:
         logger.error(f"Erro ao confirmar pedido {order_id}: {str(e)}")
         messages.error(request, f"Erro interno: {str(e)}")
@@ -283,18 +233,6 @@ def draw_product_action(request, product_id):
             f"Vencedor: {winner_info['winner_name']}"
         )
         
-        # Log da ação
-        AdminLog.objects.create(
-            admin_id=str(request.user.id),
-            action="draw_completed",
-            details={
-                "product_id": product_id,
-                "drawn_number": winner_info['drawn_number'],
-                "winner_name": winner_info['winner_name'],
-                "winner_order_id": winner_info['order_id']
-            }
-        )
-        
         # Redireciona para a página de detalhes do produto para mostrar o vencedor
         return redirect(reverse('raffles:admin_product_detail', args=[product_id]))
         
@@ -310,23 +248,15 @@ def draw_product_action(request, product_id):
 @login_required
 def create_quotas_action(request, product_id):
     """
-    Ação para criar cotas para um produto.
+    Ação para criar cotas para um produto (em segundo plano).
     """
-    try:
-        quotas_created = create_product_quotas(product_id)
-        
-        messages.success(
-            request,
-            f"Criadas {quotas_created} cotas para o produto com sucesso!"
-        )
-        
-    except ValidationError as e:
-        messages.error(request, str(e))
-    except Exception as e:
-        logger.error(f"Erro ao criar cotas para produto {product_id}: {str(e)}")
-        messages.error(request, f"Erro interno: {str(e)}")
+    product = get_object_or_404(Product, id=product_id)
+    
+    job = enqueue_job("create_quotas", {"product_id": product.id}, admin_user=request.user)
+    
+    messages.success(request, f"Criação de cotas para \"{product.title}\" iniciada.")
     
-    return redirect(request.META.get('HTTP_REFERER', reverse('raffles:admin_products')))
+    return redirect(reverse('raffles:admin_job_detail', args=[job.id]))
 
 
 @login_required
@@ -356,23 +286,7 @@ def admin_stats_api(request):
     API para estatísticas em tempo real do dashboard.
     """
     try:
-        # Estatísticas gerais
-        stats = {
-            "total_products": Product.objects.count(),
-            "active_products": Product.objects.filter(status=Product.ACTIVE).count(),
-            "closed_products": Product.objects.filter(status=Product.CLOSED).count(),
-            "total_orders": Order.objects.count(),
-            "confirmed_orders": Order.objects.filter(status=Order.CONFIRMED).count(),
-            "pending_orders": Order.objects.filter(status__in=[
-                Order.RESERVED, Order.WAITING_CONFIRM, Order.WAITING_PROOF
-            ]).count(),
-            "expired_orders": Order.objects.filter(status=Order.EXPIRED).count(),
-        }
-        
-        # Receita total
-        confirmed_orders = Order.objects.filter(status=Order.CONFIRMED)
-        total_revenue_cents = sum(order.total_price_cents for order in confirmed_orders)
-        stats["total_revenue"] = f"R$ {total_revenue_cents / 100:.2f}".replace('.', ',')
+        stats = get_global_stats()
         
         return JsonResponse(stats)
         
@@ -381,6 +295,180 @@ def admin_stats_api(request):
         return JsonResponse({"error": "Erro interno"}, status=500)
 
 
+@login_required
+@require_http_methods(["POST"])
+def bulk_orders_api(request):
+    """
+    API para confirmar/cancelar pedidos em lote.
+    
+    Corpo JSON: {"action": "confirm" | "cancel", "order_ids": [1, 2, ...]}
+    """
+    try:
+        payload = json.loads(request.body or b"{}")
+        if not isinstance(payload, dict):
+            raise ValueError("O corpo deve ser um objeto JSON")
+        action = payload.get("action")
+        order_ids = payload.get("order_ids", [])
+        if not isinstance(order_ids, list):
+            raise ValueError("order_ids deve ser uma lista")
+        order_ids = [int(order_id) for order_id in order_ids]
+    except (ValueError, TypeError):
+        return JsonResponse({"error": "JSON inválido"}, status=400)
+    
+    if action not in BULK_ORDER_ACTIONS:
+        return JsonResponse({"error": "Ação inválida"}, status=400)
+    
+    if not order_ids:
+        return JsonResponse({"error": "Nenhum pedido informado"}, status=400)
+    
+    if payload.get("async"):
+        job = enqueue_job(
+            "bulk_orders",
+            {"action": action, "order_ids": order_ids, "admin_id": request.user.id},
+            admin_user=request.user
+        )
+        return JsonResponse(
+            {
+                "job_id": job.id,
+                "status_url": reverse('raffles_api:job_status', args=[job.id]),
+            },
+            status=202
+        )
+    
+    try:
+        result = BULK_ORDER_ACTIONS[action](order_ids, admin_user=request.user)
+        result["rejected"] = {
+            str(order_id): reason for order_id, reason in result["rejected"].items()
+        }
+        return JsonResponse(result)
+        
+    except Exception as e:
+        logger.error(f"Erro na ação em lote {action}: {str(e)}")
+        return JsonResponse({"error": "Erro interno"}, status=500)
+
+
+@login_required
+@require_http_methods(["GET"])
+def admin_export(request, kind):
+    """
+    Exporta pedidos, cotas ou participantes em CSV/NDJSON (streaming).
+    
+    Usa os mesmos filtros do histórico de pedidos. Com `?async=1` a
+    exportação é gerada em segundo plano e gravada como arquivo gzip.
+    """
+    fmt = request.GET.get("format", "csv")
+    filters = {
+        "status": request.GET.get("status", ""),
+        "product": request.GET.get("product", ""),
+        "search": request.GET.get("search", ""),
+    }
+    back_url = reverse('raffles:admin_order_history')
+    
+    try:
+        lines = export_lines(kind, fmt, filters)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect(back_url)
+    
+    if request.GET.get("async"):
+        job = enqueue_job(
+            "export",
+            {"kind": kind, "fmt": fmt, "filters": filters},
+            admin_user=request.user
+        )
+        messages.success(request, "Exportação iniciada em segundo plano.")
+        return redirect(reverse('raffles:admin_job_detail', args=[job.id]))
+    
+    response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[fmt])
+    response["Content-Disposition"] = f'attachment; filename="{export_filename(kind, fmt)}"'
+    
+    logger.info(f"Admin {request.user.username} exportou {kind} ({fmt})")
+    
+    return response
+
+
+@login_required
+@require_http_methods(["GET"])
+def admin_export_download(request, name):
+    """
+    Baixa uma exportação gerada em segundo plano (somente equipe).
+    
+    Os arquivos ficam no storage protegido; em produção são enviados pelo
+    nginx (`X-Accel-Redirect`).
+    """
+    if not request.user.is_staff or not name.startswith(EXPORT_DIR):
+        raise Http404("Arquivo não encontrado")
+    
+    try:
+        if not protected_storage().exists(name):
+            raise Http404("Arquivo não encontrado")
+    except SuspiciousFileOperation:
+        raise Http404("Arquivo não encontrado")
+    
+    response = media_response(name)
+    response["Content-Type"] = "application/gzip"
+    response["Content-Disposition"] = f'attachment; filename="{name[len(EXPORT_DIR):]}"'
+    response["Cache-Control"] = "private, no-store"
+    
+    logger.info(f"Admin {request.user.username} baixou a exportação {name}")
+    
+    return response
+
+
+@login_required
+def admin_job_detail(request, job_id):
+    """
+    Acompanhamento de uma tarefa em segundo plano.
+    """
+    job = get_object_or_404(BackgroundJob, id=job_id)
+    
+    context = {
+        "job": job,
+        "back_url": request.META.get('HTTP_REFERER'),
+    }
+    
+    return render(request, "raffles/admin_job_detail.html", context)
+
+
+@login_required
+@require_http_methods(["GET"])
+def job_status_api(request, job_id):
+    """
+    API para consultar o progresso de uma tarefa em segundo plano.
+    """
+    job = get_object_or_404(BackgroundJob, id=job_id)
+    
+    return JsonResponse(job_status(job))
+
+
+@login_required
+def admin_receipt_review(request):
+    """
+    Fila de revisão de comprovantes (pedidos aguardando comprovante).
+    """
+    context = {
+        "items": review_queue(),
+        "page_size": REVIEW_PAGE_SIZE,
+        "pending_count": Order.objects.filter(status=Order.WAITING_PROOF).count(),
+    }
+    
+    return render(request, "raffles/admin_receipt_review.html", context)
+
+
+@login_required
+@require_http_methods(["GET"])
+def receipt_review_api(request):
+    """
+    API com a próxima página da fila de revisão (`?after=<id do pedido>`).
+    """
+    try:
+        after_id = int(request.GET.get("after", 0))
+    except ValueError:
+        return JsonResponse({"error": "Cursor inválido"}, status=400)
+    
+    return JsonResponse({"items": review_queue(after_id)})
+
+
 @login_required
 def admin_logs(request):
     """
@@ -428,53 +516,26 @@ def confirm_order_with_receipt(request, order_id):
     """
     Confirma um pedido que tem comprovante de pagamento.
     """
-    order = get_object_or_404(Order, id=order_id)
-    
-    if order.status not in [Order.WAITING_PROOF, Order.WAITING_CONFIRM]:
-        messages.error(request, "Este pedido não pode ser confirmado no momento.")
-        return redirect(reverse("raffles:admin_order_detail", args=[order_id]))
-    
-    if not order.receipt:
-        messages.error(request, "Este pedido não possui comprovante de pagamento.")
-        return redirect(reverse("raffles:admin_order_detail", args=[order_id]))
-    
     try:
-        # Confirma o pedido
-        order.status = Order.CONFIRMED
-        order.save(update_fields=["status"])
-        
-        # Atualiza todas as cotas do pedido para vendidas
-        quotas = Quota.objects.filter(order=order)
-        quotas.update(
-            status=Quota.SOLD,
-            reserved_until=None
-        )
-        
-        # Registra no log
-        AdminLog.objects.create(
-            admin_id=str(request.user.id),
+        result = confirm_order(
+            order_id,
+            admin_user=request.user,
+            require_receipt=True,
             action="Confirmar Pedido com Comprovante",
-            details={
-                "order_id": order_id,
-                "customer_name": order.full_name,
-                "product": order.product.title,
-                "quotas_count": quotas.count(),
-                "quotas_numbers": list(quotas.values_list('number', flat=True)),
-                "admin_user": request.user.username
-            }
+            allowed_statuses=CONFIRM_WITH_RECEIPT_STATUSES,
+            count_key="quotas_count"
         )
         
         messages.success(
             request, 
             f"Pedido #{order_id} confirmado com sucesso! "
-            f"{quotas.count()} cotas foram marcadas como vendidas."
+            f"{len(result['numbers'])} cotas foram marcadas como vendidas."
         )
         
         logger.info(f"Admin {request.user.username} confirmou pedido {order_id} com comprovante")
         
-    except Exception as e:
-        logger.error(f"Erro ao confirmar pedido {order_id}: {str(e)}")
-        messages.error(request, f"Erro ao confirmar pedido: {str(e)}")
+    except ValidationError as e:
+        messages.error(request, e.messages[0])
     
     return redirect(reverse("raffles:admin_order_detail", args=[order_id]))
 
@@ -484,50 +545,26 @@ def confirm_order_without_receipt(request, order_id):
     """
     Confirma um pedido sem comprovante de pagamento (confiança).
     """
-    order = get_object_or_404(Order, id=order_id)
-    
-    if order.status not in [Order.RESERVED, Order.WAITING_CONFIRM]:
-        messages.error(request, "Este pedido não pode ser confirmado no momento.")
-        return redirect(reverse("raffles:admin_order_detail", args=[order_id]))
-    
     try:
-        # Confirma o pedido
-        order.status = Order.CONFIRMED
-        order.save(update_fields=["status"])
-        
-        # Atualiza todas as cotas do pedido para vendidas
-        quotas = Quota.objects.filter(order=order)
-        quotas.update(
-            status=Quota.SOLD,
-            reserved_until=None
-        )
-        
-        # Registra no log
-        AdminLog.objects.create(
-            admin_id=str(request.user.id),
+        result = confirm_order(
+            order_id,
+            admin_user=request.user,
             action="Confirmar Pedido sem Comprovante",
-            details={
-                "order_id": order_id,
-                "customer_name": order.full_name,
-                "product": order.product.title,
-                "quotas_count": quotas.count(),
-                "quotas_numbers": list(quotas.values_list('number', flat=True)),
-                "admin_user": request.user.username,
-                "note": "Confirmação por confiança - sem comprovante"
-            }
+            extra_details={"note": "Confirmação por confiança - sem comprovante"},
+            allowed_statuses=CONFIRM_STATUSES,
+            count_key="quotas_count"
         )
         
         messages.success(
             request, 
             f"Pedido #{order_id} confirmado por confiança! "
-            f"{quotas.count()} cotas foram marcadas como vendidas. "
+            f"{len(result['numbers'])} cotas foram marcadas como vendidas. "
             f"⚠️ ATENÇÃO: Este pedido foi confirmado sem comprovante."
         )
         
         logger.info(f"Admin {request.user.username} confirmou pedido {order_id} sem comprovante")
         
-    except Exception as e:
-        logger.error(f"Erro ao confirmar pedido {order_id}: {str(e)}")
-        messages.error(request, f"Erro ao confirmar pedido: {str(e)}")
+    except ValidationError as e:
+        messages.error(request, e.messages[0])
     
     return redirect(reverse("raffles:admin_order_detail", args=[order_id]))
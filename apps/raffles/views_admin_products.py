@@ -12,10 +12,60 @@ from django.utils import timezone
 
 from .models import Product, Quota
 from .forms import ProductForm
+from .jobs import enqueue_job, start_product_activation, start_quota_resize
 
 logger = logging.getLogger(__name__)
 
 
+def _hold_activation(form, product):
+    """
+    Mantém o status anterior quando o formulário pede a ativação.
+    
+    A ativação é feita pelo pipeline em segundo plano, que cria as cotas
+    antes de tornar o produto visível.
+    """
+    if 'status' in form.changed_data and product.status == Product.ACTIVE:
+        product.status = form.initial.get('status') or Product.DRAFT
+        return True
+    return False
+
+
+def _hold_resize(form, product):
+    """
+    Mantém o total de cotas anterior quando o produto já possui cotas.
+    
+    A alteração é aplicada de forma incremental por uma tarefa em segundo
+    plano. Retorna o novo total pedido, ou None se não há redimensionamento.
+    """
+    if 'total_quotas' not in form.changed_data or not product.pk:
+        return None
+    if not Quota.objects.filter(product=product).exists():
+        return None
+    new_total = product.total_quotas
+    product.total_quotas = form.initial['total_quotas']
+    return new_total
+
+
+def _start_resize(request, product, new_total):
+    """Agenda o redimensionamento das cotas e redireciona para a tarefa."""
+    job = start_quota_resize(product, new_total, admin_user=request.user)
+    
+    messages.success(request, f'Alteração de "{product.title}" para {new_total} cotas iniciada.')
+    logger.info(f"Admin {request.user.username} iniciou o redimensionamento do produto {product.id} (tarefa {job.id})")
+    
+    return redirect(reverse('raffles:admin_job_detail', args=[job.id]))
+
+
+def _start_activation(request, product, new_total=None):
+    """Agenda a ativação (e o redimensionamento pendente) e redireciona para a tarefa."""
+    job = start_product_activation(product, admin_user=request.user, new_total=new_total)
+    
+    messages.success(request, f'Ativação do produto "{product.title}" iniciada.')
+    logger.info(f"Admin {request.user.username} iniciou a ativação do produto {product.id} (tarefa {job.id})")
+    
+    return redirect(reverse('raffles:admin_job_detail', args=[job.id]))
+
+
 @login_required
 def admin_product_create(request):
     """
@@ -26,11 +76,15 @@ def admin_product_create(request):
         if form.is_valid():
             product = form.save(commit=False)
             product.created_by = request.user
+            activating = _hold_activation(form, product)
             product.save()
             
             messages.success(request, f'Produto "{product.title}" criado com sucesso!')
             logger.info(f"Admin {request.user.username} criou produto {product.id}: {product.title}")
             
+            if activating:
+                return _start_activation(request, product)
+            
             return redirect(reverse('raffles:admin_product_detail', args=[product.id]))
     else:
         form = ProductForm()
@@ -56,11 +110,20 @@ def admin_product_edit(request, product_id):
         if form.is_valid():
             product = form.save(commit=False)
             product.updated_at = timezone.now()
+            activating = _hold_activation(form, product)
+            new_total = _hold_resize(form, product)
             product.save()
             
             messages.success(request, f'Produto "{product.title}" atualizado com sucesso!')
             logger.info(f"Admin {request.user.username} editou produto {product.id}: {product.title}")
             
+            # Ativação e redimensionamento juntos rodam em uma única tarefa
+            if activating:
+                return _start_activation(request, product, new_total)
+            
+            if new_total is not None:
+                return _start_resize(request, product, new_total)
+            
             return redirect(reverse('raffles:admin_product_detail', args=[product.id]))
     else:
         form = ProductForm(instance=product)
@@ -106,19 +169,12 @@ def admin_product_create_quotas(request, product_id):
     product = get_object_or_404(Product, id=product_id)
     
     if request.method == 'POST':
-        try:
-            from .management.commands.create_quotas import Command
-            command = Command()
-            command.handle(product_id=product_id)
-            
-            messages.success(request, f'{product.total_quotas} cotas criadas para "{product.title}"!')
-            logger.info(f"Admin {request.user.username} criou {product.total_quotas} cotas para produto {product.id}")
-            
-        except Exception as e:
-            messages.error(request, f'Erro ao criar cotas: {str(e)}')
-            logger.error(f"Erro ao criar cotas para produto {product_id}: {str(e)}")
+        job = enqueue_job("create_quotas", {"product_id": product.id}, admin_user=request.user)
         
-        return redirect(reverse('raffles:admin_product_detail', args=[product.id]))
+        messages.success(request, f'Criação de {product.total_quotas} cotas para "{product.title}" iniciada.')
+        logger.info(f"Admin {request.user.username} iniciou a criação de cotas do produto {product.id} (tarefa {job.id})")
+        
+        return redirect(reverse('raffles:admin_job_detail', args=[job.id]))
     
     context = {
         'product': product,
@@ -135,17 +191,14 @@ def admin_product_toggle_status(request, product_id):
     product = get_object_or_404(Product, id=product_id)
     
     if request.method == 'POST':
-        if product.status == Product.ACTIVE:
-            product.status = Product.DRAFT
-            status_text = "desativado"
-        else:
-            product.status = Product.ACTIVE
-            status_text = "ativado"
+        if product.status != Product.ACTIVE:
+            return _start_activation(request, product)
         
+        product.status = Product.DRAFT
         product.save()
         
-        messages.success(request, f'Produto "{product.title}" {status_text} com sucesso!')
-        logger.info(f"Admin {request.user.username} {status_text} produto {product.id}")
+        messages.success(request, f'Produto "{product.title}" desativado com sucesso!')
+        logger.info(f"Admin {request.user.username} desativado produto {product.id}")
         
         return redirect(reverse('raffles:admin_product_detail', args=[product.id]))
     
@@ -0,0 +1,301 @@
+"""
+Entrega de webhooks para assinaturas externas.
+
+O destino `webhook` do outbox cria uma `WebhookDelivery` por evento e
+assinatura interessada. O worker agrupa as entregas pendentes de cada
+assinatura em lotes, limitados a `max_concurrency` lotes simultâneos por
+endpoint, e envia:
+
+    POST <url>
+    X-Cotas-Timestamp: <unix>
+    X-Cotas-Signature: sha256=<hmac(secret, "<timestamp>.<corpo>")>
+    {"batch_id": "...", "events": [{"id", "type", "data"}, ...]}
+
+Falhas são reenviadas com espera exponencial; ao esgotar as tentativas o
+evento vai para `WebhookDeadLetter`. O estado de entrega fica nessas
+tabelas, sem tocar na tabela de pedidos.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import WebhookDeadLetter, WebhookDelivery, WebhookSubscription
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+RETRY_BASE_SECONDS = 30
+LEASE_SECONDS = 120
+HTTP_TIMEOUT_SECONDS = 15
+USER_AGENT = "sistema-cotas-webhooks/1"
+
+
+def sign_payload(secret, timestamp, body):
+    """
+    Assinatura HMAC-SHA256 de um corpo de webhook.
+
+    Args:
+        secret: Segredo da assinatura
+        timestamp: Timestamp Unix enviado em `X-Cotas-Timestamp`
+        body: Corpo da requisição (bytes)
+
+    Returns:
+        str: Valor do cabeçalho `X-Cotas-Signature`
+    """
+    message = f"{timestamp}.".encode("utf-8") + body
+    digest = hmac.new(secret.encode("utf-8"), message, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def fan_out(events):
+    """
+    Cria as entregas dos eventos do outbox para as assinaturas ativas.
+
+    Args:
+        events: Instâncias de `OutboxEvent`
+
+    Returns:
+        int: Número de entregas criadas
+    """
+    subscriptions = list(WebhookSubscription.objects.filter(is_active=True))
+    deliveries = [
+        WebhookDelivery(
+            subscription=subscription,
+            event_id=event.id,
+            event_type=event.event_type,
+            payload=event.payload,
+        )
+        for event in events
+        for subscription in subscriptions
+        if subscription.wants(event.event_type)
+    ]
+    WebhookDelivery.objects.bulk_create(deliveries)
+    return len(deliveries)
+
+
+def _ready(now):
+    """Entregas prontas para envio (pendentes ou com lease vencido)."""
+    return WebhookDelivery.objects.filter(
+        Q(status=WebhookDelivery.PENDING)
+        | Q(status=WebhookDelivery.DELIVERING, locked_until__lt=now),
+        available_at__lte=now,
+    )
+
+
+def claim_batch(subscription_id):
+    """
+    Reserva um lote de entregas respeitando o limite de concorrência.
+
+    A linha da assinatura é bloqueada durante a reserva, então o número
+    de lotes em andamento nunca passa de `max_concurrency`, mesmo com
+    vários workers.
+
+    Returns:
+        tuple: (assinatura, batch_id, entregas) ou (assinatura, None, [])
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        subscription = (
+            WebhookSubscription.objects
+            .select_for_update()
+            .filter(id=subscription_id, is_active=True)
+            .first()
+        )
+        if subscription is None:
+            return None, None, []
+
+        in_flight = (
+            WebhookDelivery.objects
+            .filter(
+                subscription=subscription,
+                status=WebhookDelivery.DELIVERING,
+                locked_until__gte=now,
+            )
+            .values("batch_id")
+            .distinct()
+            .count()
+        )
+        if in_flight >= subscription.max_concurrency:
+            return subscription, None, []
+
+        deliveries = list(
+            _ready(now)
+            .filter(subscription=subscription)
+            .select_for_update(skip_locked=True)
+            .order_by("id")[:subscription.batch_size]
+        )
+        if not deliveries:
+            return subscription, None, []
+
+        batch_id = uuid.uuid4().hex
+        WebhookDelivery.objects.filter(id__in=[d.id for d in deliveries]).update(
+            status=WebhookDelivery.DELIVERING,
+            batch_id=batch_id,
+            locked_until=now + timezone.timedelta(seconds=LEASE_SECONDS),
+        )
+    return subscription, batch_id, deliveries
+
+
+def post_batch(subscription, batch_id, deliveries):
+    """
+    Envia um lote assinado ao endpoint da assinatura.
+
+    Returns:
+        tuple: (HTTP status ou None, mensagem de erro ou "")
+    """
+    body = json.dumps(
+        {
+            "batch_id": batch_id,
+            "events": [
+                {"id": d.event_id, "type": d.event_type, "data": d.payload}
+                for d in deliveries
+            ],
+        },
+        default=str,
+    ).encode("utf-8")
+    timestamp = str(int(time.time()))
+
+    request = urllib.request.Request(
+        subscription.url,
+        data=body,
+        headers={
+            "Content-Type": "application/json",
+            "User-Agent": USER_AGENT,
+            "X-Cotas-Batch": batch_id,
+            "X-Cotas-Timestamp": timestamp,
+            "X-Cotas-Signature": sign_payload(subscription.secret, timestamp, body),
+        },
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT_SECONDS) as response:
+            return response.status, ""
+    except urllib.error.HTTPError as e:
+        return e.code, f"HTTP {e.code}"
+    except Exception as e:
+        return None, str(e)
+
+
+def deliver_batch(subscription_id):
+    """
+    Reserva e entrega um lote de uma assinatura.
+
+    Returns:
+        int: Número de eventos no lote (0 se não havia nada a enviar)
+    """
+    subscription, batch_id, deliveries = claim_batch(subscription_id)
+    if not deliveries:
+        return 0
+
+    status_code, error = post_batch(subscription, batch_id, deliveries)
+    now = timezone.now()
+    ids = [d.id for d in deliveries]
+
+    if not error:
+        WebhookDelivery.objects.filter(id__in=ids, batch_id=batch_id).update(
+            status=WebhookDelivery.DELIVERED,
+            delivered_at=now,
+            locked_until=None,
+            last_status_code=status_code,
+            last_error="",
+        )
+        logger.info(f"Webhook {subscription}: lote {batch_id} com {len(ids)} evento(s) entregue")
+        return len(ids)
+
+    logger.warning(f"Webhook {subscription}: falha no lote {batch_id}: {error}")
+    with transaction.atomic():
+        dead = []
+        for delivery in deliveries:
+            delivery.attempts += 1
+            delivery.last_status_code = status_code
+            delivery.last_error = error
+            delivery.locked_until = None
+            if delivery.attempts >= MAX_ATTEMPTS:
+                dead.append(delivery)
+            else:
+                delivery.status = WebhookDelivery.PENDING
+                delivery.available_at = now + timezone.timedelta(
+                    seconds=RETRY_BASE_SECONDS * 2 ** (delivery.attempts - 1)
+                )
+
+        WebhookDelivery.objects.bulk_update(
+            [d for d in deliveries if d not in dead],
+            ["status", "attempts", "available_at", "locked_until", "last_status_code", "last_error"]
+        )
+        if dead:
+            WebhookDeadLetter.objects.bulk_create([
+                WebhookDeadLetter(
+                    subscription=subscription,
+                    event_id=d.event_id,
+                    event_type=d.event_type,
+                    payload=d.payload,
+                    attempts=d.attempts,
+                    last_status_code=status_code,
+                    last_error=error,
+                )
+                for d in dead
+            ])
+            WebhookDelivery.objects.filter(id__in=[d.id for d in dead]).delete()
+            logger.error(
+                f"Webhook {subscription}: {len(dead)} evento(s) movido(s) para a fila de não entregues"
+            )
+    return len(ids)
+
+
+def subscriptions_with_pending():
+    """IDs das assinaturas ativas com entregas prontas para envio."""
+    now = timezone.now()
+    return list(
+        _ready(now)
+        .filter(subscription__is_active=True)
+        .values_list("subscription_id", flat=True)
+        .distinct()
+    )
+
+
+def dispatch_webhooks_pending(max_batches=100):
+    """
+    Entrega lotes de todas as assinaturas de forma síncrona (um por vez).
+
+    Returns:
+        int: Número de eventos processados
+    """
+    processed = 0
+    for subscription_id in subscriptions_with_pending():
+        for _ in range(max_batches):
+            count = deliver_batch(subscription_id)
+            if not count:
+                break
+            processed += count
+    return processed
+
+
+def requeue_dead_letters(dead_letters):
+    """
+    Recoloca eventos não entregues na fila de entrega.
+
+    Returns:
+        int: Número de eventos recolocados
+    """
+    dead_letters = list(dead_letters)
+    with transaction.atomic():
+        WebhookDelivery.objects.bulk_create([
+            WebhookDelivery(
+                subscription_id=letter.subscription_id,
+                event_id=letter.event_id,
+                event_type=letter.event_type,
+                payload=letter.payload,
+            )
+            for letter in dead_letters
+        ])
+        WebhookDeadLetter.objects.filter(id__in=[letter.id for letter in dead_letters]).delete()
+    return len(dead_letters)
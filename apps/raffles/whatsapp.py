@@ -0,0 +1,443 @@
+"""
+Fila de envio de mensagens de WhatsApp com limite de taxa.
+
+As mensagens são gravadas em `WhatsAppMessage` e enviadas por um
+dispatcher que, para cada conta do provedor:
+
+- consome tokens de um token bucket compartilhado entre workers
+  (`WhatsAppRateLimit`, bloqueado com SELECT ... FOR UPDATE);
+- reserva o lote numa transação curta e envia fora dela, em lotes do
+  tamanho aceito pelo provedor;
+- pausa a conta ao receber 429, respeitando `Retry-After`;
+- aplica espera exponencial às demais falhas.
+
+Recibos de entrega/leitura atualizam a mensagem pelo ID do provedor.
+O provedor `fake` roda em memória e permite exercitar a fila sem rede.
+"""
+import json
+import logging
+import re
+import urllib.error
+import urllib.request
+import uuid
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from .models import WhatsAppMessage, WhatsAppRateLimit
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 6
+RETRY_BASE_SECONDS = 30
+DEFAULT_RETRY_AFTER_SECONDS = 60
+ENQUEUE_BATCH_SIZE = 1000
+HTTP_TIMEOUT_SECONDS = 15
+LEASE_SECONDS = 120  # Reserva de um lote em envio; vencida, volta para a fila
+
+# Status de recibo aceitos e a ordem em que podem avançar
+RECEIPT_STATUSES = {
+    "delivered": WhatsAppMessage.DELIVERED,
+    "read": WhatsAppMessage.READ,
+    "failed": WhatsAppMessage.FAILED,
+}
+_STATUS_ORDER = [
+    WhatsAppMessage.PENDING,
+    WhatsAppMessage.SENT,
+    WhatsAppMessage.DELIVERED,
+    WhatsAppMessage.READ,
+]
+
+
+class RateLimited(Exception):
+    """O provedor recusou o lote por limite de taxa (HTTP 429)."""
+
+    def __init__(self, retry_after=None):
+        super().__init__(f"Limite de taxa do provedor (retry-after={retry_after})")
+        self.retry_after = retry_after
+
+
+@dataclass
+class SendResult:
+    """Resultado do envio de uma mensagem do lote."""
+
+    message_id: int
+    provider_message_id: str = ""
+    error: str = ""
+
+
+def normalize_whatsapp(number):
+    """
+    Normaliza um número para o formato E.164 sem o `+`.
+
+    Números brasileiros sem DDI (10 ou 11 dígitos) recebem o prefixo 55.
+
+    Returns:
+        str: Apenas dígitos, ou "" se o número for inválido
+    """
+    digits = re.sub(r"\D", "", number or "")
+    if len(digits) in (10, 11):
+        digits = "55" + digits
+    return digits if 12 <= len(digits) <= 15 else ""
+
+
+# Provedores
+
+class WhatsAppProvider:
+    """
+    Interface de um provedor de WhatsApp.
+
+    `send_batch` recebe uma lista de `WhatsAppMessage` e devolve um
+    `SendResult` por mensagem; deve levantar `RateLimited` se o lote
+    inteiro for recusado por limite de taxa.
+    """
+
+    name = ""
+
+    def __init__(self, rate_per_second, burst, batch_size):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.batch_size = batch_size
+
+    def send_batch(self, messages):
+        raise NotImplementedError
+
+
+class FakeProvider(WhatsAppProvider):
+    """
+    Provedor em memória para desenvolvimento e testes.
+
+    Guarda as mensagens enviadas em `sent`. `fail_numbers` simula falhas
+    por destinatário e `rate_limit_next` simula respostas 429.
+    """
+
+    name = "fake"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sent = []
+        self.fail_numbers = set()
+        self.rate_limit_next = 0
+
+    def send_batch(self, messages):
+        if self.rate_limit_next:
+            self.rate_limit_next -= 1
+            raise RateLimited(retry_after=1)
+
+        results = []
+        for message in messages:
+            if message.to in self.fail_numbers:
+                results.append(SendResult(message.id, error="Número inválido no provedor"))
+                continue
+            provider_id = f"fake-{uuid.uuid4().hex}"
+            self.sent.append((provider_id, message.to, message.body))
+            results.append(SendResult(message.id, provider_message_id=provider_id))
+        return results
+
+    def deliver_all(self, status="delivered"):
+        """Simula os recibos de entrega de tudo o que foi enviado."""
+        for provider_id, _, _ in self.sent:
+            record_receipt(provider_id, status)
+
+
+class HttpGatewayProvider(WhatsAppProvider):
+    """
+    Gateway HTTP genérico (`WHATSAPP_GATEWAY_URL`).
+
+    Envia `{"messages": [{"reference", "to", "body"}]}` e espera
+    `{"results": [{"reference", "id"} | {"reference", "error"}]}`.
+    """
+
+    name = "http"
+
+    def send_batch(self, messages):
+        payload = {
+            "messages": [
+                {"reference": str(message.id), "to": message.to, "body": message.body}
+                for message in messages
+            ]
+        }
+        request = urllib.request.Request(
+            settings.WHATSAPP_GATEWAY_URL,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {settings.WHATSAPP_API_TOKEN}",
+            },
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT_SECONDS) as response:
+                data = json.loads(response.read() or b"{}")
+        except urllib.error.HTTPError as e:
+            if e.code == 429:
+                retry_after = e.headers.get("Retry-After")
+                raise RateLimited(int(retry_after) if retry_after and retry_after.isdigit() else None)
+            raise
+
+        by_reference = {str(item.get("reference")): item for item in data.get("results", [])}
+        results = []
+        for message in messages:
+            item = by_reference.get(str(message.id), {})
+            results.append(SendResult(
+                message.id,
+                provider_message_id=str(item.get("id") or ""),
+                error="" if item.get("id") else str(item.get("error") or "Sem resposta do gateway"),
+            ))
+        return results
+
+
+PROVIDER_CLASSES = {
+    FakeProvider.name: FakeProvider,
+    HttpGatewayProvider.name: HttpGatewayProvider,
+}
+
+_providers = {}
+
+
+def get_provider():
+    """
+    Provedor configurado em `WHATSAPP_PROVIDER` (instância única por processo).
+
+    Returns:
+        WhatsAppProvider | None: None se o WhatsApp não estiver configurado
+    """
+    name = getattr(settings, "WHATSAPP_PROVIDER", "")
+    if name not in PROVIDER_CLASSES:
+        return None
+    if name not in _providers:
+        _providers[name] = PROVIDER_CLASSES[name](
+            rate_per_second=settings.WHATSAPP_RATE_PER_SECOND,
+            burst=settings.WHATSAPP_BURST,
+            batch_size=settings.WHATSAPP_BATCH_SIZE,
+        )
+    return _providers[name]
+
+
+def current_account():
+    """Identificador da conta usada nas novas mensagens e no token bucket."""
+    return f"{settings.WHATSAPP_PROVIDER}:{settings.WHATSAPP_ACCOUNT}"
+
+
+# Fila
+
+def enqueue_messages(messages, event_type="", account=None):
+    """
+    Coloca mensagens na fila de envio.
+
+    Args:
+        messages: Iterável de tuplas (número, texto, ID do pedido ou None)
+        event_type: Evento que originou as mensagens
+        account: Conta do provedor (padrão: a configurada)
+
+    Returns:
+        int: Número de mensagens enfileiradas (números inválidos são ignorados)
+    """
+    account = account or current_account()
+    total = 0
+    batch = []
+    for number, body, order_id in messages:
+        to = normalize_whatsapp(number)
+        if not to:
+            continue
+        batch.append(WhatsAppMessage(
+            account=account, to=to, body=body, event_type=event_type, order_id=order_id
+        ))
+        if len(batch) >= ENQUEUE_BATCH_SIZE:
+            WhatsAppMessage.objects.bulk_create(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        WhatsAppMessage.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def take_tokens(account, wanted, rate_per_second, burst):
+    """
+    Consome até `wanted` tokens do bucket da conta.
+
+    O bucket é uma linha no banco bloqueada durante a atualização, então o
+    limite vale para todos os workers juntos.
+
+    Returns:
+        int: Tokens concedidos (0 se a conta estiver pausada)
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        bucket, _ = WhatsAppRateLimit.objects.select_for_update().get_or_create(
+            account=account,
+            defaults={"tokens": burst, "updated_at": now},
+        )
+        if bucket.paused_until and bucket.paused_until > now:
+            return 0
+
+        elapsed = max((now - bucket.updated_at).total_seconds(), 0)
+        tokens = min(burst, bucket.tokens + elapsed * rate_per_second)
+        granted = int(min(tokens, wanted))
+
+        bucket.tokens = tokens - granted
+        bucket.updated_at = now
+        bucket.paused_until = None
+        bucket.save(update_fields=["tokens", "updated_at", "paused_until"])
+    return granted
+
+
+def return_tokens(account, count, burst):
+    """Devolve ao bucket tokens concedidos e não usados (limitado a `burst`)."""
+    WhatsAppRateLimit.objects.filter(account=account).update(
+        tokens=Least(F("tokens") + count, Value(float(burst)))
+    )
+
+
+def pause_account(account, seconds):
+    """Pausa os envios da conta (após um 429) e zera o bucket."""
+    WhatsAppRateLimit.objects.filter(account=account).update(
+        tokens=0,
+        updated_at=timezone.now(),
+        paused_until=timezone.now() + timezone.timedelta(seconds=seconds),
+    )
+
+
+def claim_messages(pending, limit):
+    """
+    Reserva até `limit` mensagens pendentes para envio.
+
+    As linhas ficam bloqueadas (SKIP LOCKED) só durante a reserva, que
+    adia `available_at` por `LEASE_SECONDS`; se o processo morrer durante
+    o envio, as mensagens voltam para a fila quando a reserva vencer.
+
+    Returns:
+        list: Mensagens reservadas
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            pending.select_for_update(skip_locked=True).order_by("id")[:limit]
+        )
+        WhatsAppMessage.objects.filter(id__in=[message.id for message in messages]).update(
+            available_at=now + timezone.timedelta(seconds=LEASE_SECONDS)
+        )
+    return messages
+
+
+def dispatch_whatsapp(provider=None, account=None):
+    """
+    Envia um lote de mensagens pendentes, dentro do limite de taxa.
+
+    Returns:
+        tuple: (enviadas, falhas)
+    """
+    provider = provider or get_provider()
+    if provider is None:
+        return 0, 0
+    account = account or current_account()
+
+    now = timezone.now()
+    pending = WhatsAppMessage.objects.filter(
+        account=account, status=WhatsAppMessage.PENDING, available_at__lte=now
+    )
+    if not pending.exists():
+        return 0, 0
+
+    granted = take_tokens(account, provider.batch_size, provider.rate_per_second, provider.burst)
+    if not granted:
+        return 0, 0
+
+    messages = claim_messages(pending, granted)
+    if len(messages) < granted:
+        return_tokens(account, granted - len(messages), provider.burst)
+    if not messages:
+        return 0, 0
+
+    # Envio fora de transação: as mensagens estão reservadas pelo lease
+    try:
+        results = {result.message_id: result for result in provider.send_batch(messages)}
+    except RateLimited as e:
+        retry_after = e.retry_after or DEFAULT_RETRY_AFTER_SECONDS
+        logger.warning(f"WhatsApp {account}: limite de taxa, pausando por {retry_after}s")
+        pause_account(account, retry_after)
+        WhatsAppMessage.objects.filter(id__in=[message.id for message in messages]).update(
+            available_at=timezone.now() + timezone.timedelta(seconds=retry_after)
+        )
+        return 0, 0
+    except Exception as e:
+        logger.error(f"WhatsApp {account}: erro no envio do lote: {str(e)}")
+        results = {message.id: SendResult(message.id, error=str(e)) for message in messages}
+
+    sent = failed = 0
+    now = timezone.now()
+    for message in messages:
+        result = results.get(message.id) or SendResult(message.id, error="Sem resultado do provedor")
+        message.attempts += 1
+        if result.error:
+            failed += 1
+            message.last_error = result.error
+            if message.attempts >= MAX_ATTEMPTS:
+                message.status = WhatsAppMessage.FAILED
+            else:
+                message.available_at = now + timezone.timedelta(
+                    seconds=RETRY_BASE_SECONDS * 2 ** (message.attempts - 1)
+                )
+        else:
+            sent += 1
+            message.status = WhatsAppMessage.SENT
+            message.provider_message_id = result.provider_message_id
+            message.sent_at = now
+            message.last_error = ""
+
+    WhatsAppMessage.objects.bulk_update(
+        messages,
+        ["status", "attempts", "available_at", "last_error", "provider_message_id", "sent_at"]
+    )
+
+    logger.info(f"WhatsApp {account}: {sent} enviada(s), {failed} falha(s)")
+    return sent, failed
+
+
+def dispatch_whatsapp_pending(max_batches=100):
+    """
+    Envia lotes enquanto houver tokens e mensagens disponíveis.
+
+    Returns:
+        tuple: (enviadas, falhas)
+    """
+    total_sent = total_failed = 0
+    for _ in range(max_batches):
+        sent, failed = dispatch_whatsapp()
+        if not sent and not failed:
+            break
+        total_sent += sent
+        total_failed += failed
+    return total_sent, total_failed
+
+
+def record_receipt(provider_message_id, status, error=""):
+    """
+    Registra um recibo de entrega/leitura do provedor.
+
+    Recibos fora de ordem não fazem o status voltar (ex.: "entregue"
+    depois de "lida").
+
+    Returns:
+        bool: True se alguma mensagem foi atualizada
+    """
+    new_status = RECEIPT_STATUSES.get(status)
+    if not new_status or not provider_message_id:
+        return False
+
+    fields = {"status": new_status}
+    messages = WhatsAppMessage.objects.filter(provider_message_id=provider_message_id)
+    if new_status == WhatsAppMessage.FAILED:
+        fields["last_error"] = error or "Falha informada pelo provedor"
+        messages = messages.exclude(status=WhatsAppMessage.READ)
+    else:
+        allowed = _STATUS_ORDER[:_STATUS_ORDER.index(new_status)]
+        messages = messages.filter(status__in=allowed)
+        if new_status == WhatsAppMessage.DELIVERED:
+            fields["delivered_at"] = timezone.now()
+    return messages.update(**fields) > 0
@@ -34,6 +34,9 @@ else:
 echo "🔍 Verificação final..."
 python manage.py check
 
+# Limpar métricas de execuções anteriores (os workers gravam snapshots por PID)
+python manage.py shell -c "from apps.raffles.metrics import reset_registry; reset_registry()"
+
 # Executar o servidor
 echo "🌐 Iniciando servidor na porta 8005..."
 exec gunicorn --bind 0.0.0.0:8005 --workers 3 --timeout 120 --access-logfile - --error-logfile - sistema_cotas.wsgi:application
@@ -0,0 +1,5 @@
+# Garante que o app do Celery seja carregado junto com o Django, para que
+# as tasks (@shared_task) usem o broker configurado.
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
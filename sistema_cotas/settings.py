@@ -3,6 +3,7 @@ Django settings for sistema_cotas project.
 """
 
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -49,6 +50,7 @@ LOCAL_APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'apps.raffles.metrics.PerformanceMetricsMiddleware',  # Primeiro: mede toda a pilha
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # WhiteNoise middleware
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -121,6 +123,18 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Comprovantes: servidos pela view de mídia protegida (equipe ou token assinado).
+# Em produção, defina o prefixo da location `internal` do nginx para usar X-Accel-Redirect.
+PROTECTED_MEDIA_ACCEL_PREFIX = os.getenv('PROTECTED_MEDIA_ACCEL_PREFIX', '')
+PROTECTED_MEDIA_TOKEN_MAX_AGE = int(os.getenv('PROTECTED_MEDIA_TOKEN_MAX_AGE', str(7 * 24 * 3600)))
+
+# Métricas por view em /metrics (equipe ou `Authorization: Bearer METRICS_TOKEN`).
+# Cada worker grava seus histogramas em METRICS_DIR, somados na leitura.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'sistema_cotas_metrics'))
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -145,7 +159,8 @@ SESSION_COOKIE_AGE = 3600  # 1 hour
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 
 # File Upload Settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
+# Uploads vão em blocos para arquivo temporário, com SHA-256 incremental
+FILE_UPLOAD_HANDLERS = ['apps.raffles.receipts.HashingUploadHandler']
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
 
 # Celery Configuration (Optional)
@@ -156,6 +171,45 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Fallback dos sorteios agendados (ETAs perdidas)
+CELERY_BEAT_SCHEDULE = {
+    'run-due-draws': {
+        'task': 'apps.raffles.tasks.run_due_draws_task',
+        'schedule': 60.0,
+    },
+    'dispatch-outbox': {
+        'task': 'apps.raffles.tasks.dispatch_outbox_task',
+        'schedule': 5.0,
+    },
+    'dispatch-whatsapp': {
+        'task': 'apps.raffles.tasks.dispatch_whatsapp_task',
+        'schedule': 2.0,
+    },
+    'dispatch-webhooks': {
+        'task': 'apps.raffles.tasks.dispatch_webhooks_task',
+        'schedule': 5.0,
+    },
+}
+
+# Outbox de eventos: destinos habilitados (email, whatsapp, webhook, local)
+OUTBOX_SINKS = [
+    sink.strip() for sink in os.getenv('OUTBOX_SINKS', 'email').split(',') if sink.strip()
+]
+
+# WhatsApp: provedor ("fake" em memória, "http" gateway; vazio desativa)
+WHATSAPP_PROVIDER = os.getenv('WHATSAPP_PROVIDER', '')
+WHATSAPP_ACCOUNT = os.getenv('WHATSAPP_ACCOUNT', 'default')
+WHATSAPP_GATEWAY_URL = os.getenv('WHATSAPP_GATEWAY_URL', '')
+WHATSAPP_API_TOKEN = os.getenv('WHATSAPP_API_TOKEN', '')
+WHATSAPP_RECEIPT_TOKEN = os.getenv('WHATSAPP_RECEIPT_TOKEN', '')
+WHATSAPP_RATE_PER_SECOND = float(os.getenv('WHATSAPP_RATE_PER_SECOND', '20'))
+WHATSAPP_BURST = int(os.getenv('WHATSAPP_BURST', '50'))
+WHATSAPP_BATCH_SIZE = int(os.getenv('WHATSAPP_BATCH_SIZE', '50'))
+
+# Tarefas em segundo plano: True executa no próprio processo (desenvolvimento
+# sem worker/broker). Em produção deve ficar False; sem broker a tarefa falha.
+JOBS_ALWAYS_SYNC = os.getenv('JOBS_ALWAYS_SYNC', 'False').lower() == 'true'
+
 # DRF Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -177,7 +231,6 @@ REST_FRAMEWORK = {
 }
 
 # Logging Configuration
-import os
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
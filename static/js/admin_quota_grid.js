@@ -0,0 +1,153 @@
+/**
+ * Grade virtualizada de cotas para o admin de produtos.
+ *
+ * Renderiza apenas as linhas visíveis e busca o status das cotas em blocos
+ * compactos, de forma que a página de edição carregue em tempo constante
+ * mesmo para produtos com centenas de milhares de cotas.
+ */
+(function() {
+    'use strict';
+
+    const CELL_WIDTH = 56;
+    const ROW_HEIGHT = 28;
+    const VIEWPORT_HEIGHT = 420;
+    const OVERSCAN_ROWS = 5;
+    const STATUS_CLASSES = {
+        'D': 'quota-available',
+        'R': 'quota-reserved',
+        'V': 'quota-sold',
+        '-': 'quota-missing'
+    };
+
+    function QuotaGrid(container) {
+        this.container = container;
+        this.total = parseInt(container.dataset.total, 10) || 0;
+        this.chunkSize = parseInt(container.dataset.chunkSize, 10) || 1000;
+        this.chunkUrl = container.dataset.chunkUrl;
+        this.detailUrl = container.dataset.detailUrl;
+        this.chunks = {};
+        this.pending = {};
+        this.build();
+        this.render();
+    }
+
+    QuotaGrid.prototype.build = function() {
+        this.viewport = document.createElement('div');
+        this.viewport.className = 'quota-grid-viewport';
+        this.viewport.style.height = VIEWPORT_HEIGHT + 'px';
+
+        this.spacer = document.createElement('div');
+        this.spacer.className = 'quota-grid-spacer';
+
+        this.rows = document.createElement('div');
+        this.rows.className = 'quota-grid-rows';
+
+        this.info = document.createElement('div');
+        this.info.className = 'quota-grid-info';
+        this.info.textContent = 'Clique em um número para ver o pedido.';
+
+        this.spacer.appendChild(this.rows);
+        this.viewport.appendChild(this.spacer);
+        this.container.appendChild(this.viewport);
+        this.container.appendChild(this.info);
+
+        this.columns = Math.max(1, Math.floor(this.viewport.clientWidth / CELL_WIDTH) || 10);
+        this.rowCount = Math.ceil(this.total / this.columns);
+        this.spacer.style.height = (this.rowCount * ROW_HEIGHT) + 'px';
+
+        this.viewport.addEventListener('scroll', this.render.bind(this));
+        this.rows.addEventListener('click', this.showDetail.bind(this));
+    };
+
+    QuotaGrid.prototype.render = function() {
+        const firstRow = Math.max(0, Math.floor(this.viewport.scrollTop / ROW_HEIGHT) - OVERSCAN_ROWS);
+        const visibleRows = Math.ceil(VIEWPORT_HEIGHT / ROW_HEIGHT) + 2 * OVERSCAN_ROWS;
+        const lastRow = Math.min(this.rowCount, firstRow + visibleRows);
+
+        const fragment = document.createDocumentFragment();
+        for (let row = firstRow; row < lastRow; row++) {
+            for (let col = 0; col < this.columns; col++) {
+                const number = row * this.columns + col + 1;
+                if (number > this.total) {
+                    break;
+                }
+                const cell = document.createElement('span');
+                const status = this.statusOf(number);
+                cell.className = 'quota-cell ' + (status ? STATUS_CLASSES[status] : 'quota-loading');
+                cell.dataset.number = number;
+                cell.textContent = number;
+                fragment.appendChild(cell);
+            }
+        }
+
+        this.rows.style.transform = 'translateY(' + (firstRow * ROW_HEIGHT) + 'px)';
+        this.rows.style.width = (this.columns * CELL_WIDTH) + 'px';
+        this.rows.replaceChildren(fragment);
+    };
+
+    QuotaGrid.prototype.statusOf = function(number) {
+        const index = Math.floor((number - 1) / this.chunkSize);
+        const chunk = this.chunks[index];
+        if (chunk === undefined) {
+            this.loadChunk(index);
+            return null;
+        }
+        return chunk.charAt((number - 1) % this.chunkSize);
+    };
+
+    QuotaGrid.prototype.loadChunk = function(index) {
+        if (this.pending[index]) {
+            return;
+        }
+        this.pending[index] = true;
+
+        const start = index * this.chunkSize + 1;
+        const url = this.chunkUrl + '?start=' + start + '&size=' + this.chunkSize;
+        fetch(url, {credentials: 'same-origin'})
+            .then(response => response.json())
+            .then(data => {
+                this.chunks[index] = data.statuses;
+                this.render();
+            })
+            .catch(() => {
+                this.info.textContent = 'Erro ao carregar cotas.';
+            })
+            .finally(() => {
+                delete this.pending[index];
+            });
+    };
+
+    QuotaGrid.prototype.showDetail = function(event) {
+        const number = event.target.dataset.number;
+        if (!number) {
+            return;
+        }
+
+        const url = this.detailUrl.replace(/\/0\/$/, '/' + number + '/');
+        this.info.textContent = 'Carregando cota ' + number + '...';
+        fetch(url, {credentials: 'same-origin'})
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.json();
+            })
+            .then(data => {
+                this.info.replaceChildren();
+                this.info.append('Cota ' + data.number + ' - ' + data.status);
+                if (data.order) {
+                    const link = document.createElement('a');
+                    link.href = data.order.url;
+                    link.textContent = 'Pedido #' + data.order.id + ' (' + data.order.full_name + ', ' + data.order.status + ')';
+                    this.info.append(' - ', link);
+                }
+            })
+            .catch(() => {
+                this.info.textContent = 'Cota ' + number + ' não encontrada.';
+            });
+    };
+
+    document.addEventListener('DOMContentLoaded', function() {
+        document.querySelectorAll('.quota-grid').forEach(container => new QuotaGrid(container));
+    });
+})();
@@ -0,0 +1,80 @@
+/**
+ * Widget de progresso de tarefas em segundo plano.
+ *
+ * Consulta periodicamente o endpoint de status da tarefa e atualiza a
+ * barra de progresso, a estimativa de tempo restante e o resultado.
+ */
+(function() {
+    'use strict';
+
+    const POLL_INTERVAL = 1500;
+
+    function formatEta(seconds) {
+        if (seconds === null || seconds === undefined) {
+            return '';
+        }
+        if (seconds < 60) {
+            return 'restam ~' + seconds + 's';
+        }
+        return 'restam ~' + Math.ceil(seconds / 60) + ' min';
+    }
+
+    function JobProgress(container) {
+        this.container = container;
+        this.url = container.dataset.statusUrl;
+        this.card = container.closest('.card') || container;
+        this.poll();
+    }
+
+    JobProgress.prototype.field = function(name) {
+        return this.card.querySelector('[data-job-field="' + name + '"]');
+    };
+
+    JobProgress.prototype.update = function(data) {
+        const bar = this.field('bar');
+        bar.style.width = data.progress_percentage + '%';
+        bar.textContent = data.progress_percentage + '%';
+
+        this.field('status_display').textContent = data.status_display;
+        this.field('progress').textContent = data.progress_current + ' / ' + data.progress_total;
+        this.field('eta').textContent = formatEta(data.eta_seconds);
+        this.field('message').textContent = data.message || '';
+
+        if (data.result) {
+            const result = this.field('result');
+            result.textContent = JSON.stringify(data.result, null, 2);
+            result.classList.remove('d-none');
+
+            const download = this.field('download');
+            if (download && data.result.download_url) {
+                download.href = data.result.download_url;
+                download.classList.remove('d-none');
+            }
+        }
+        if (data.error) {
+            const error = this.field('error');
+            error.textContent = data.error;
+            error.classList.remove('d-none');
+        }
+        if (data.finished) {
+            bar.classList.remove('progress-bar-animated', 'progress-bar-striped');
+            bar.classList.add(data.status === 'falhou' ? 'bg-danger' : 'bg-success');
+        }
+    };
+
+    JobProgress.prototype.poll = function() {
+        fetch(this.url, {credentials: 'same-origin'})
+            .then(response => response.json())
+            .then(data => {
+                this.update(data);
+                if (!data.finished) {
+                    setTimeout(this.poll.bind(this), POLL_INTERVAL);
+                }
+            })
+            .catch(() => setTimeout(this.poll.bind(this), POLL_INTERVAL * 2));
+    };
+
+    document.addEventListener('DOMContentLoaded', function() {
+        document.querySelectorAll('.job-progress').forEach(container => new JobProgress(container));
+    });
+})();